@@ -0,0 +1,114 @@
+"""Run the benchmark suite and compare with a stored baseline.
+
+    python -m benchmarks                      # run, compare with baselines/<scale>.json
+    python -m benchmarks --save               # run and overwrite the baseline
+    python -m benchmarks --check -k http.     # fail on >20% throughput regressions
+    python -m benchmarks --mongo-uri mongodb://localhost:27017/sardine_bench
+
+Without --mongo-uri the suite runs against mongomock.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+import argparse, json, os, platform, statistics, subprocess, sys, time
+
+from .fixtures import SCALES, create_bench_app, seed
+from .suite import BENCHMARKS
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines")
+
+def measure(fn, items: int, *, min_time: float, max_iterations: int) -> Dict[str, Any]:
+    fn()  # warm-up
+    durations = []
+    deadline = time.perf_counter() + min_time
+    while len(durations) < max_iterations and (time.perf_counter() < deadline or len(durations) < 3):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+
+    durations.sort()
+    total = sum(durations)
+    return {
+        "iterations": len(durations),
+        "items_per_call": items,
+        "ops_per_sec": round(items * len(durations) / total, 3),
+        "median_ms": round(statistics.median(durations) * 1e3, 4),
+        "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1e3, 4),
+        "min_ms": round(durations[0] * 1e3, 4),
+    }
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sardine benchmark suite")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="default")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per benchmark")
+    parser.add_argument("--max-iterations", type=int, default=10_000)
+    parser.add_argument("--baseline", default=None, help="baseline file (default: baselines/<scale>.json)")
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on regressions beyond --threshold")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    app = create_bench_app(args.mongo_uri)
+    db = app.mongo_db
+    if args.mongo_uri:
+        for name in db.list_collection_names():
+            db.drop_collection(name)
+    ids = seed(db, SCALES[args.scale])
+    ctx = {"app": app, "db": db, "ids": ids}
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        fn, items = setup(ctx)
+        with app.app_context():
+            results[name] = measure(fn, items, min_time=args.min_time, max_iterations=args.max_iterations)
+
+    baseline_path = args.baseline or os.path.join(BASELINES, f"{args.scale}.json")
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f).get("results", {})
+
+    regressions = []
+    print(f"{'benchmark':<48} {'ops/s':>12} {'median ms':>11} {'p95 ms':>10} {'vs baseline':>12}")
+    for name, result in results.items():
+        delta = ""
+        previous = baseline.get(name)
+        if previous:
+            change = result["ops_per_sec"] / previous["ops_per_sec"] - 1
+            delta = f"{change:+.1%}"
+            if change < -args.threshold:
+                regressions.append(name)
+        print(f"{name:<48} {result['ops_per_sec']:>12,.1f} {result['median_ms']:>11.3f} {result['p95_ms']:>10.3f} {delta:>12}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        if args.filter and baseline:
+            results = {**baseline, **results}
+        with open(baseline_path, "w") as f:
+            json.dump({
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "scale": args.scale,
+                "mongo": "mongodb" if args.mongo_uri else "mongomock",
+                "results": dict(sorted(results.items())),
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {baseline_path}")
+
+    if regressions:
+        print(f"regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+    return 1 if args.check and regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Compare the NumPy avatar renderer with the original per-pixel one.
+
+    python -m benchmarks.avatar [--size 800] [--seeds 5]
+
+Fails if any channel of the rendered avatar differs by more than
+--tolerance from the per-pixel reference.
+"""
+from __future__ import annotations
+
+import argparse, math, sys, time
+
+import numpy as np
+from PIL import Image, ImageChops, ImageFilter
+
+from src.helpers import avatar
+
+# ---------- reference (pixel by pixel) ----------
+def reference_diagonal_gradient(size, c0, c1):
+    w = h = size
+    grad = Image.new("RGB", (w, h))
+    px = grad.load()
+    for y in range(h):
+        for x in range(w):
+            t = (x + y) / (w + h - 2)
+            px[x, y] = avatar._mix_rgb(c0, c1, t)
+    return grad
+
+def reference_radial_mask(size, center, radius, *, edge=2.1, center_power=0.9, strength=0.85):
+    m = Image.new("L", (size, size), 0)
+    px = m.load()
+    cx, cy = center
+    r = float(radius)
+    inv = 1.0 / r
+    for y in range(size):
+        dy = y - cy
+        for x in range(size):
+            d = math.hypot(x - cx, dy)
+            if d >= r:
+                continue
+            t = d * inv
+            w = (1 - t) ** edge
+            w *= max(t, 0.0001) ** center_power
+            a = int(255 * strength * w)
+            if a > px[x, y]:
+                px[x, y] = a
+    return m
+
+def reference_generate_avatar(string, size=800, *, variant=0):
+    w = h = size
+    c1, c2, c3 = avatar.palette_from_string(string, variant)
+    base = reference_diagonal_gradient(size, avatar._towards_white(c1, 0.32), avatar._towards_white(c2, 0.32))
+    centers = avatar.corner_centers(size, string, variant)
+    radius = int(size * 0.86)
+    for color, center, k in zip((c1, c2, c3), centers, (0.97, 0.90, 0.94)):
+        solid = Image.new("RGB", (w, h), color)
+        mask = reference_radial_mask(size, center, radius, edge=2.0, center_power=1.0, strength=1.0)
+        pre = Image.blend(base, ImageChops.screen(base, solid), k)
+        base = Image.composite(pre, base, mask)
+    return avatar._punch(base.filter(ImageFilter.GaussianBlur(radius=0.3)))
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=800)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--tolerance", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    worst, t_ref, t_new = 0, 0.0, 0.0
+    for i in range(args.seeds):
+        seed = f"user{i}@sardine.io"
+        ref, dt_ref = _timed(reference_generate_avatar, seed, args.size)
+        new, dt_new = _timed(avatar.generate_avatar, seed, args.size)
+        diff = int(np.abs(np.asarray(ref, dtype=np.int16) - np.asarray(new, dtype=np.int16)).max())
+        worst = max(worst, diff)
+        t_ref += dt_ref
+        t_new += dt_new
+        print(f"{seed:<22} reference {dt_ref * 1e3:8.1f} ms  numpy {dt_new * 1e3:7.1f} ms  max diff {diff}")
+
+    print(f"speedup x{t_ref / t_new:.1f}, worst channel diff {worst} (tolerance {args.tolerance})")
+    return 0 if worst <= args.tolerance else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""Bench/load-test app factory and realistic seed data.
+
+Runs against a real Mongo when a URI is given, otherwise against an
+in-memory mongomock stand-in (pip install -r requirements-dev.txt).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List
+import random, string
+
+from flask import Flask
+
+from config import Config
+from src.helpers import utils
+
+@dataclass
+class Scale:
+    users: int = 50
+    vocabularies: int = 6
+    vocabulary_size: int = 20_000
+    configurations: int = 20
+    attributes: int = 12
+    formats: int = 25
+    requirements: int = 4
+    models: int = 40
+    agents: int = 40
+    datasets: int = 30
+    samples_per_dataset: int = 500
+
+SCALES = {
+    "small": Scale(users=10, vocabularies=3, vocabulary_size=2_000, configurations=5, models=10, agents=10, datasets=5, samples_per_dataset=100),
+    "default": Scale(),
+    "large": Scale(users=500, vocabulary_size=200_000, configurations=100, models=300, agents=300, datasets=200, samples_per_dataset=2_000),
+}
+
+PASSWORD = "sardine-bench"
+
+def create_bench_app(mongo_uri: str | None = None) -> Flask:
+    import src
+
+    class BenchConfig(Config):
+        MONGO_URI = mongo_uri or "mongodb://localhost:27017/sardine_bench"
+        JWT_SECRET_KEY = "sardine-bench-not-a-secret-0123456789"
+        TESTING = True
+        RATELIMIT_ENABLED = False
+
+    if not mongo_uri:
+        import mongomock
+        src.MongoClient = mongomock.MongoClient
+
+    return src.create_app(BenchConfig)
+
+def _word(rnd: random.Random, n: int) -> str:
+    return rnd.choice(string.ascii_uppercase) + "".join(rnd.choices(string.ascii_lowercase, k=n - 1))
+
+def seed(db, scale: Scale, *, seed: int = 42) -> Dict[str, List[Any]]:
+    """Fill db with users, vocabularies, configurations, models, agents and datasets."""
+    rnd = random.Random(seed)
+    now = utils.get_current_time()
+    ids: Dict[str, List[Any]] = {}
+
+    # users: hashing is the expensive part, share one hash for every account
+    apikey = utils.generate_apikey()
+    hashed = utils.hash_password(PASSWORD, apikey)
+    users = [{
+        "email": f"bench{i}@sardine.io",
+        "firstname": _word(rnd, 6),
+        "lastname": _word(rnd, 8),
+        "apikey": apikey,
+        "password": hashed,
+        "role": "admin" if i == 0 else "user",
+        "avatar": {"seed": f"bench{i}@sardine.io", "variant": 0},
+    } for i in range(scale.users)]
+    ids["users"] = db["users"].insert_many(users).inserted_ids
+
+    vocabularies = [{
+        "name": f"vocabulary-{i}",
+        "data": [_word(rnd, rnd.randint(4, 12)) for _ in range(scale.vocabulary_size)],
+        "created_at": now,
+        "created_by": rnd.choice(ids["users"]),
+    } for i in range(scale.vocabularies)]
+    ids["models_data"] = db["models_data"].insert_many(vocabularies).inserted_ids
+
+    def attributes(n: int) -> List[Dict[str, Any]]:
+        attrs = []
+        for a in range(n):
+            if a % 3 == 0:
+                value = {"type": "number", "rule": "randint", "parameters": {"min": 0, "max": 99_999}}
+            else:
+                value = {"type": "string", "rule": "data", "parameters": {"object_id": str(rnd.choice(ids["models_data"]))}}
+            attrs.append({
+                "key": f"attr{a}",
+                "frequency": rnd.choice([1, 1, 0.9, 0.7]),
+                "value": value,
+                "requirements": [
+                    rnd.choice([
+                        {"rule": "regex", "constraint": r"^\w+$"},
+                        {"rule": "neq", "constraint": "Forbidden"},
+                        {"rule": "gte", "constraint": 0},
+                        {"rule": "nin", "constraint": ["Foo", "Bar", "Baz"]},
+                    ]) for _ in range(scale.requirements)
+                ],
+            })
+        return attrs
+
+    def formats(n: int, keys: List[str]) -> List[str]:
+        return [" ".join(f"{_word(rnd, 5).lower()} {{{k}}}" for k in rnd.sample(keys, k=min(len(keys), 6))) for _ in range(n)]
+
+    configurations = []
+    for i in range(scale.configurations):
+        attrs = attributes(scale.attributes)
+        configurations.append({
+            "name": f"configuration-{i}",
+            "description": "bench",
+            "attributes": attrs,
+            "formats": formats(scale.formats, [a["key"] for a in attrs]),
+            "randomizers": [],
+            "created_at": now,
+            "created_by": rnd.choice(ids["users"]),
+            "possibilities": scale.vocabulary_size * scale.formats,
+        })
+    ids["models_configurations"] = db["models_configurations"].insert_many(configurations).inserted_ids
+
+    # nested: a configuration pulling a sub-configuration as one of its values
+    sub = attributes(3)
+    nested_id = db["models_configurations"].insert_one({
+        "name": "configuration-nested",
+        "configuration": {"attributes": sub, "formats": formats(5, [a["key"] for a in sub])},
+        "created_at": now,
+    }).inserted_id
+    db["models_configurations"].update_one({"_id": ids["models_configurations"][0]}, {"$push": {"attributes": {
+        "key": "nested",
+        "frequency": 1,
+        "value": {"type": "string", "rule": "configuration", "parameters": {"object_id": str(nested_id)}},
+        "requirements": [],
+    }}})
+
+    models = []
+    for i in range(scale.models):
+        entities = {f"ENT{a}": f"attr{a}" for a in range(scale.attributes) if a % 2 == 0}
+        models.append({
+            "name": f"model-{i}",
+            "description": "bench",
+            "reference": f"ref-{i}",
+            "version": "1.0",
+            "configuration": rnd.choice(ids["models_configurations"]),
+            "randomizers": [{"rule": "upper", "frequency": 0.1}, {"rule": "lower", "frequency": 0.1}],
+            "mapper": {},
+            "entities": entities,
+            "labels": ["O"] + [f"{p}-{e}" for e in entities for p in "BI"],
+            "created_by": rnd.choice(ids["users"]),
+            "created_at": now,
+            "updated_at": now,
+        })
+    ids["models"] = db["models"].insert_many(models).inserted_ids
+
+    ids["agents"] = db["agents"].insert_many([{
+        "model": rnd.choice(ids["models"]),
+        "created_by": rnd.choice(ids["users"]),
+        "status": rnd.choice(["ready", "training"]),
+        "version": "1.0",
+        "path": f"/models/agent-{i}",
+    } for i in range(scale.agents)]).inserted_ids
+
+    datasets = []
+    for i in range(scale.datasets):
+        datasets.append({
+            "model": rnd.choice(ids["models"]),
+            "version": "1.0",
+            "size": {"size": scale.samples_per_dataset},
+            "created_at": now,
+            "status": "generated",
+            "created_by": rnd.choice(ids["users"]),
+        })
+    ids["datasets"] = db["datasets"].insert_many(datasets).inserted_ids
+
+    samples = []
+    for dataset_id in ids["datasets"]:
+        for _ in range(scale.samples_per_dataset):
+            text = " ".join(_word(rnd, rnd.randint(3, 10)) for _ in range(12))
+            samples.append({
+                "dataset": dataset_id,
+                "data": {"text": text, "entities": [[0, 5, "ENT0"], [10, 16, "ENT2"]]},
+                "created_at": now,
+            })
+        if len(samples) >= 10_000:
+            db["datasets_data"].insert_many(samples)
+            samples = []
+    if samples:
+        db["datasets_data"].insert_many(samples)
+
+    return ids
+
+def login(client, email: str = "bench0@sardine.io") -> Dict[str, str]:
+    token = client.post("/api/auth/login", json={"email": email, "password": PASSWORD}).get_json()["token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,228 @@
+"""Mixed-traffic HTTP load test.
+
+    python -m benchmarks.loadtest --users 50 --duration 30 --scenario mixed
+    python -m benchmarks.loadtest --mongo-uri mongodb://localhost:27017/sardine_load \\
+        --url http://127.0.0.1:8888      # drive an already running gunicorn
+
+Without --url the app is built with create_app and served in-process by a
+threaded werkzeug server. Without --mongo-uri it runs on mongomock, which
+is only good for smoke runs: use a local mongod for real numbers.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlsplit
+import argparse, http.client, json, random, sys, threading, time
+
+from .fixtures import PASSWORD, SCALES, create_bench_app, seed
+
+# name -> weight, per scenario
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "mixed": {"login": 5, "models": 20, "configurations": 15, "data": 5, "agents": 15, "datasets": 15, "examples": 20, "build": 5},
+    "read": {"models": 25, "configurations": 20, "data": 5, "agents": 25, "datasets": 25},
+    "examples": {"examples": 1},
+    "auth": {"login": 1},
+    "build": {"build": 1},
+}
+
+@dataclass
+class Stats:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Dict[str, Dict[int, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, name: str, elapsed: float, status: int | None) -> None:
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if status is None or status >= 500:
+                self.errors[name] += 1
+            if status is not None:
+                self.statuses[name][status] += 1
+
+class Client:
+    """One keep-alive connection per virtual user."""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.conn: http.client.HTTPConnection | None = None
+        self.token: str | None = None
+
+    def request(self, method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+        headers = {"Accept-Encoding": "identity"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, payload, headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # stale keep-alive socket: reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+        if response.getheader("Content-Type", "").startswith("application/json") and data:
+            return response.status, json.loads(data)
+        return response.status, None
+
+def _actions(ids: Dict[str, List[Any]], emails: List[str]) -> Dict[str, Callable[[Client], int]]:
+    def login(client: Client) -> int:
+        status, body = client.request("POST", "/api/auth/login", {"email": random.choice(emails), "password": PASSWORD})
+        if status == 200:
+            client.token = body["token"]
+        return status
+
+    def get(path: str) -> Callable[[Client], int]:
+        return lambda client: client.request("GET", path)[0]
+
+    return {
+        "login": login,
+        "models": get("/api/models/"),
+        "configurations": get("/api/models/configurations/"),
+        "data": get("/api/models/data/"),
+        "agents": get("/api/agents/"),
+        "datasets": get("/api/datasets/"),
+        "examples": lambda client: client.request("GET", f"/api/datasets/{random.choice(ids['datasets'])}/examples?size=10")[0],
+        "build": lambda client: client.request("POST", f"/api/models/build/{random.choice(ids['models'])}", {"size": 20})[0],
+    }
+
+def run(base_url: str, ids: Dict[str, List[Any]], emails: List[str], *, users: int, duration: float,
+        ramp_up: float, scenario: str, think_time: float, timeout: float) -> Tuple[Stats, float]:
+    weights = SCENARIOS[scenario]
+    actions = _actions(ids, emails)
+    names, cumulative = list(weights), list(weights.values())
+    stats = Stats()
+    stop = threading.Event()
+
+    def user(index: int) -> None:
+        time.sleep(ramp_up * index / max(1, users))
+        client = Client(base_url, timeout)
+        actions["login"](client)
+        while not stop.is_set():
+            name = random.choices(names, weights=cumulative)[0]
+            start = time.perf_counter()
+            try:
+                status = actions[name](client)
+            except Exception:
+                status = None
+            stats.record(name, time.perf_counter() - start, status)
+            if think_time:
+                time.sleep(random.expovariate(1 / think_time))
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=timeout)
+    return stats, time.perf_counter() - started
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+def report(stats: Stats, elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    for name, latencies in sorted(stats.latencies.items()):
+        latencies = sorted(latencies)
+        endpoints[name] = {
+            "requests": len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1e3, 2),
+            "p90_ms": round(_percentile(latencies, 0.90) * 1e3, 2),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1e3, 2),
+            "max_ms": round(latencies[-1] * 1e3, 2),
+            "error_rate": round(stats.errors[name] / len(latencies), 4),
+            "statuses": dict(stats.statuses[name]),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "error_rate": round(sum(stats.errors.values()) / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sardine HTTP load test")
+    parser.add_argument("--url", default=None, help="target an already running server instead of an in-process one")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="default")
+    parser.add_argument("--no-seed", action="store_true", help="reuse data already in --mongo-uri")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--ramp-up", type=float, default=5.0)
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between requests per user")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.url and not args.mongo_uri:
+        parser.error("--url needs --mongo-uri: the server and the harness must share a database")
+
+    app = create_bench_app(args.mongo_uri)
+    db = app.mongo_db
+    if args.no_seed:
+        ids = {name: [str(d["_id"]) for d in db[name].find({}, {"_id": 1})] for name in ("models", "datasets")}
+    else:
+        if args.mongo_uri:
+            for name in db.list_collection_names():
+                db.drop_collection(name)
+        ids = {k: [str(v) for v in values] for k, values in seed(db, SCALES[args.scale]).items()}
+    emails = [u["email"] for u in db["users"].find({}, {"email": 1})]
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs) -> None:
+                pass
+
+        server = make_server("127.0.0.1", args.port, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{args.scenario}: {args.users} users for {args.duration:.0f}s against {base_url}")
+    try:
+        stats, elapsed = run(
+            base_url, ids, emails,
+            users=args.users, duration=args.duration, ramp_up=args.ramp_up,
+            scenario=args.scenario, think_time=args.think_time, timeout=args.timeout,
+        )
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    result = report(stats, elapsed)
+    print(f"{'endpoint':<16} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<16} {e['requests']:>7} {e['throughput_rps']:>8.1f} {e['p50_ms']:>9.1f} {e['p90_ms']:>9.1f} {e['p99_ms']:>9.1f} {e['error_rate']:>8.2%}")
+    print(f"{'total':<16} {result['requests']:>7} {result['throughput_rps']:>8.1f} {'':>29} {result['error_rate']:>8.2%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"scenario": args.scenario, "users": args.users, **result}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
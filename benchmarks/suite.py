@@ -0,0 +1,106 @@
+"""Benchmark definitions. Each one returns (callable, items per call)."""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Tuple
+import copy
+
+from bson import ObjectId
+
+from src.app.models.service import ModelsService
+from src.helpers import utils
+from src.helpers.avatar import generate_avatar
+from src.helpers.base_dao import BaseDao
+
+from .fixtures import login
+
+Setup = Callable[[Dict[str, Any]], Tuple[Callable[[], Any], int]]
+
+BENCHMARKS: Dict[str, Setup] = {}
+
+def benchmark(name: str) -> Callable[[Setup], Setup]:
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+# -- Generation -------------------------------------------------------------
+def _configuration(ctx: Dict[str, Any], index: int) -> Tuple[ModelsService, dict]:
+    service = ModelsService(ctx["db"])
+    configuration = service.configurations_service.get_document(id=str(ctx["ids"]["models_configurations"][index]))
+    return service, configuration
+
+@benchmark("generation.build_model_configuration")
+def _build_model_configuration(ctx):
+    service, configuration = _configuration(ctx, 1)
+    batch = 50
+
+    def run():
+        for _ in range(batch):
+            service.build_model_configuration(copy.deepcopy(configuration))
+    return run, batch
+
+@benchmark("generation.build_model_configuration.nested")
+def _build_model_configuration_nested(ctx):
+    service, configuration = _configuration(ctx, 0)
+    batch = 50
+
+    def run():
+        for _ in range(batch):
+            service.build_model_configuration(copy.deepcopy(configuration))
+    return run, batch
+
+@benchmark("generation.build_model_entity")
+def _build_model_entity(ctx):
+    service, configuration = _configuration(ctx, 1)
+    model = ctx["db"]["models"].find_one({"_id": ctx["ids"]["models"][0]})
+    entities = model["entities"]
+    keys, mapping = list(entities.values()), {v: k for k, v in entities.items()}
+    samples = [service.build_model_configuration(copy.deepcopy(configuration)) for _ in range(200)]
+
+    def run():
+        for sample in samples:
+            service.build_model_entity(sample, keys, mapping)
+    return run, len(samples)
+
+# -- Serialization ----------------------------------------------------------
+@benchmark("serialize.large_document")
+def _serialize(ctx):
+    dao = BaseDao(ctx["db"])
+    document = {
+        "_id": ObjectId(),
+        "created_by": ObjectId(),
+        "attributes": [{"key": f"attr{i}", "ref": ObjectId(), "value": {"rule": "data", "parameters": {"object_id": ObjectId()}}} for i in range(2_000)],
+        "data": [f"value-{i}" for i in range(50_000)],
+    }
+    return (lambda: dao.serialize(document)), 1
+
+# -- Hashing ----------------------------------------------------------------
+@benchmark("utils.hash_password")
+def _hash_password(ctx):
+    apikey = utils.generate_apikey()
+    return (lambda: utils.hash_password("correct horse battery staple", apikey)), 1
+
+# -- Avatars ----------------------------------------------------------------
+@benchmark("avatar.generate.800")
+def _avatar_800(ctx):
+    return (lambda: generate_avatar("bench@sardine.io", 800).close()), 1
+
+@benchmark("avatar.generate.64")
+def _avatar_64(ctx):
+    return (lambda: generate_avatar("bench@sardine.io", 64).close()), 1
+
+# -- HTTP -------------------------------------------------------------------
+def _endpoint(path: str, headers: Dict[str, str] | None = None) -> Setup:
+    def setup(ctx):
+        client = ctx["app"].test_client()
+        auth = {**login(client), **(headers or {})}
+
+        def run():
+            response = client.get(path, headers=auth)
+            assert response.status_code in (200, 404), response.status_code
+        return run, 1
+    return setup
+
+for _path in ("/api/models/", "/api/models/configurations/", "/api/models/data/", "/api/agents/", "/api/datasets/"):
+    benchmark(f"http.GET {_path}")(_endpoint(_path))
+benchmark("http.GET /api/models/data/ (gzip)")(_endpoint("/api/models/data/", {"Accept-Encoding": "gzip"}))
@@ -1,6 +1,6 @@
 from dotenv import load_dotenv
 from datetime import timedelta
-import os
+import json, os
 
 load_dotenv()
 
@@ -8,6 +8,9 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY") or os.urandom(32).hex()
 
     MONGO_URI = os.getenv("MONGO_URI")
+    # per process: every gunicorn worker opens its own pool
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
 
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY") or SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=int(os.getenv("JWT_EXPIRES_DAYS", "2")))
@@ -15,6 +18,77 @@ class Config:
     JWT_TOKEN_LOCATION = ["headers"]
     JWT_HEADER_NAME = "Authorization"
     JWT_HEADER_TYPE = "Bearer"
+    # revocations made on one worker are seen by the others within this delay
+    JWT_BLOCKLIST_REFRESH_SECONDS = float(os.getenv("JWT_BLOCKLIST_REFRESH_SECONDS", "5"))
+
+    EMAIL_FILTER_ERROR_RATE = float(os.getenv("EMAIL_FILTER_ERROR_RATE", "0.001"))
+    EMAIL_FILTER_MIN_CAPACITY = int(os.getenv("EMAIL_FILTER_MIN_CAPACITY", "10000"))
+    EMAIL_FILTER_REFRESH_SECONDS = float(os.getenv("EMAIL_FILTER_REFRESH_SECONDS", "5"))
+
+    AVATAR_CACHE_FOLDER = os.getenv("AVATAR_CACHE_FOLDER", os.path.join("src", "public", "avatars", "cache"))
+    AVATAR_MAX_AGE = int(os.getenv("AVATAR_MAX_AGE", "300"))
+
+    # shared by gunicorn workers so /api/metrics reports every process
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # unset: /api/metrics needs an admin JWT
+
+    # admin-only "X-Profile: 1" header, or a random share of requests
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR")  # default: <instance path>/profiles, outside the static folder
+
+    # "documents": one datasets_data document per sample, "buckets": packed datasets_buckets
+    DATASET_LAYOUT = os.getenv("DATASET_LAYOUT", "documents")
+    # split ratios assigned at generation time, from a hash of each sample text
+    DATASET_SPLITS = json.loads(os.getenv("DATASET_SPLITS", '{"train": 0.8, "validation": 0.1, "test": 0.1}'))
+
+    PROGRESS_PUBLISH_SECONDS = float(os.getenv("PROGRESS_PUBLISH_SECONDS", "0.5"))
+    PROGRESS_PERSIST_SECONDS = float(os.getenv("PROGRESS_PERSIST_SECONDS", "2"))
+    PROGRESS_SSE_POLL_SECONDS = float(os.getenv("PROGRESS_SSE_POLL_SECONDS", "2"))
+    PROGRESS_SSE_KEEPALIVE_SECONDS = float(os.getenv("PROGRESS_SSE_KEEPALIVE_SECONDS", "15"))
+
+    # a "generating" build without heartbeat for this long is considered dead and can be resumed
+    BUILD_STALE_SECONDS = int(os.getenv("BUILD_STALE_SECONDS", "300"))
+    BUILD_CLEANUP_BATCH_SIZE = int(os.getenv("BUILD_CLEANUP_BATCH_SIZE", "5000"))
+    # "inline": the request generates the dataset; "queue": it is split in shards
+    # generated by `python worker.py` processes, on any host sharing the database
+    BUILD_EXECUTOR = os.getenv("BUILD_EXECUTOR", "inline")
+    BUILD_SHARD_SIZE = int(os.getenv("BUILD_SHARD_SIZE", "10000"))
+    BUILD_LEASE_SECONDS = int(os.getenv("BUILD_LEASE_SECONDS", "60"))
+    BUILD_MAX_ATTEMPTS = int(os.getenv("BUILD_MAX_ATTEMPTS", "5"))
+    BUILD_WORKER_POLL_SECONDS = float(os.getenv("BUILD_WORKER_POLL_SECONDS", "2"))
+
+    PREVIEW_MAX_SAMPLES = int(os.getenv("PREVIEW_MAX_SAMPLES", "2000"))
+    PREVIEW_MAX_SECONDS = float(os.getenv("PREVIEW_MAX_SECONDS", "10"))
+
+    # vocabularies up to this many values are cached whole during a build, larger ones are read per draw
+    DATA_SAMPLER_CACHE_VALUES = int(os.getenv("DATA_SAMPLER_CACHE_VALUES", "1000000"))
+    # appends to a vocabulary hold a write lease, taken over once it expires
+    DATA_APPEND_LEASE_SECONDS = int(os.getenv("DATA_APPEND_LEASE_SECONDS", "60"))
+
+    # streamed vocabulary uploads bypass MAX_CONTENT_LENGTH and are capped here instead
+    DATA_UPLOAD_MAX_BYTES = int(os.getenv("DATA_UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+    DATA_UPLOAD_DEDUPE_ERROR_RATE = float(os.getenv("DATA_UPLOAD_DEDUPE_ERROR_RATE", "0.00001"))
+    DATA_UPLOAD_DEDUPE_MIN_CAPACITY = int(os.getenv("DATA_UPLOAD_DEDUPE_MIN_CAPACITY", "100000"))
+
+    # read cache of reference collections (models, configurations, agents, data);
+    # without the change stream (replica set only) other workers' writes show up after the TTL
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+    QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "5"))
+    QUERY_CACHE_CHANGE_STREAM = os.getenv("QUERY_CACHE_CHANGE_STREAM", "false").lower() == "true"
+
+    # list responses past STREAM_BUFFER_SIZE bytes are streamed, STREAM_CHUNK_SIZE at a time
+    STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "262144"))
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "65536"))
+
+    # "shm": buckets shared by the workers of a host, "local": per process
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+    RATELIMIT_STORAGE = os.getenv("RATELIMIT_STORAGE", "shm")
+    RATELIMIT_BURST = float(os.getenv("RATELIMIT_BURST", "60"))
+    RATELIMIT_RATE = float(os.getenv("RATELIMIT_RATE", "1"))
+    # e.g. "X-Forwarded-For" behind RATELIMIT_TRUSTED_PROXIES reverse proxies
+    RATELIMIT_IP_HEADER = os.getenv("RATELIMIT_IP_HEADER")
+    RATELIMIT_TRUSTED_PROXIES = int(os.getenv("RATELIMIT_TRUSTED_PROXIES", "1"))
 
     MAX_CONTENT_LENGTH = 1024 * 1024 * 24
     CELERY_BROKER_URL = "redis://localhost:6379/0"
@@ -0,0 +1,41 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing, os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8888')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "4"))
+
+# Never import the app in the master: each worker runs create_app after the
+# fork and gets its own MongoClient and connection pool.
+preload_app = False
+
+# Drain in-flight requests on SIGTERM before killing workers.
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth from long builds.
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "200"))
+
+accesslog = "-"
+errorlog = "-"
+
+def post_fork(server, worker):
+    # Size the pool to what one worker can actually use: one connection per
+    # request thread, plus headroom for background monitors and builds.
+    os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(threads * 2 + 2))
+    os.environ.setdefault("MONGO_MIN_POOL_SIZE", "1")
+
+def child_exit(server, worker):
+    # runs in the master once the worker is gone: archive its metrics file
+    from src.helpers.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+def worker_exit(server, worker):
+    app = getattr(worker, "wsgi", None)
+    client = getattr(app, "mongo_client", None)
+    if client is not None:
+        client.close()
@@ -1,11 +1,14 @@
-from flask import Blueprint, Flask, jsonify
+from flask import Blueprint, Flask, current_app, jsonify, redirect, request, url_for
 from pymongo import MongoClient
 from pymongo.database import Database
 from typing import Type
-import atexit
+import atexit, hmac, os
 
 from config import Config as DefaultConfig
-from .extensions import cors, jwt, swaggerui_bp
+from .extensions import blocklist, compress, cors, jwt, limiter, metrics, profiler, swaggerui_bp
+from .helpers.avatar import legacy_avatar_path
+from .helpers.query_cache import query_cache
+from .helpers.utils import admin_required
 
 def create_app(config_object: Type[DefaultConfig] = DefaultConfig) -> Flask:
     app = Flask(__name__, static_folder="public", static_url_path="/public")
@@ -23,11 +26,30 @@ def create_app(config_object: Type[DefaultConfig] = DefaultConfig) -> Flask:
     jwt.init_app(app)
     _register_jwt_error_handlers(app)
 
-    mongo_client = MongoClient(app.config["MONGO_URI"])
+    # before_request hooks run in order: rejected requests cost nothing else.
+    # after_request hooks run in reverse: the profile covers everything below,
+    # and request latency includes compression
+    limiter.init_app(app)
+    profiler.init_app(app)
+    metrics.init_app(app)
+    compress.init_app(app)
+
+    # connect=False: no monitor threads or sockets until first use, so a client
+    # created before a fork is never shared live between worker processes
+    mongo_client = MongoClient(
+        app.config["MONGO_URI"],
+        maxPoolSize=app.config.get("MONGO_MAX_POOL_SIZE", 100),
+        minPoolSize=app.config.get("MONGO_MIN_POOL_SIZE", 0),
+        connect=False,
+        event_listeners=metrics.mongo_listeners(),
+    )
     db = mongo_client.get_database()
     app.mongo_client = mongo_client
     app.mongo_db = db
 
+    blocklist.init_app(app, db)
+    query_cache.init_app(app, db, registry=metrics.registry)
+
     atexit.register(mongo_client.close)
 
     _register_blueprints(app, db)
@@ -39,6 +61,20 @@ def _register_blueprints(app: Flask, db: Database) -> None:
     @api_bp.get("/")
     def root():
         return jsonify({"message": "'Gloup Gloup' I'm Sardine and this is my API !"}), 200
+
+    @api_bp.get("/metrics")
+    def prometheus_metrics():
+        # scrapers authenticate with METRICS_TOKEN; without one, admins only
+        token = current_app.config.get("METRICS_TOKEN")
+        if not token:
+            return admin_metrics()
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return jsonify({"error": "authorization_required"}), 401
+        return metrics.response()
+
+    @admin_required
+    def admin_metrics():
+        return metrics.response()
     
     from src.app.agents import create_agents_router
     api_bp.register_blueprint(create_agents_router(db), url_prefix="/agents")
@@ -58,15 +94,25 @@ def _register_blueprints(app: Flask, db: Database) -> None:
     from src.app.models import create_models_router
     api_bp.register_blueprint(create_models_router(db), url_prefix="/models")
 
+    from src.app.profiles import create_profiles_router
+    api_bp.register_blueprint(create_profiles_router(), url_prefix="/profiles")
+
     from src.app.users import create_users_router
     api_bp.register_blueprint(create_users_router(db), url_prefix="/users")
 
     app.register_blueprint(swaggerui_bp)
     app.register_blueprint(api_bp)
 
+    @app.get("/public/avatars/<id>.png")
+    def legacy_avatar(id: str):
+        # static URLs of avatars rendered at registration; newer users are rendered by the API
+        if os.path.isfile(legacy_avatar_path(app.static_folder, id)):
+            return app.send_static_file(f"avatars/{id}.png")
+        return redirect(url_for("api.users.find_avatar", id=id, size=800, format="png"))
+
 def _register_jwt_error_handlers(app: Flask):
     from flask import jsonify
-    from .extensions import jwt
+    from .extensions import blocklist, jwt
 
     @jwt.unauthorized_loader
     def _unauthorized(msg):
@@ -87,3 +133,7 @@ def _register_jwt_error_handlers(app: Flask):
     @jwt.revoked_token_loader
     def _revoked(jwt_header, jwt_payload):
         return jsonify({"error": "token_revoked"}), 401
+
+    @jwt.token_in_blocklist_loader
+    def _in_blocklist(jwt_header, jwt_payload):
+        return jwt_payload.get("jti") in blocklist
@@ -1,7 +1,8 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, request
 from pymongo.database import Database
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
+from src.helpers.streaming import json_list
 from src.helpers.utils import json_error
 from .service import AgentsService
 
@@ -12,9 +13,12 @@ def create_agents_router(db: Database) -> Blueprint:
     @bp.get("/")
     @jwt_required()
     def find_agents():
-        docs = service.find_all()
-        if not docs:
+        try:
+            response = json_list(service.find_all(request.args.get("fields")))
+        except ValueError as e:
+            return json_error(str(e))
+        if response is None:
             return json_error("Not found", 404)
-        return jsonify(docs), 200
+        return response, 200
 
     return bp
@@ -3,3 +3,4 @@ from src.helpers.base_dao import BaseDao
 
 class AgentsDao(BaseDao):
     collection_name = "agents"
+    cached = True
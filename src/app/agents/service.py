@@ -1,7 +1,8 @@
 from src.app.agents.dao import AgentsDao
+from src.app.models.dao import ModelsDao
 from src.helpers.base_service import BaseService
+from src.helpers.utils import batched
 from pymongo.database import Database
-from bson import ObjectId
 
 
 class AgentsService(BaseService):
@@ -9,31 +10,34 @@ class AgentsService(BaseService):
     def __init__(self, db: Database) -> None:
         super().__init__(db)
         self.dao = AgentsDao(self.db)
+        self.models_dao = ModelsDao(self.db)
 
-    def find_all(self):
-        agents = self.dao.find(projection={"path": 0})
-        models = []
-        for agent in agents:
-            model_data = {}
-            if agent.get("model"):
-                model_data = self.dao.serialize(
-                    self.dao.db["models"].find_one(
-                        {"_id": ObjectId(agent.get("model"))},
-                        projection={"mapper": 0, "configuration": 0, "entities": 0, "labels": 0, "randomizers": 0}
-                    )
-                )
-
-            if agent.get("created_by"):
-                model_data["created_by"] = self.dao.serialize(
-                    self.dao.db["users"].find_one(
-                        {"_id": ObjectId(agent.get("created_by"))},
-                        projection={"password": 0, "apikey": 0, "role": 0}
-                    )
-                )
-
-            model_data["agent"] = str(agent.get("_id"))
-            model_data["status"] = agent.get("status", "")
-            model_data["version"] = agent.get("version", "")
-            models.append(model_data)
-
-        return models
\ No newline at end of file
+    def find_all(self, fields: str = None):
+        # items are models overlaid with their agent's fields: select among the model's
+        fields = self.models_dao.select(fields, extra=("agent", "status"))
+        return self._find_all(fields)
+
+    def _find_all(self, fields):
+        agents_projection = {"path": 0} if fields is None else \
+            {"model": 1, **{name: 1 for name in ("status", "version", "created_by") if name in fields}}
+        models_projection = self.models_dao.projection(
+            fields and [name for name in fields if name not in ("agent", "status", "version")],
+            {"mapper": 0, "configuration": 0, "entities": 0, "labels": 0, "randomizers": 0},
+        )
+        users_projection = self.reference_projection(fields, "created_by", {"password": 0, "apikey": 0, "role": 0})
+
+        # models and users are looked up one query per batch, not per agent
+        for agents in batched(self.dao.find(projection=agents_projection), 100):
+            models = self.lookup("models", (a.get("model") for a in agents), projection=models_projection)
+            users = self.lookup("users", (a.get("created_by") for a in agents), projection=users_projection) \
+                if users_projection is not None else {}
+            for agent in agents:
+                model_data = dict(models.get(agent.get("model")) or {})
+
+                if agent.get("created_by"):
+                    model_data["created_by"] = users.get(agent.get("created_by"))
+
+                model_data["agent"] = str(agent.get("_id"))
+                model_data["status"] = agent.get("status", "")
+                model_data["version"] = agent.get("version", "")
+                yield self.dao.pick(model_data, fields)
\ No newline at end of file
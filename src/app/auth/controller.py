@@ -1,8 +1,9 @@
 from flask import Blueprint, jsonify, request
 from pymongo.database import Database
-from flask_jwt_extended import get_jwt_identity, jwt_required
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
 
-from src.helpers.utils import json_error
+from src.extensions import blocklist
+from src.helpers.utils import admin_required, json_error
 from .service import AuthService
 
 def create_auth_router(db: Database) -> Blueprint:
@@ -40,6 +41,32 @@ def create_auth_router(db: Database) -> Blueprint:
 
         return jsonify(user), 200
     
+    @bp.post("/logout")
+    @jwt_required()
+    def logout():
+        data = request.get_json(silent=True) or {}
+        try:
+            revoked = service.logout(get_jwt(), data.get("refresh_token"))
+        except ValueError as e:
+            return json_error(str(e))
+
+        return jsonify({"revoked": revoked}), 200
+
+    @bp.post("/revoke")
+    @admin_required
+    def revoke():
+        data = request.get_json(silent=True) or {}
+        if not data.get("jti"):
+            return json_error("jti is required")
+
+        service.revoke_token(data["jti"], user_id=data.get("user"))
+        return jsonify({"revoked": data["jti"]}), 200
+
+    @bp.get("/revoke/stats")
+    @admin_required
+    def revoke_stats():
+        return jsonify(blocklist.stats()), 200
+
     @bp.get("/email-exists")
     def email_exists():
         email = request.args.get("email")
@@ -49,4 +76,9 @@ def create_auth_router(db: Database) -> Blueprint:
         exists = service.email_exists(email)
         return jsonify({"exists": exists}), 200
 
+    @bp.get("/email-exists/stats")
+    @jwt_required()
+    def email_exists_stats():
+        return jsonify(service.email_filter().stats()), 200
+
     return bp
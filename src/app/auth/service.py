@@ -3,10 +3,13 @@ from src.app.users.dao import UsersDao
 from pymongo.database import Database
 from bson.objectid import ObjectId
 from src.helpers.base_service import BaseService
-from src.helpers.avatar import save_avatar, generate_avatar
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-import os
+from src.helpers.bloom import BloomFilter
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, jwt_required, get_jwt_identity
+from datetime import timedelta
+import threading, time
 
+from src.extensions import blocklist
 from src.helpers import utils
 
 class AuthService(BaseService):
@@ -15,6 +18,11 @@ class AuthService(BaseService):
         super().__init__(db)
         self.dao = UsersDao(self.db)
 
+        self._email_filter: BloomFilter | None = None
+        self._email_filter_synced_at = 0.0
+        self._email_filter_since = None
+        self._email_filter_lock = threading.Lock()
+
     def register(self, data: Dict[str, Any]) -> Dict[str, Any]:
         email = (data.get("email") or "").strip().lower()
 
@@ -38,15 +46,14 @@ class AuthService(BaseService):
             "apikey": apikey,
             "password": utils.hash_password(data["password"], apikey),
             "role": "user",
+            # rendered lazily by GET /api/users/<id>/avatar
+            "avatar": {"seed": email, "variant": 0},
         }
 
         user = self.dao.serialize(self.dao.insert_one(user))
 
-        save_avatar(
-            generate_avatar(email, 800),
-            os.path.join("src", "public", "avatars"),
-            f"{user['_id']}.png"
-        )
+        if self._email_filter is not None:
+            self._email_filter.add(email)
 
         token, refresh = self.token(user=user)
         user.pop("password", None)
@@ -85,6 +92,74 @@ class AuthService(BaseService):
         token, refresh = self.token(user=user)
         return {"token": token, "refresh_token": refresh, "user": user}
 
+    def logout(self, payload: Dict[str, Any], refresh_token: str = None) -> int:
+        """Revoke the calling access token and, when given, its refresh token."""
+        blocklist.revoke(payload["jti"], payload["exp"], user_id=payload["sub"], token_type=payload.get("type", "access"))
+        if not refresh_token:
+            return 1
+
+        try:
+            refresh = decode_token(refresh_token)
+        except Exception:
+            raise ValueError("Refresh token invalide")
+        if refresh.get("sub") != payload["sub"]:
+            raise ValueError("Refresh token invalide")
+
+        blocklist.revoke(refresh["jti"], refresh["exp"], user_id=refresh["sub"], token_type=refresh.get("type", "refresh"))
+        return 2
+
+    def revoke_token(self, jti: str, *, user_id: str = None) -> None:
+        # the token's exp is unknown here: keep the entry as long as any token can live
+        lifetime = max(current_app.config["JWT_ACCESS_TOKEN_EXPIRES"], current_app.config["JWT_REFRESH_TOKEN_EXPIRES"])
+        blocklist.revoke(jti, (utils.get_current_time() + lifetime).timestamp(), user_id=user_id, token_type="unknown")
+
     def email_exists(self, email: str) -> bool:
         email = email.strip().lower()
-        return self.document_exists(query={"email": email})
\ No newline at end of file
+        if email not in self.email_filter():
+            return False
+        return self.document_exists(query={"email": email})
+
+    def email_filter(self) -> BloomFilter:
+        """Per-process Bloom filter over registered emails.
+
+        Built on first use (after fork) and topped up every
+        EMAIL_FILTER_REFRESH_SECONDS with users inserted by other workers,
+        so a definite miss can only be stale for that long.
+        """
+        refresh = current_app.config.get("EMAIL_FILTER_REFRESH_SECONDS", 5)
+        if self._email_filter is not None and time.monotonic() - self._email_filter_synced_at < refresh:
+            return self._email_filter
+
+        with self._email_filter_lock:
+            if self._email_filter is None or len(self._email_filter) >= self._email_filter.capacity:
+                self._build_email_filter()
+            elif time.monotonic() - self._email_filter_synced_at >= refresh:
+                self._sync_email_filter()
+
+        return self._email_filter
+
+    def _build_email_filter(self) -> None:
+        error_rate = current_app.config.get("EMAIL_FILTER_ERROR_RATE", 0.001)
+        capacity = max(2 * self.dao.count(), current_app.config.get("EMAIL_FILTER_MIN_CAPACITY", 10_000))
+
+        since = utils.get_current_time()
+        email_filter = BloomFilter(capacity, error_rate)
+        for user in self.dao.col.find({}, {"_id": 0, "email": 1}):
+            if user.get("email"):
+                email_filter.add(user["email"])
+
+        self._email_filter = email_filter
+        self._email_filter_since = since
+        self._email_filter_synced_at = time.monotonic()
+
+    def _sync_email_filter(self) -> None:
+        # ObjectIds carry their creation time; go back a little to absorb clock skew between hosts
+        since = utils.get_current_time()
+        query = {"_id": {"$gte": ObjectId.from_datetime(self._email_filter_since - timedelta(seconds=60))}}
+        for user in self.dao.col.find(query, {"_id": 0, "email": 1}):
+            email = user.get("email")
+            if email and email not in self._email_filter:
+                self._email_filter.add(email)
+
+        self._email_filter_since = since
+        self._email_filter_synced_at = time.monotonic()
\ No newline at end of file
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from pymongo.database import Database
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
+from src.helpers.streaming import json_list
 from src.helpers.utils import json_error
 from .service import ConfigurationsService
 
@@ -12,10 +13,14 @@ def create_configurations_router(db: Database) -> Blueprint:
     @bp.get("/")
     @jwt_required()
     def find_configurations():
-        docs = service.dao.find_all()
-        if not docs:
+        try:
+            fields = service.dao.select(request.args.get("fields"))
+        except ValueError as e:
+            return json_error(str(e))
+        response = json_list(service.dao.find_all(fields=fields))
+        if response is None:
             return json_error("Not found", 404)
-        return jsonify(docs), 200
+        return response, 200
 
     @bp.post("/")
     @jwt_required()
@@ -29,7 +34,11 @@ def create_configurations_router(db: Database) -> Blueprint:
     @bp.get("/<id>")
     @jwt_required()
     def get_configuration(id):
-        doc = service.get_document(id=id)
+        try:
+            fields = service.dao.select(request.args.get("fields"))
+        except ValueError as e:
+            return json_error(str(e))
+        doc = service.get_document(id=id, projection=service.dao.projection(fields, {}))
         if not doc:
             return json_error("Not found", 404)
         return jsonify(doc), 200
@@ -1,7 +1,9 @@
-from src.helpers.base_dao import BaseDao
+from src.helpers.base_dao import BaseDao, Fields
 
 class ConfigurationsDao(BaseDao):
     collection_name = "models_configurations"
+    cached = True
+    fields = ("_id", "name", "description", "attributes", "formats", "randomizers", "possibilities", "created_by", "created_at")
 
-    def find_all(self, *, sort: str = "created_at") -> list[dict]:
-        return self.find(sort=[(sort, -1)], projection={"attributes": 0, "formats": 0, "randomizers": 0})
+    def find_all(self, *, sort: str = "created_at", fields: Fields | None = None) -> list[dict]:
+        return self.find(sort=[(sort, -1)], projection=self.projection(fields, {"attributes": 0, "formats": 0, "randomizers": 0}))
\ No newline at end of file
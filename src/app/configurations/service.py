@@ -61,8 +61,8 @@ class ConfigurationsService(BaseService):
                 data_id = parameters.get("object_id")
                 data = None
                 if data_id:
-                    data = self.db["models_data"].find_one({"_id": ObjectId(data_id)})
-                return len(data.get("data", [])) if data else 1
+                    data = self.db["models_data"].find_one({"_id": ObjectId(data_id)}, {"count": 1, "data": 1})
+                return data.get("count", len(data.get("data", []))) if data else 1
             case "configuration":
                 config_id = parameters.get("object_id")
                 if config_id:
@@ -2,9 +2,16 @@ from flask import Blueprint, jsonify, request
 from pymongo.database import Database
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
+from src.helpers.streaming import json_list
 from src.helpers.utils import json_error
 from .service import DataService
 
+UPLOAD_MIMETYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+}
+
 def create_data_router(db: Database) -> Blueprint:
     bp = Blueprint("models/data", __name__)
     service = DataService(db)
@@ -12,10 +19,15 @@ def create_data_router(db: Database) -> Blueprint:
     @bp.get("/")
     @jwt_required()
     def find_data():
-        docs = service.dao.find()
-        if not docs:
+        values = request.args.get("values", "false").lower() == "true"
+        try:
+            fields = service.dao.select(request.args.get("fields"), extra=("data",) if values else ())
+        except ValueError as e:
+            return json_error(str(e))
+        response = json_list(service.find_all(values=values, fields=fields))
+        if response is None:
             return json_error("Not found", 404)
-        return jsonify(docs), 200
+        return response, 200
 
     @bp.post("/")
     @jwt_required()
@@ -26,12 +38,79 @@ def create_data_router(db: Database) -> Blueprint:
         created = service.create(payload, user_id=get_jwt_identity())
         return jsonify(created), 201
 
+    @bp.post("/upload")
+    @jwt_required()
+    def upload_new_data():
+        name = request.args.get("name")
+        if not name:
+            return json_error("Bad request")
+        created = service.create({"name": name}, user_id=get_jwt_identity())
+        return _upload(created["_id"], 201)
+
+    @bp.post("/<id>/upload")
+    @jwt_required()
+    def upload_data(id):
+        try:
+            service.get_document(id=id, projection={"_id": 1})
+        except ValueError:
+            return json_error("Not found", 404)
+        return _upload(id, 200)
+
+    def _upload(data_id: str, status: int):
+        args = request.args
+        fmt = args.get("format") or UPLOAD_MIMETYPES.get(request.mimetype)
+        if not fmt:
+            return json_error("Unknown upload format, pass ?format=csv|jsonl")
+
+        column = args.get("column", "0")
+        try:
+            result = service.upload(
+                data_id,
+                request.stream,
+                format=fmt,
+                column=int(column) if column.isdigit() else column,
+                header=args.get("header", "true").lower() == "true",
+                field=args.get("field", "value"),
+                case=args.get("case"),
+                strip_accents=args.get("strip_accents", "false").lower() == "true",
+                dedupe=args.get("dedupe", "true").lower() == "true",
+                total_bytes=request.content_length,
+            )
+        except (UnicodeDecodeError, ValueError) as e:
+            return json_error(str(e))
+        return jsonify({"_id": str(data_id), **result}), status
+
     @bp.get("/<id>")
     @jwt_required()
     def get_data(id):
-        doc = service.get_document(id=id)
-        if not doc:
+        try:
+            fields = service.dao.select(request.args.get("fields"), extra=("data",))
+        except ValueError as e:
+            return json_error(str(e))
+        try:
+            doc = service.get_document(id=id)
+        except ValueError:
+            return json_error("Not found", 404)
+        # read before `count` is set: a legacy document is told apart by its missing count
+        if request.args.get("values", "true").lower() == "true" and (fields is None or "data" in fields):
+            doc["data"] = service.read_values(doc)
+        doc["count"] = service.count_values(doc)
+        return jsonify(service.dao.pick(doc, fields)), 200
+
+    @bp.get("/<id>/values")
+    @jwt_required()
+    def get_data_values(id):
+        offset = max(0, request.args.get("offset", 0, type=int))
+        limit = min(max(0, request.args.get("limit", 1000, type=int)), service.CHUNK_SIZE)
+        try:
+            doc = service.get_document(id=id)
+        except ValueError:
             return json_error("Not found", 404)
-        return jsonify(doc), 200
+        return jsonify({
+            "count": service.count_values(doc),
+            "offset": offset,
+            "limit": limit,
+            "values": service.read_values(doc, offset, limit),
+        }), 200
 
     return bp
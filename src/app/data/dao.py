@@ -1,5 +1,28 @@
-from src.helpers.base_dao import BaseDao
+from typing import Iterable
+
+from src.helpers.base_dao import BaseDao, Fields
 
 
 class DataDao(BaseDao):
     collection_name = "models_data"
+    cached = True
+    # legacy vocabularies keep their values inline: MBs per document
+    uncached_fields = ("data",)
+    fields = ("_id", "name", "count", "chunk_size", "created_by", "created_at")
+
+    def find_all(self, *, values: bool = False, sort: str = "created_at", fields: Fields | None = None) -> Iterable[dict]:
+        if values:
+            # whole documents for DataService.find_all to fill with their values:
+            # streamed from the cursor, too large to cache
+            return self.iter_find(sort=[(sort, -1)], projection=self.projection(fields), batch_size=50)
+        # legacy documents keep their values inline: count them server-side, never ship them
+        projection = self.projection(fields, {"data": 0, "appending": 0})
+        return self.cached_read(("find_all", sort, projection), lambda: self.serialize(list(self.col.aggregate([
+            {"$sort": {sort: -1}},
+            {"$addFields": {"count": {"$ifNull": ["$count", {"$size": {"$ifNull": ["$data", []]}}]}}},
+            {"$project": projection},
+        ]))))
+
+class DataChunksDao(BaseDao):
+    """Vocabulary values, CHUNK_SIZE per document, ordered by `seq`."""
+    collection_name = "models_data_chunks"
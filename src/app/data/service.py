@@ -1,14 +1,46 @@
-from .dao import DataDao
+from .dao import DataChunksDao, DataDao
+from pymongo import ASCENDING
 from pymongo.database import Database
 from bson.objectid import ObjectId
+from flask import current_app, has_app_context
+from src.helpers.base_dao import Fields
 from src.helpers.base_service import BaseService
+from src.helpers.bloom import ScalableBloomFilter
+from src.helpers.ingest import LineReader, iter_csv, iter_jsonl, normalize
+from src.helpers.progress import ProgressTracker, broker
 from src.helpers import utils
+from datetime import timedelta
+from typing import IO, Iterable, Iterator
+import random, time, uuid
 
 class DataService(BaseService):
+
+    CHUNK_SIZE = 10_000
+    # write lease of an append, renewed at each chunk
+    APPEND_LEASE_SECONDS = 60
+    # vocabularies up to this many values are cached whole by a build's sampler
+    SAMPLER_CACHE_VALUES = 1_000_000
+
+    _indexes_ready = False
     
     def __init__(self, db: Database) -> None:
         super().__init__(db)
         self.dao = DataDao(self.db)
+        self.chunks_dao = DataChunksDao(self.db)
+
+    def find_all(self, *, values: bool = False, fields: Fields | None = None) -> Iterable[dict]:
+        if not values:
+            return self.dao.find_all(fields=fields)
+        return self._find_all_values(fields)
+
+    def _find_all_values(self, fields: Fields | None) -> Iterator[dict]:
+        # whole vocabularies, one document at a time, read like GET /<id>
+        for doc in self.dao.find_all(values=True):
+            if fields is None or "data" in fields:
+                doc["data"] = self.read_values(doc)
+            doc["count"] = self.count_values(doc)
+            doc.pop("appending", None)
+            yield self.dao.pick(doc, fields)
 
     def create(
         self,
@@ -18,10 +50,298 @@ class DataService(BaseService):
     ) -> dict:
         doc = {
             "name": data.get("name"),
-            "data": data.get("data"),
+            "count": 0,
+            "chunk_size": self.CHUNK_SIZE,
             "created_at": utils.get_current_time(),
         }
 
         if user_id: doc["created_by"] = ObjectId(user_id)
 
-        return self.dao.insert_one(doc)
+        created = self.dao.insert_one(doc)
+        created["count"] = self.append_values(created["_id"], data.get("data") or [])
+        return created
+
+    def upload(
+        self,
+        data_id: str,
+        stream: IO[bytes],
+        *,
+        format: str = "csv",
+        column: str | int = 0,
+        header: bool = True,
+        field: str = "value",
+        case: str = None,
+        strip_accents: bool = False,
+        dedupe: bool = True,
+        total_bytes: int = None
+    ) -> dict:
+        """Append values parsed incrementally from a CSV or JSONL byte stream.
+
+        Values are normalized, deduplicated against the vocabulary and the
+        upload itself with a Bloom filter that grows with the upload (a false
+        positive drops a unique value, at most DATA_UPLOAD_DEDUPE_ERROR_RATE
+        of the time whatever its size), and written CHUNK_SIZE at a
+        time. Progress, in bytes read, is kept on the document's `upload`.
+        """
+        config = current_app.config
+        doc = self.get_document(id=data_id)
+
+        reader = LineReader(stream, limit=config.get("DATA_UPLOAD_MAX_BYTES"))
+        match format:
+            case "csv":
+                values = iter_csv(reader, column=column, header=header)
+            case "jsonl":
+                values = iter_jsonl(reader, field=field)
+            case _:
+                raise ValueError(f"Unknown upload format: {format}")
+
+        seen = None
+        if dedupe:
+            # a first guess only (chunked uploads have no length): the filter grows past it
+            capacity = max(
+                config.get("DATA_UPLOAD_DEDUPE_MIN_CAPACITY", 100_000),
+                self.count_values(doc) + (total_bytes or 0) // 10
+            )
+            seen = ScalableBloomFilter(capacity, config.get("DATA_UPLOAD_DEDUPE_ERROR_RATE", 1e-5))
+            seen.update(map(str, self.iter_values(doc)))
+
+        counts = {"values": 0, "duplicates": 0, "skipped": 0}
+        tracker = ProgressTracker(
+            str(data_id),
+            total_bytes,
+            status="uploading",
+            persist=lambda progress: self.dao.update_one({"_id": ObjectId(data_id)}, {"upload": {**progress, **counts}}),
+            publish_interval=config.get("PROGRESS_PUBLISH_SECONDS", 0.5),
+            persist_interval=config.get("PROGRESS_PERSIST_SECONDS", 2.0),
+        )
+        self.dao.update_one({"_id": ObjectId(data_id)}, {"status": "uploading"})
+
+        count = self.count_values(doc)
+        batch = []
+        try:
+            for raw in values:
+                value = normalize(raw, case=case, strip_accents=strip_accents)
+                if value is None:
+                    counts["skipped"] += 1
+                    continue
+                if seen is not None:
+                    if value in seen:
+                        counts["duplicates"] += 1
+                        continue
+                    seen.add(value)
+
+                batch.append(value)
+                if len(batch) >= self.CHUNK_SIZE:
+                    count = self.append_values(data_id, batch)
+                    counts["values"] += len(batch)
+                    batch = []
+                    tracker.advance(reader.bytes_read - tracker.done)
+
+            if batch:
+                count = self.append_values(data_id, batch)
+                counts["values"] += len(batch)
+        except Exception:
+            tracker.finish("failed")
+            broker.discard(str(data_id))
+            self.dao.update_one({"_id": ObjectId(data_id)}, {"status": "failed"})
+            raise
+
+        tracker.advance(reader.bytes_read - tracker.done)
+        tracker.total = tracker.done
+        tracker.finish("ready")
+        broker.discard(str(data_id))
+        self.dao.update_one({"_id": ObjectId(data_id)}, {"status": "ready"})
+
+        return {
+            **counts,
+            "count": count,
+            "bytes": reader.bytes_read,
+            "dedupe": seen.stats() if seen is not None else None,
+        }
+
+    # -- Values -------------------------------------------------------------
+    def append_values(self, data_id: str, values: list) -> int:
+        """Append values at the end of a vocabulary; returns its new count.
+
+        Appends hold a write lease on the vocabulary, so they never write the
+        same positions, and `count` only moves once the chunks are stored:
+        readers never see a position that is not written, and a failed or
+        interrupted append leaves the vocabulary as it was.
+        """
+        self._ensure_indexes()
+        values = list(values)
+        token, doc = self._claim_append(data_id)
+        data_id = ObjectId(data_id)
+        try:
+            if "count" in doc:
+                size, start = doc["chunk_size"], doc["count"]
+            else:
+                # created before chunked storage: the inline array moves out under the same lease
+                size, start = self.CHUNK_SIZE, 0
+                values = (doc.get("data") or []) + values
+            self._write_values(data_id, token, size, start, values)
+        except Exception:
+            self.dao.update_one({"_id": data_id, "appending.token": token}, {"$unset": {"appending": ""}}, set_operator=False)
+            raise
+
+        end = start + len(values)
+        update = {"$set": {"count": end, "chunk_size": size}, "$unset": {"appending": "", "data": ""}}
+        if values:
+            update["$set"]["updated_at"] = utils.get_current_time()
+        committed = self.dao.col.update_one({"_id": data_id, "appending.token": token}, update).matched_count
+        self.dao.invalidate()
+        if not committed:
+            raise ValueError("Vocabulary write lease expired, retry")
+        return end
+
+    def _claim_append(self, data_id: str) -> tuple:
+        """Take the write lease of a vocabulary, waiting while another append holds it."""
+        lease = self.APPEND_LEASE_SECONDS
+        if has_app_context():
+            lease = current_app.config.get("DATA_APPEND_LEASE_SECONDS", lease)
+        token = uuid.uuid4().hex
+        # an expired lease is taken over: its holder died or stopped at its next chunk
+        deadline = time.monotonic() + lease + 1
+        while True:
+            now = utils.get_current_time()
+            doc = self.dao.col.find_one_and_update(
+                {"_id": ObjectId(data_id), "$or": [{"appending": {"$exists": False}}, {"appending.expires_at": {"$lt": now}}]},
+                {"$set": {"appending": {"token": token, "expires_at": now + timedelta(seconds=lease)}}},
+                projection={"count": 1, "chunk_size": 1, "data": 1},
+            )
+            if doc is not None:
+                return token, doc
+            self.get_document(id=data_id, projection={"_id": 1})
+            if time.monotonic() > deadline:
+                raise ValueError("Vocabulary is being written, retry later")
+            time.sleep(0.05)
+
+    def _write_values(self, data_id: ObjectId, token: str, size: int, start: int, values: list) -> None:
+        # whole chunks replaced: a rerun after a failed append overwrites what it left past `count`
+        end = start + len(values)
+        for seq in range(start // size, (end - 1) // size + 1) if values else ():
+            lo, hi = max(start, seq * size), min(end, (seq + 1) * size)
+            kept = []
+            if lo > seq * size:
+                chunk = self.chunks_dao.col.find_one({"data": data_id, "seq": seq}, {"_id": 0, "values": 1})
+                kept = (chunk or {}).get("values", [])[:lo - seq * size]
+                if len(kept) != lo - seq * size:
+                    raise ValueError(f"Vocabulary {data_id} is missing values before {lo}")
+            if not self._renew_append(data_id, token):
+                raise ValueError("Vocabulary write lease expired, retry")
+            part = kept + values[lo - start:hi - start]
+            self.chunks_dao.col.replace_one(
+                {"data": data_id, "seq": seq},
+                {"data": data_id, "seq": seq, "n": len(part), "values": part},
+                upsert=True
+            )
+
+    def _renew_append(self, data_id: ObjectId, token: str) -> bool:
+        lease = self.APPEND_LEASE_SECONDS
+        if has_app_context():
+            lease = current_app.config.get("DATA_APPEND_LEASE_SECONDS", lease)
+        expires_at = utils.get_current_time() + timedelta(seconds=lease)
+        return bool(self.dao.col.update_one(
+            {"_id": data_id, "appending.token": token},
+            {"$set": {"appending.expires_at": expires_at}}
+        ).matched_count)
+
+    def count_values(self, doc: dict) -> int:
+        return doc["count"] if "count" in doc else len(doc.get("data") or [])
+
+    def read_values(self, doc: dict, offset: int = 0, limit: int = None) -> list:
+        """Values [offset, offset + limit) of a vocabulary, reading only the chunks they span."""
+        count = self.count_values(doc)
+        end = count if limit is None else min(count, offset + limit)
+        if offset >= end:
+            return []
+        if "count" not in doc:
+            return doc["data"][offset:end]
+
+        size = doc["chunk_size"]
+        cursor = self.chunks_dao.col.find(
+            {"data": ObjectId(doc["_id"]), "seq": {"$gte": offset // size, "$lte": (end - 1) // size}},
+            {"_id": 0, "seq": 1, "values": 1}
+        ).sort("seq", ASCENDING)
+
+        values = []
+        for chunk in cursor:
+            first = chunk["seq"] * size
+            values.extend(chunk["values"][max(0, offset - first):end - first])
+        if len(values) != end - offset:
+            raise ValueError(f"Vocabulary {doc['_id']} is missing values in [{offset}, {end})")
+        return values
+
+    def iter_values(self, doc: dict) -> Iterator:
+        if "count" not in doc:
+            yield from doc.get("data") or []
+            return
+        # chunks may hold values of a failed append past `count`
+        remaining = doc["count"]
+        cursor = self.chunks_dao.col.find({"data": ObjectId(doc["_id"])}, {"_id": 0, "values": 1}).sort("seq", ASCENDING)
+        for chunk in cursor:
+            if remaining <= 0:
+                break
+            yield from chunk["values"][:remaining]
+            remaining -= len(chunk["values"])
+
+    def value_at(self, doc: dict, index: int):
+        if "count" not in doc:
+            return doc["data"][index]
+        size = doc["chunk_size"]
+        chunk = self.chunks_dao.col.find_one(
+            {"data": ObjectId(doc["_id"]), "seq": index // size},
+            {"_id": 0, "values": {"$slice": [index % size, 1]}}
+        )
+        if not chunk or not chunk.get("values"):
+            raise ValueError(f"Vocabulary {doc['_id']} is missing value {index}")
+        return chunk["values"][0]
+
+    def sampler(self) -> "VocabularySampler":
+        # builds also run outside requests (workers, scripts, the bench suite)
+        cache_values = self.SAMPLER_CACHE_VALUES
+        if has_app_context():
+            cache_values = current_app.config.get("DATA_SAMPLER_CACHE_VALUES", cache_values)
+        return VocabularySampler(self, cache_values)
+
+    def _ensure_indexes(self) -> None:
+        if DataService._indexes_ready:
+            return
+        self.chunks_dao.col.create_index([("data", ASCENDING), ("seq", ASCENDING)], unique=True)
+        DataService._indexes_ready = True
+
+class VocabularySampler:
+    """Random vocabulary values for one build.
+
+    Vocabularies up to `cache_values` entries are loaded chunk by chunk on
+    first use and kept for the build; larger ones are read one value per
+    draw, so memory stays bounded whatever their size.
+    """
+
+    def __init__(self, service: DataService, cache_values: int) -> None:
+        self.service = service
+        self.cache_values = cache_values
+        self.docs = {}
+        self.chunks = {}
+
+    def choice(self, data_id: str, rng: random.Random = random):
+        doc = self.docs.get(data_id)
+        if doc is None:
+            doc = self.docs[data_id] = self.service.get_document(id=data_id)
+
+        count = self.service.count_values(doc)
+        if not count:
+            raise IndexError("Cannot choose from an empty vocabulary")
+        index = rng.randrange(count)
+
+        if "count" not in doc:
+            return doc["data"][index]
+        if count > self.cache_values:
+            return self.service.value_at(doc, index)
+
+        size = doc["chunk_size"]
+        chunk = self.chunks.get((data_id, index // size))
+        if chunk is None:
+            offset = index // size * size
+            chunk = self.chunks[(data_id, index // size)] = self.service.read_values(doc, offset, size)
+        return chunk[index % size]
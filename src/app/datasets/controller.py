@@ -1,9 +1,12 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from pymongo.database import Database
 from flask_jwt_extended import get_jwt_identity, jwt_required
+from itertools import chain
+import json
 
+from src.helpers.streaming import json_list
 from src.helpers.utils import json_error
-from .service import DatasetsService
+from .service import DatasetsService, SplitsPending
 
 def create_datasets_router(db: Database) -> Blueprint:
     bp = Blueprint("datasets", __name__)
@@ -12,25 +15,98 @@ def create_datasets_router(db: Database) -> Blueprint:
     @bp.get("/")
     @jwt_required()
     def find_datasets():
-        docs = service.find_all()
-        if not docs:
+        try:
+            response = json_list(service.find_all(request.args.get("fields")))
+        except ValueError as e:
+            return json_error(str(e))
+        if response is None:
             return json_error("Not found", 404)
-        return jsonify(docs), 200
+        return response, 200
     
     @bp.get("/<id>/examples")
     @jwt_required()
     def find_dataset_examples(id: str):
         size = request.args.get("size", type=int)
-        docs = service.find_examples(id, size)
+        try:
+            docs = service.find_examples(id, size, split=request.args.get("split"))
+        except SplitsPending as e:
+            return json_error(str(e), 409)
+        except ValueError as e:
+            return json_error(str(e))
         if not docs:
             return json_error("Not found", 404)
         return jsonify(docs), 200
     
+    @bp.get("/<id>/stats")
+    @jwt_required()
+    def find_dataset_stats(id: str):
+        try:
+            stats = service.find_stats(id)
+        except ValueError:
+            return json_error("Not found", 404)
+        return jsonify(stats), 200
+
+    @bp.get("/<id>/export")
+    @jwt_required()
+    def export_dataset(id: str):
+        try:
+            dataset = service.get_document(id=id)
+        except ValueError:
+            return json_error("Not found", 404)
+
+        split = request.args.get("split")
+        try:
+            data = service.iter_data(dataset, split=split)
+            first = next(data, None)  # surfaces an unknown split before streaming starts
+        except SplitsPending as e:
+            return json_error(str(e), 409)
+        except ValueError as e:
+            return json_error(str(e))
+
+        rows = data if first is None else chain((first,), data)
+        lines = (json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        filename = f"{id}-{split}.jsonl" if split else f"{id}.jsonl"
+        return Response(
+            stream_with_context(lines),
+            mimetype="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    @bp.get("/<id>/events")
+    @jwt_required()
+    def dataset_events(id: str):
+        try:
+            service.get_document(id=id, projection={"_id": 1})
+        except ValueError:
+            return json_error("Not found", 404)
+
+        return Response(
+            stream_with_context(service.generation_events(id)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @bp.post("/<id>/cancel")
+    @jwt_required()
+    def cancel_dataset_build(id: str):
+        try:
+            status = service.request_cancel(id)
+        except ValueError:
+            return json_error("Not found", 404)
+        if not status:
+            return json_error("Dataset is not generating", 409)
+        return jsonify({"status": status}), 200
+
     @bp.post("/train/<id>")
     @jwt_required()
     def train_dataset(id: str):
         parameters = request.get_json(silent=True) or {}
-        result = service.train_dataset(id, get_jwt_identity(), parameters)
+        try:
+            result = service.train_dataset(id, get_jwt_identity(), parameters)
+        except SplitsPending as e:
+            return json_error(str(e), 409)
+        except ValueError as e:
+            return json_error(str(e))
         if not result:
             return json_error("Not found", 404)
         return jsonify(result), 200
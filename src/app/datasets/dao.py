@@ -1,4 +1,12 @@
 from src.helpers.base_dao import BaseDao
 
 class DatasetsDao(BaseDao):
-    collection_name = "datasets"
\ No newline at end of file
+    collection_name = "datasets"
+
+class DatasetsBucketsDao(BaseDao):
+    """Bucketed layout: one document packs up to BUCKET_SIZE samples."""
+    collection_name = "datasets_buckets"
+
+class BuildShardsDao(BaseDao):
+    """Generation queue: one document per shard of a queued build, leased by workers."""
+    collection_name = "datasets_shards"
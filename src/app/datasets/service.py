@@ -1,57 +1,83 @@
 from src.helpers import utils
 from src.helpers.base_service import BaseService
-from .dao import DatasetsDao
+from src.helpers.buckets import pack_samples, unpack_samples
+from src.helpers.progress import broker
+from src.helpers.splits import assign_split, normalize_ratios
+from src.helpers.stats import DatasetStats
+from src.app.models.dao import ModelsDao
+from .dao import BuildShardsDao, DatasetsBucketsDao, DatasetsDao
+import bson
 from bson import ObjectId
+from datetime import timedelta, timezone
+from flask import current_app
+from itertools import islice
+from pymongo import ASCENDING, ReturnDocument
 from pymongo.database import Database
-import random
+from typing import Iterator
+import json, random, threading, time, uuid
+
+class SplitsPending(ValueError):
+    """Splits of a dataset are still being assigned in the background."""
+
 
 class DatasetsService(BaseService):
-    
+
+    LAYOUTS = ("documents", "buckets")
+    BUCKET_SIZE = 500
+
+    _indexes_ready = False
+    _shard_indexes_ready = False
+
     def __init__(self, db: Database) -> None:
         super().__init__(db)
         self.dao = DatasetsDao(db)
+        self.buckets_dao = DatasetsBucketsDao(db)
+        self.shards_dao = BuildShardsDao(db)
 
-    def find_all(self):
-        datasets = self.dao.find({"status": {"$ne": "completed"}}, projection={"parameters": 0, "last_log": 0})
-        models = []
-        for dataset in datasets:
-            model_data = {}
-            if dataset.get("model"):
-                model_data = self.dao.serialize(
-                    self.dao.db["models"].find_one(
-                        {"_id": ObjectId(dataset.get("model"))},
-                        projection={"mapper": 0, "configuration": 0, "entities": 0, "labels": 0, "randomizers": 0}
-                    )
-                )
+    # list items are models overlaid with these fields of their dataset
+    LIST_FIELDS = ("dataset", "status", "version", "progress", "generation")
 
-            if dataset.get("created_by"):
-                model_data["created_by"] = self.dao.serialize(
-                    self.dao.db["users"].find_one(
-                        {"_id": ObjectId(dataset.get("created_by"))},
-                        projection={"password": 0, "apikey": 0, "role": 0}
-                    )
-                )
+    def find_all(self, fields: str = None):
+        fields = ModelsDao(self.db).select(fields, extra=self.LIST_FIELDS)
+        return self._find_all(fields)
 
-            model_data["dataset"] = str(dataset.get("_id"))
-            model_data["status"] = dataset.get("status", "")
-            model_data["version"] = dataset.get("version", "")
-            model_data["progress"] = dataset.get("progress", None)
-            models.append(model_data)
+    def _find_all(self, fields):
+        datasets_projection = {"parameters": 0, "last_log": 0, "stats": 0} if fields is None else \
+            {"model": 1, **{name: 1 for name in (*self.LIST_FIELDS[1:], "created_by") if name in fields}}
+        models_projection = ModelsDao.projection(
+            fields and [name for name in fields if name not in self.LIST_FIELDS],
+            {"mapper": 0, "configuration": 0, "entities": 0, "labels": 0, "randomizers": 0},
+        )
+        users_projection = self.reference_projection(fields, "created_by", {"password": 0, "apikey": 0, "role": 0})
 
-        return models
+        # read from the cursor, models and users looked up one query per batch
+        datasets = self.dao.iter_find({"status": {"$ne": "completed"}}, projection=datasets_projection)
+        for batch in utils.batched(datasets, 100):
+            models = self.lookup("models", (d.get("model") for d in batch), projection=models_projection)
+            users = self.lookup("users", (d.get("created_by") for d in batch), projection=users_projection) \
+                if users_projection is not None else {}
+            for dataset in batch:
+                model_data = dict(models.get(dataset.get("model")) or {})
+
+                if dataset.get("created_by"):
+                    model_data["created_by"] = users.get(dataset.get("created_by"))
+
+                model_data["dataset"] = str(dataset.get("_id"))
+                model_data["status"] = dataset.get("status", "")
+                model_data["version"] = dataset.get("version", "")
+                model_data["progress"] = dataset.get("progress", None)
+                model_data["generation"] = dataset.get("generation", None)
+                yield self.dao.pick(model_data, fields)
     
-    def find_examples(self, dataset_id: str, size: int = 10):
+    def find_examples(self, dataset_id: str, size: int = 10, *, split: str = None):
         dataset = self.get_document(id=dataset_id)
         model = self.dao.db["models"].find_one({"_id": ObjectId(dataset.get("model"))})
 
-        dataset_data = list(self.dao.db["datasets_data"].find({"dataset": ObjectId(dataset_id)}))
-    
-        ddselected = random.choices(dataset_data, k=size)
+        ddselected = self.sample_data(dataset, size or 10, split=split)
         entities = model.get("entities", []) if model else []
 
         examples = []
-        for d in ddselected:
-            data = d.get("data", {})
+        for data in ddselected:
             text = data.get("text", "")
 
             example_entities = []
@@ -70,6 +96,212 @@ class DatasetsService(BaseService):
         
         return examples
 
+    def find_stats(self, dataset_id: str) -> dict:
+        dataset = self.get_document(id=dataset_id, projection={"stats": 1, "layout": 1, "splits": 1})
+        if dataset.get("stats"):
+            return {**DatasetStats.from_document(dataset["stats"]).summary(), "splits": self.count_splits(dataset)}
+
+        # datasets built before streaming stats existed: one backfill scan, then stored
+        stats = DatasetStats()
+        for data in self.iter_data(dataset):
+            stats.observe({}, data)
+        self.update_stats(dataset_id, stats)
+        return {**stats.summary(), "splits": self.count_splits(dataset), "backfilled": True}
+
+    def update_stats(self, dataset_id: str, stats: DatasetStats):
+        return self.dao.update_one({"_id": ObjectId(dataset_id)}, {"stats": stats.to_document()})
+
+    # -- Storage ------------------------------------------------------------
+    def layout(self, requested: str = None) -> str:
+        layout = requested or current_app.config.get("DATASET_LAYOUT", "documents")
+        if layout not in self.LAYOUTS:
+            raise ValueError(f"Unknown dataset layout: {layout}")
+        return layout
+
+    def iter_data(self, dataset: dict, *, batch_size: int = 1000, split: str = None) -> Iterator[dict]:
+        """Yield every sample of a dataset (or of one split), whatever its storage layout."""
+        query = self._data_query(dataset, split)
+
+        if dataset.get("layout") == "buckets":
+            cursor = self.buckets_dao.col.find(query, {"texts": 1, "labels": 1, "entities": 1}) \
+                .sort("seq", ASCENDING).batch_size(max(1, batch_size // self.BUCKET_SIZE))
+            for bucket in cursor:
+                yield from unpack_samples(bucket["texts"], bucket["labels"], bucket["entities"])
+            return
+
+        cursor = self.db["datasets_data"].find(query, {"_id": 0, "data": 1}).batch_size(batch_size)
+        for doc in cursor:
+            yield doc.get("data", {})
+
+    def sample_data(self, dataset: dict, size: int, *, split: str = None) -> list[dict]:
+        match = {"$match": self._data_query(dataset, split)}
+
+        if dataset.get("layout") == "buckets":
+            buckets = list(self.buckets_dao.col.aggregate([match, {"$sample": {"size": size}}]))
+            samples = []
+            for i in range(size if buckets else 0):
+                bucket = buckets[i % len(buckets)]
+                unpacked = unpack_samples(bucket["texts"], bucket["labels"], bucket["entities"])
+                samples.append(next(islice(unpacked, random.randrange(bucket["n"]), None)))
+            return samples
+
+        docs = self.db["datasets_data"].aggregate([match, {"$sample": {"size": size}}, {"$project": {"_id": 0, "data": 1}}])
+        return [d.get("data", {}) for d in docs]
+
+    def split_ratios(self, requested: dict = None) -> dict:
+        return normalize_ratios(requested or current_app.config.get("DATASET_SPLITS"))
+
+    def materialize_splits(self, dataset: dict) -> dict:
+        """Assign splits to a dataset generated before they existed: one scan, then stored.
+
+        The scan rewrites the whole dataset, so it is claimed by a single reader and
+        run in a background thread; until the splits are stored, reads raise SplitsPending.
+        """
+        if dataset.get("splits"):
+            return dataset["splits"]
+        if dataset.get("status") in ("generating", "cancelled", "failed"):
+            raise ValueError("Dataset build is not finished")
+
+        dataset_id = ObjectId(dataset["_id"])
+        now = utils.get_current_time()
+        stale = now - timedelta(seconds=current_app.config.get("BUILD_STALE_SECONDS", 300))
+        token = uuid.uuid4().hex
+        # a claim whose heartbeat stopped is taken over, its journal ("group", "splits") kept
+        claimed = self.dao.col.find_one_and_update(
+            {
+                "_id": dataset_id,
+                "splits": {"$exists": False},
+                "$or": [
+                    {"splits_migration.token": {"$exists": False}},
+                    {"splits_migration.heartbeat_at": {"$lt": stale}},
+                ],
+            },
+            {"$set": {"splits_migration.token": token, "splits_migration.heartbeat_at": now}},
+            projection={"layout": 1, "splits_migration": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if claimed is None:
+            current = self.dao.col.find_one({"_id": dataset_id}, {"splits": 1})
+            if current and current.get("splits"):
+                dataset["splits"] = current["splits"]
+                return current["splits"]
+            raise SplitsPending("Dataset splits are being assigned, retry shortly")
+
+        app = current_app._get_current_object()
+        threading.Thread(
+            target=self._run_split_migration, args=(app, claimed, token), name=f"splits-{dataset_id}", daemon=True
+        ).start()
+        raise SplitsPending("Dataset splits are being assigned, retry shortly")
+
+    def _run_split_migration(self, app, dataset: dict, token: str) -> None:
+        dataset_id = dataset["_id"]
+        migration = dataset.get("splits_migration", {})
+        with app.app_context():
+            try:
+                splits = migration.get("splits") or self.split_ratios()
+                if not self._renew_split_claim(dataset_id, token, {"splits_migration.splits": splits}):
+                    return
+                if dataset.get("layout") == "buckets":
+                    done = self._repack_buckets(dataset_id, token, splits, migration.get("group"))
+                else:
+                    done = self._assign_document_splits(dataset_id, token, splits)
+                if done:
+                    self.dao.update_one(
+                        {"_id": dataset_id, "splits_migration.token": token},
+                        {"$set": {"splits": splits}, "$unset": {"splits_migration": ""}},
+                        set_operator=False,
+                    )
+            except Exception:
+                app.logger.exception("Split assignment of dataset %s failed", dataset_id)
+                # released: the next read claims it again and resumes from the journal
+                self.dao.update_one(
+                    {"_id": dataset_id, "splits_migration.token": token},
+                    {"$unset": {"splits_migration.token": ""}},
+                    set_operator=False,
+                )
+
+    def _renew_split_claim(self, dataset_id: ObjectId, token: str, journal: dict = None) -> bool:
+        """Heartbeat of a split migration; False once another process took it over."""
+        # matched, not modified: two heartbeats in the same millisecond write the same value
+        return self.dao.col.update_one(
+            {"_id": dataset_id, "splits_migration.token": token},
+            {"$set": {"splits_migration.heartbeat_at": utils.get_current_time(), **(journal or {})}},
+        ).matched_count > 0
+
+    def _repack_buckets(self, dataset_id: ObjectId, token: str, splits: dict, pending: list = None) -> bool:
+        # a bucket holds a single split: repack the unsplit ones a few at a time
+        step = max(1, current_app.config.get("BUILD_CLEANUP_BATCH_SIZE", 5000) // self.BUCKET_SIZE)
+        if pending:
+            # a previous run stopped inside this group: its old buckets are deleted only once
+            # the new ones are all inserted, so any missing old bucket means the new ones are complete
+            if self.buckets_dao.col.count_documents({"_id": {"$in": pending}}) == len(pending):
+                self.buckets_dao.col.delete_many({"dataset": dataset_id, "migration": pending[0]})
+            else:
+                self.buckets_dao.col.delete_many({"_id": {"$in": pending}})
+
+        while True:
+            group = [
+                b["_id"]
+                for b in self.buckets_dao.col.find({"dataset": dataset_id, "split": {"$exists": False}}, {"_id": 1})
+                .sort("seq", ASCENDING)
+                .limit(step)
+            ]
+            if not group:
+                return True
+            # journal the group before writing, the new buckets are tagged with its first id
+            if not self._renew_split_claim(dataset_id, token, {"splits_migration.group": group}):
+                return False
+            samples = [
+                sample
+                for bucket in self.buckets_dao.col.find({"_id": {"$in": group}}).sort("seq", ASCENDING)
+                for sample in unpack_samples(bucket["texts"], bucket["labels"], bucket["entities"])
+            ]
+            self._add_buckets(dataset_id, samples, utils.get_current_time(), {"batch": None, "migration": group[0]}, splits)
+            self.buckets_dao.col.delete_many({"_id": {"$in": group}})
+
+    def _assign_document_splits(self, dataset_id: ObjectId, token: str, splits: dict) -> bool:
+        # setting the split is idempotent: a resumed run simply sets it again
+        size = current_app.config.get("BUILD_CLEANUP_BATCH_SIZE", 5000)
+        pending = {name: [] for name in splits}
+
+        def flush(name: str) -> bool:
+            self.db["datasets_data"].update_many({"_id": {"$in": pending[name]}}, {"$set": {"split": name}})
+            pending[name] = []
+            return self._renew_split_claim(dataset_id, token)
+
+        for doc in self.db["datasets_data"].find({"dataset": dataset_id}, {"data.text": 1}):
+            name = assign_split(doc.get("data", {}).get("text", ""), splits)
+            pending[name].append(doc["_id"])
+            if len(pending[name]) >= size and not flush(name):
+                return False
+        for name in splits:
+            if pending[name] and not flush(name):
+                return False
+        return True
+
+    def _data_query(self, dataset: dict, split: str = None) -> dict:
+        if split is None:
+            return {"dataset": ObjectId(dataset["_id"])}
+        if split not in (dataset.get("splits") or self.materialize_splits(dataset)):
+            raise ValueError(f"Unknown split: {split}")
+        # one range scan of the (dataset, split) index
+        return {"dataset": ObjectId(dataset["_id"]), "split": split}
+
+    def count_splits(self, dataset: dict) -> dict | None:
+        if not dataset.get("splits"):
+            return None
+        if dataset.get("layout") == "buckets":
+            rows = self.buckets_dao.col.aggregate([
+                {"$match": {"dataset": ObjectId(dataset["_id"])}},
+                {"$group": {"_id": "$split", "n": {"$sum": "$n"}}},
+            ])
+            counts = {row["_id"]: row["n"] for row in rows}
+            return {name: counts.get(name, 0) for name in dataset["splits"]}
+        return {
+            name: self.db["datasets_data"].count_documents({"dataset": ObjectId(dataset["_id"]), "split": name})
+            for name in dataset["splits"]
+        }
+
     def add_data(self, dataset_id: str, data: dict):
         return self.db["datasets_data"].insert_one({
             "dataset": ObjectId(dataset_id),
@@ -77,6 +309,471 @@ class DatasetsService(BaseService):
             "created_at": utils.get_current_time()
         })
 
+    def add_data_many(
+        self,
+        dataset_id: str,
+        data: list[dict],
+        *,
+        layout: str = "documents",
+        batch: int = None,
+        shard: str = None,
+        attempt: int = None,
+        splits: dict = None
+    ) -> int:
+        self._ensure_indexes()
+        now = utils.get_current_time()
+        # queued builds: rows are owned by a shard and the lease attempt that wrote them
+        tags = {"batch": batch, "shard": ObjectId(shard), "attempt": attempt} if shard else {"batch": batch}
+
+        if layout == "buckets":
+            inserted = self._add_buckets(dataset_id, data, now, tags, splits)
+        else:
+            inserted = len(self.db["datasets_data"].insert_many([
+                {
+                    "dataset": ObjectId(dataset_id),
+                    "data": d,
+                    **({"split": assign_split(d["text"], splits)} if splits else {}),
+                    **tags,
+                    "created_at": now,
+                }
+                for d in data
+            ]).inserted_ids)
+
+        self.dao.update_one({"_id": ObjectId(dataset_id)}, {"$inc": {"samples": inserted}}, set_operator=False)
+        return inserted
+
+    def _add_buckets(self, dataset_id: str, data: list[dict], now, tags: dict, splits: dict = None) -> int:
+        # a bucket holds a single split, so a split is read without unpacking the others
+        groups = {}
+        for d in data:
+            groups.setdefault(assign_split(d["text"], splits) if splits else None, []).append(d)
+
+        chunks = [
+            (split, group[i:i + self.BUCKET_SIZE])
+            for split, group in groups.items()
+            for i in range(0, len(group), self.BUCKET_SIZE)
+        ]
+        if not chunks:
+            return 0
+
+        # reserve a contiguous range of bucket sequence numbers
+        reserved = self.dao.col.find_one_and_update(
+            {"_id": ObjectId(dataset_id)},
+            {"$inc": {"buckets": len(chunks)}},
+            projection={"buckets": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        first = reserved["buckets"] - len(chunks)
+
+        buckets = []
+        for i, (split, chunk) in enumerate(chunks):
+            texts, labels, entities = pack_samples(chunk)
+            buckets.append({
+                "dataset": ObjectId(dataset_id),
+                "seq": first + i,
+                "n": len(chunk),
+                "texts": texts,
+                "labels": labels,
+                "entities": entities,
+                **({"split": split} if split else {}),
+                **tags,
+                "created_at": now,
+            })
+        self.buckets_dao.insert_many(buckets)
+        return len(data)
+
+    def sample_bytes(self, data: list[dict]) -> dict:
+        """Average stored BSON size per sample, for each layout, without writing anything."""
+        if not data:
+            return {layout: 0 for layout in self.LAYOUTS}
+
+        now = utils.get_current_time()
+        dataset_id = ObjectId()
+        documents = sum(
+            len(bson.encode({"_id": ObjectId(), "dataset": dataset_id, "data": d, "batch": 0, "created_at": now}))
+            for d in data
+        )
+        buckets = 0
+        for i in range(0, len(data), self.BUCKET_SIZE):
+            chunk = data[i:i + self.BUCKET_SIZE]
+            texts, labels, entities = pack_samples(chunk)
+            buckets += len(bson.encode({
+                "_id": ObjectId(), "dataset": dataset_id, "seq": 0, "n": len(chunk),
+                "texts": texts, "labels": labels, "entities": entities, "batch": 0, "created_at": now,
+            }))
+        return {"documents": round(documents / len(data), 1), "buckets": round(buckets / len(data), 1)}
+
+    def _ensure_indexes(self) -> None:
+        if DatasetsService._indexes_ready:
+            return
+        self.db["datasets_data"].create_index([("dataset", ASCENDING)])
+        self.db["datasets_data"].create_index([("dataset", ASCENDING), ("split", ASCENDING)])
+        self.buckets_dao.col.create_index([("dataset", ASCENDING), ("seq", ASCENDING)], unique=True)
+        self.buckets_dao.col.create_index([("dataset", ASCENDING), ("split", ASCENDING), ("seq", ASCENDING)])
+        DatasetsService._indexes_ready = True
+
+    def find_by_fingerprint(self, model_id: str, fingerprint: str) -> dict | None:
+        datasets = self.dao.find(
+            {"model": ObjectId(model_id), "fingerprint": fingerprint, "status": "generated"},
+            sort=[("created_at", -1)],
+            limit=1
+        )
+        return datasets[0] if datasets else None
+
+    def count_samples(self, dataset: dict) -> int:
+        if "samples" in dataset:
+            return int(dataset["samples"])
+        return self.db["datasets_data"].count_documents({"dataset": ObjectId(dataset["_id"])})
+
+    def update_generation(self, dataset_id: str, progress: dict) -> bool:
+        """Persist build progress and heartbeat; True when a cancel was requested."""
+        # "progress" is owned by the training worker: build progress lives beside it
+        dataset = self.dao.col.find_one_and_update(
+            {"_id": ObjectId(dataset_id)},
+            {"$set": {"generation": progress, "heartbeat_at": utils.get_current_time()}},
+            projection={"cancel_requested": 1},
+        )
+        return bool(dataset and dataset.get("cancel_requested"))
+
+    # -- Checkpoints --------------------------------------------------------
+    def save_checkpoint(self, dataset_id: str, checkpoint: dict, stats: DatasetStats):
+        now = utils.get_current_time()
+        return self.dao.update_one(
+            {"_id": ObjectId(dataset_id)},
+            {"checkpoint": {**checkpoint, "updated_at": now}, "stats": stats.to_document(), "heartbeat_at": now}
+        )
+
+    def request_cancel(self, dataset_id: str) -> str | None:
+        """Flag a running build for cancellation; returns the resulting status.
+
+        A build whose heartbeat is older than BUILD_STALE_SECONDS has no
+        process left to see the flag, so it is marked cancelled directly.
+        """
+        dataset = self.get_document(id=dataset_id, projection={"status": 1, "heartbeat_at": 1, "checkpoint.mode": 1})
+        if dataset.get("status") != "generating":
+            return None
+        if dataset.get("checkpoint", {}).get("mode") == "queue":
+            # queued shards never start, running ones stop at their next heartbeat
+            self.dao.update_one({"_id": ObjectId(dataset_id), "status": "generating"}, {"cancel_requested": True})
+            self.shards_dao.col.update_many(
+                {"dataset": ObjectId(dataset_id), "status": "pending"},
+                {"$set": {"status": "cancelled", "updated_at": utils.get_current_time()}},
+            )
+            return self.finalize_queued_build(dataset_id) or "cancelling"
+        if self._is_stale(dataset):
+            self.update_status(dataset_id, "cancelled")
+            return "cancelled"
+        self.dao.update_one({"_id": ObjectId(dataset_id), "status": "generating"}, {"cancel_requested": True})
+        return "cancelling"
+
+    def claim_resume(self, dataset_id: str) -> dict | None:
+        """Atomically move a cancelled, failed or stale build back to "generating"."""
+        stale = utils.get_current_time() - timedelta(seconds=current_app.config.get("BUILD_STALE_SECONDS", 300))
+        return self.dao.serialize(self.dao.col.find_one_and_update(
+            {
+                "_id": ObjectId(dataset_id),
+                "checkpoint": {"$exists": True},
+                "$or": [
+                    {"status": {"$in": ["cancelled", "failed"]}},
+                    {"status": "generating", "heartbeat_at": {"$lt": stale}},
+                ],
+            },
+            {
+                "$set": {"status": "generating", "heartbeat_at": utils.get_current_time()},
+                "$unset": {"cancel_requested": ""},
+            },
+            projection={"parameters": 0, "last_log": 0},
+            return_document=ReturnDocument.AFTER,
+        ))
+
+    def discard_uncommitted(self, dataset: dict) -> int:
+        """Delete samples written after the last checkpoint and reset the counters."""
+        dataset_id = ObjectId(dataset["_id"])
+        # rows of queued builds number their batches per shard: never theirs to discard
+        query = {"dataset": dataset_id, "batch": {"$gte": dataset["checkpoint"]["batches"]}, "shard": {"$exists": False}}
+
+        deleted = self._delete_batched(self._data_col(dataset), query)
+
+        update = {"samples": dataset["checkpoint"]["samples"]}
+        if dataset.get("layout") == "buckets":
+            last = self.buckets_dao.col.find_one({"dataset": dataset_id}, {"seq": 1}, sort=[("seq", -1)])
+            update["buckets"] = last["seq"] + 1 if last else 0
+        self.dao.update_one({"_id": dataset_id}, update)
+        return deleted
+
+    def _delete_batched(self, col, query: dict) -> int:
+        """Delete matching rows; returns the number of samples they held."""
+        # bounded deletes keep each write short instead of one long-running delete_many
+        size = current_app.config.get("BUILD_CLEANUP_BATCH_SIZE", 5000)
+        deleted = 0
+        while True:
+            docs = list(col.find(query, {"_id": 1, "n": 1}).limit(size))
+            if not docs:
+                return deleted
+            col.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            deleted += sum(doc.get("n", 1) for doc in docs)  # a bucket holds n samples
+
+    def _data_col(self, dataset: dict):
+        return self.buckets_dao.col if dataset.get("layout") == "buckets" else self.db["datasets_data"]
+
+    def _is_stale(self, dataset: dict) -> bool:
+        heartbeat = dataset.get("heartbeat_at")
+        if heartbeat is None:
+            return True
+        if heartbeat.tzinfo is None:  # pymongo hands back naive UTC datetimes
+            heartbeat = heartbeat.replace(tzinfo=timezone.utc)
+        stale = timedelta(seconds=current_app.config.get("BUILD_STALE_SECONDS", 300))
+        return utils.get_current_time() - heartbeat > stale
+
+    # -- Build queue --------------------------------------------------------
+    def enqueue_shards(self, dataset_id: str, build: str, first: int, target: int, *, seed: str) -> int:
+        """Queue samples [first, target) of a build as shards of BUILD_SHARD_SIZE."""
+        self._ensure_shard_indexes()
+        size = max(1, int(current_app.config.get("BUILD_SHARD_SIZE", 10_000)))
+        now = utils.get_current_time()
+        shards = [{
+            "dataset": ObjectId(dataset_id),
+            "build": build,
+            "shard": k,
+            "first": start,
+            "size": min(size, target - start),
+            "seed": f"{seed}:{k}",
+            "status": "pending",
+            "attempts": 0,
+            "checkpoint": {"samples": 0, "batches": 0, "rng": None},
+            "created_at": now,
+            "updated_at": now,
+        } for k, start in enumerate(range(first, target, size))]
+        return self.shards_dao.insert_many(shards) if shards else 0
+
+    def claim_shard(self, owner: str) -> dict | None:
+        """Lease the oldest pending shard, or one whose lease expired, to `owner`."""
+        self._ensure_shard_indexes()
+        config = current_app.config
+        now = utils.get_current_time()
+        return self.dao.serialize(self.shards_dao.col.find_one_and_update(
+            {
+                "$or": [{"status": "pending"}, {"status": "running", "lease_until": {"$lt": now}}],
+                "attempts": {"$lt": config.get("BUILD_MAX_ATTEMPTS", 5)},
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "owner": owner,
+                    "lease_until": now + timedelta(seconds=config.get("BUILD_LEASE_SECONDS", 60)),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING), ("shard", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        ))
+
+    def renew_shard(self, shard: dict, update: dict | None = None) -> bool:
+        """Extend the lease (and apply `update`); False once the lease was lost to another worker."""
+        now = utils.get_current_time()
+        lease = timedelta(seconds=current_app.config.get("BUILD_LEASE_SECONDS", 60))
+        return self._update_leased(shard, {**(update or {}), "lease_until": now + lease, "updated_at": now})
+
+    def commit_shard(self, shard: dict, update: dict) -> bool:
+        """`renew_shard` for a batch commit; `committed[b]` records the attempt that committed batch b."""
+        now = utils.get_current_time()
+        lease = timedelta(seconds=current_app.config.get("BUILD_LEASE_SECONDS", 60))
+        return self.shards_dao.col.update_one(
+            self._lease_query(shard),
+            {"$set": {**update, "lease_until": now + lease, "updated_at": now}, "$push": {"committed": shard["attempts"]}},
+        ).matched_count > 0
+
+    def finish_shard(self, shard: dict, status: str, *, error: str = None) -> bool:
+        update = {"status": status, "updated_at": utils.get_current_time()}
+        if error:
+            update["error"] = error
+        return self._update_leased(shard, update)
+
+    def release_shard(self, shard: dict) -> bool:
+        """Hand a shard back untouched (worker shutdown): the claim does not count as an attempt."""
+        return self.shards_dao.col.update_one(
+            self._lease_query(shard),
+            {"$set": {"status": "pending", "updated_at": utils.get_current_time()}, "$inc": {"attempts": -1}},
+        ).matched_count > 0
+
+    def discard_shard(self, shard: dict, dataset: dict, *, since: int = None) -> int:
+        """Delete rows of `shard` past its checkpoint, and, with `since`, rows written
+        from that batch on by other attempts (a worker that lost its lease mid-batch)."""
+        stale = [{"batch": {"$gte": shard["checkpoint"]["batches"]}}]
+        if since is not None:
+            stale.append({"attempt": {"$ne": shard["attempts"]}, "batch": {"$gte": since}})
+
+        query = {"dataset": ObjectId(dataset["_id"]), "shard": ObjectId(shard["_id"]), "$or": stale}
+        deleted = self._delete_batched(self._data_col(dataset), query)
+        if deleted:
+            self.dao.update_one({"_id": ObjectId(dataset["_id"])}, {"$inc": {"samples": -deleted}}, set_operator=False)
+        return deleted
+
+    def requeue_shards(self, dataset_id: str, build: str) -> int:
+        """Put the cancelled and failed shards of a build back in the queue."""
+        return self.shards_dao.col.update_many(
+            {"dataset": ObjectId(dataset_id), "build": build, "status": {"$in": ["cancelled", "failed"]}},
+            {"$set": {"status": "pending", "attempts": 0, "updated_at": utils.get_current_time()}, "$unset": {"error": ""}},
+        ).modified_count
+
+    def expire_shards(self) -> list[str]:
+        """Fail shards whose lease expired BUILD_MAX_ATTEMPTS times; returns their datasets."""
+        query = {
+            "status": "running",
+            "lease_until": {"$lt": utils.get_current_time()},
+            "attempts": {"$gte": current_app.config.get("BUILD_MAX_ATTEMPTS", 5)},
+        }
+        datasets = self.shards_dao.col.distinct("dataset", query)
+        if datasets:
+            self.shards_dao.col.update_many(query, {"$set": {
+                "status": "failed",
+                "error": "Lease expired too many times",
+                "updated_at": utils.get_current_time(),
+            }})
+        return [str(d) for d in datasets]
+
+    def update_queued_generation(self, dataset_id: str) -> bool:
+        """Heartbeat and progress of a queued build; True when a cancel was requested."""
+        now = utils.get_current_time()
+        dataset = self.dao.col.find_one_and_update(
+            {"_id": ObjectId(dataset_id)},
+            {"$set": {"heartbeat_at": now}},
+            projection={"samples": 1, "checkpoint": 1, "cancel_requested": 1},
+        )
+        if not dataset:
+            return True
+
+        checkpoint = dataset.get("checkpoint", {})
+        done, total = dataset.get("samples", 0), checkpoint.get("target", 0)
+        queued_at = checkpoint.get("queued_at")
+        if queued_at is not None and queued_at.tzinfo is None:
+            queued_at = queued_at.replace(tzinfo=timezone.utc)
+        elapsed = max((now - queued_at).total_seconds(), 1e-9) if queued_at else None
+        rate = (done - checkpoint.get("samples", 0)) / elapsed if elapsed else 0
+
+        self.dao.update_one({"_id": ObjectId(dataset_id), "status": "generating"}, {"generation": {
+            "status": "generating",
+            "done": done,
+            "total": total,
+            "percent": round(100 * done / total, 2) if total else 100.0,
+            "rate": round(rate, 2),
+            "eta_seconds": round(max(0, total - done) / rate, 1) if rate > 0 else None,
+            "elapsed_seconds": round(elapsed, 1) if elapsed else None,
+        }})
+        return bool(dataset.get("cancel_requested"))
+
+    def finalize_queued_build(self, dataset_id: str) -> str | None:
+        """Close a queued build once none of its shards is pending or running.
+
+        Returns the final status, or None while shards remain or when another
+        worker already closed it. Stats are the pre-build stats merged with
+        every shard's, so closing again after a resume never counts twice.
+        """
+        dataset = self.get_document(id=dataset_id, projection={"checkpoint": 1, "generation": 1, "layout": 1})
+        checkpoint = dataset.get("checkpoint", {})
+        shards = self.shards_dao.find(
+            {"dataset": ObjectId(dataset_id), "build": checkpoint.get("build")},
+            projection={"status": 1, "stats": 1, "checkpoint.samples": 1, "checkpoint.batches": 1, "committed": 1},
+        )
+        statuses = {shard["status"] for shard in shards}
+        if statuses & {"pending", "running"}:
+            return None
+        status = "failed" if "failed" in statuses else "cancelled" if "cancelled" in statuses else "generated"
+
+        stats = DatasetStats.from_document(checkpoint.get("base_stats"))
+        for shard in shards:
+            if shard.get("stats"):
+                stats.merge(DatasetStats.from_document(shard["stats"]))
+
+        # keep committed rows only; samples is then recounted from the checkpoints,
+        # so closing twice (or after a crash mid-cleanup) gives the same result
+        for shard in shards:
+            self._discard_uncommitted_shard(dataset, shard)
+        done = checkpoint.get("samples", 0) + sum(shard["checkpoint"]["samples"] for shard in shards)
+        total = checkpoint.get("target", 0)
+
+        closed = self.dao.col.find_one_and_update(
+            {"_id": ObjectId(dataset_id), "status": "generating", "checkpoint.build": checkpoint.get("build")},
+            {
+                "$set": {
+                    "status": status,
+                    "samples": done,
+                    "stats": stats.to_document(),
+                    "generation": {
+                        **(dataset.get("generation") or {}),
+                        "status": status,
+                        "done": done,
+                        "percent": round(100 * done / total, 2) if total else 100.0,
+                        "eta_seconds": 0 if status == "generated" else None,
+                    },
+                },
+                "$unset": {"cancel_requested": ""},
+            },
+            projection={"_id": 1},
+        )
+        return status if closed else None
+
+    def _discard_uncommitted_shard(self, dataset: dict, shard: dict) -> int:
+        """Delete rows of `shard` not committed by its checkpoint: past it, or written
+        to a committed batch by another attempt (a worker that stalled past its lease)."""
+        stale = [{"batch": {"$gte": shard["checkpoint"]["batches"]}}]
+        batches: dict[int, list] = {}
+        for batch, attempt in enumerate(shard.get("committed") or []):
+            batches.setdefault(attempt, []).append(batch)
+        stale += [{"batch": {"$in": b}, "attempt": {"$ne": attempt}} for attempt, b in batches.items()]
+
+        query = {"dataset": ObjectId(dataset["_id"]), "shard": ObjectId(shard["_id"]), "$or": stale}
+        return self._delete_batched(self._data_col(dataset), query)
+
+    def _update_leased(self, shard: dict, update: dict) -> bool:
+        return self.shards_dao.col.update_one(self._lease_query(shard), {"$set": update}).matched_count > 0
+
+    def _lease_query(self, shard: dict) -> dict:
+        # owner and attempt fence the lease: a reclaimed shard rejects its previous worker
+        return {"_id": ObjectId(shard["_id"]), "status": "running", "owner": shard["owner"], "attempts": shard["attempts"]}
+
+    def _ensure_shard_indexes(self) -> None:
+        if DatasetsService._shard_indexes_ready:
+            return
+        self.shards_dao.col.create_index([("status", ASCENDING), ("created_at", ASCENDING), ("shard", ASCENDING)])
+        self.shards_dao.col.create_index([("dataset", ASCENDING), ("build", ASCENDING), ("shard", ASCENDING)], unique=True)
+        DatasetsService._shard_indexes_ready = True
+
+    def generation_events(self, dataset_id: str) -> Iterator[str]:
+        """Server-Sent Events for a dataset build, until it leaves "generating".
+
+        Builds running in this process wake subscribers through the broker;
+        builds on other workers are picked up by polling the persisted
+        `generation` field every PROGRESS_SSE_POLL_SECONDS.
+        """
+        config = current_app.config
+        poll = config.get("PROGRESS_SSE_POLL_SECONDS", 2.0)
+        keepalive = config.get("PROGRESS_SSE_KEEPALIVE_SECONDS", 15.0)
+
+        seq, last, sent = 0, None, time.monotonic()
+        while True:
+            nseq, event = broker.wait(dataset_id, seq, poll)
+            if nseq and nseq != seq:
+                seq = nseq
+            elif nseq:
+                event = last  # local build, nothing new yet: the persisted copy is older
+            else:
+                doc = self.dao.find_one({"_id": ObjectId(dataset_id)}, projection={"status": 1, "generation": 1})
+                if not doc:
+                    return
+                event = {**(doc.get("generation") or {}), "status": doc.get("status")}
+
+            if event != last:
+                last, sent = event, time.monotonic()
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+            elif time.monotonic() - sent >= keepalive:
+                sent = time.monotonic()
+                yield ": keep-alive\n\n"
+
+            if event.get("status") != "generating":
+                return
+
     def update_status(self, dataset_id: str, status: str):
         return self.dao.update_one(
             {"_id": ObjectId(dataset_id)},
@@ -84,6 +781,8 @@ class DatasetsService(BaseService):
         )
 
     def train_dataset(self, dataset_id: str, user_id: str, parameters: dict):
+        # the trainer reads each split with one index scan: make sure they exist
+        self.materialize_splits(self.get_document(id=dataset_id, projection={"splits": 1, "status": 1, "layout": 1}))
         self.update_status(dataset_id, "ready")
         self.dao.update_one(
             {"_id": ObjectId(dataset_id)},
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from pymongo.database import Database
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
+from src.helpers.streaming import json_list
 from src.helpers.utils import json_error
 from .service import ModelsService
 
@@ -12,10 +13,13 @@ def create_models_router(db: Database) -> Blueprint:
     @bp.get("/")
     @jwt_required()
     def find_models():
-        docs = service.find_all()
-        if not docs:
+        try:
+            response = json_list(service.find_all(request.args.get("fields")))
+        except ValueError as e:
+            return json_error(str(e))
+        if response is None:
             return json_error("Not found", 404)
-        return jsonify(docs), 200
+        return response, 200
     
     @bp.post("/")
     @jwt_required()
@@ -26,6 +30,16 @@ def create_models_router(db: Database) -> Blueprint:
         model = service.create(get_jwt_identity(), payload)
         return jsonify(model), 201
     
+    @bp.post("/<model_id>/preview")
+    @jwt_required()
+    def preview_model(model_id):
+        try:
+            parameters = request.get_json(silent=True) or {}
+            preview = service.preview_model(model_id, parameters)
+            return jsonify(preview), 200
+        except (TypeError, ValueError) as e:
+            return json_error(str(e))
+
     @bp.post("/build/<model_id>")
     @jwt_required()
     def build_model(model_id):
@@ -36,4 +50,13 @@ def create_models_router(db: Database) -> Blueprint:
         except ValueError as e:
             return json_error(str(e))
 
+    @bp.post("/build/resume/<dataset_id>")
+    @jwt_required()
+    def resume_build(dataset_id):
+        try:
+            model = service.resume_build(dataset_id)
+            return jsonify(model), 200
+        except ValueError as e:
+            return json_error(str(e))
+
     return bp
@@ -1,7 +1,15 @@
-from src.helpers.base_dao import BaseDao
+from src.helpers.base_dao import BaseDao, Fields
+from src.app.users.dao import UsersDao
 
 class ModelsDao(BaseDao):
     collection_name = "models"
+    cached = True
+    fields = (
+        "_id", "name", "description", "reference", "version", "configuration", "randomizers",
+        "mapper", "entities", "labels", "created_by", "created_at", "updated_at",
+    )
+    references = {"created_by": UsersDao}
 
-    def find_all(self, *, sort: str = "updated_at") -> list[dict]:
-        return self.find(sort=[(sort, -1)], projection={"mapper": 0, "configuration": 0, "entities": 0, "labels": 0, "randomizers": 0})
\ No newline at end of file
+    def find_all(self, *, sort: str = "updated_at", fields: Fields | None = None) -> list[dict]:
+        projection = self.projection(fields, {"mapper": 0, "configuration": 0, "entities": 0, "labels": 0, "randomizers": 0})
+        return self.find(sort=[(sort, -1)], projection=projection)
\ No newline at end of file
@@ -1,5 +1,5 @@
-from typing import Literal, Optional
-from src.app.data.service import DataService
+from typing import Iterator, Literal, Optional
+from src.app.data.service import DataService, VocabularySampler
 from src.app.datasets.service import DatasetsService
 from src.app.users.service import UsersService
 from src.app.models.dao import ModelsDao
@@ -8,10 +8,19 @@ from bson.objectid import ObjectId
 from src.app.configurations.service import ConfigurationsService
 from src.helpers.base_service import BaseService
 from src.helpers import utils
-import copy, random, uuid, re, time
+from src.helpers.augment import Augmenter
+from src.helpers.progress import ProgressTracker, broker
+from src.helpers.stats import DatasetStats
+from flask import current_app
+import copy, hashlib, json, random, threading, uuid, re, time
 
 class ModelsService(BaseService):
-    
+
+    BUILD_BATCH_SIZE = 1000
+    # samples are augmented this many at a time; BUILD_BATCH_SIZE must stay a multiple
+    # so checkpoints always fall between augmentation batches
+    AUGMENT_BATCH_SIZE = 100
+
     def __init__(self, db: Database) -> None:
         super().__init__(db)
         self.dao = ModelsDao(db)
@@ -21,18 +30,21 @@ class ModelsService(BaseService):
         self.datasets_service = DatasetsService(db)
         self.user_service = UsersService(db)
 
-    def find_all(self):
-        models = self.dao.find_all()
-        for model in models:
-            model["created_by"] = self.user_service.dao.find_one({
-                "_id": ObjectId(model["created_by"])
-            }, 
-            projection={
-                "password": 0,
-                "apikey": 0,
-                "role": 0
-            }) if model.get("created_by") else None
-        return models
+    def find_all(self, fields: str = None):
+        # parsed before the generator starts, so a bad ?fields= is still a 400
+        return self._find_all(self.dao.select(fields))
+
+    def _find_all(self, fields):
+        # users are looked up one query per batch of models
+        users_projection = self.reference_projection(fields, "created_by", {"password": 0, "apikey": 0, "role": 0})
+        for models in utils.batched(self.dao.find_all(fields=fields), 100):
+            if users_projection is None:
+                yield from models
+                continue
+            users = self.lookup("users", (m.get("created_by") for m in models), projection=users_projection)
+            for model in models:
+                model["created_by"] = users.get(model["created_by"]) if model.get("created_by") else None
+                yield model
 
     def create(self, user_id: str, model_data: dict) -> ObjectId:
         doc = {
@@ -49,7 +61,7 @@ class ModelsService(BaseService):
             "created_at": utils.get_current_time(),
         }
 
-        self.dao.col.insert_one(doc)
+        self.dao.insert_one(doc)
 
         return self.dao.serialize(doc)
 
@@ -65,20 +77,11 @@ class ModelsService(BaseService):
         
         return labels
 
-    def build_model(self, model_id: str, size: str, *, user_id: str = None) -> dict:
+    def build_model(self, model_id: str, size: dict, *, user_id: str = None) -> dict:
         model = self.get_document(id=model_id)
 
         mversion = model.get("version", "1.0")
-        ments = model.get("entities", {})
-        mkeys = list(ments.values())
-
-        mcid = model.get("configuration", None)
-        if not mcid:
-            raise ValueError("Model configuration is missing")
-
-        configuration = self.configurations_service.get_document(id=mcid)
-
-        dataset = []
+        configuration = self._build_configuration(model)
 
         n_max = configuration.get("possibilities", 1e5)
         n_size = size.get("size", n_max)
@@ -87,49 +90,462 @@ class ModelsService(BaseService):
         else:
             n_size = self.model_build_calculate_size(n_size, n_max, len(configuration.get("formats", [])))
 
-        print(user_id)
+        fingerprint = self.build_model_fingerprint(model, configuration)
+
+        # top-up: reuse a dataset built from the exact same inputs, only generate what is missing
+        docdt = self.datasets_service.find_by_fingerprint(model_id, fingerprint) if size.get("top_up") else None
+
+        if docdt:
+            docdtid = docdt["_id"]
+            layout = docdt.get("layout", "documents")
+            # the dataset keeps its ratios; older ones stay unsplit until materialized
+            splits = docdt.get("splits")
+            n_existing = self.datasets_service.count_samples(docdt)
+            n_batches = docdt.get("checkpoint", {}).get("batches", 0)
+            self.datasets_service.dao.update_one(
+                {"_id": ObjectId(docdtid)},
+                {"status": "generating", "size": size, "updated_at": utils.get_current_time()}
+            )
+        else:
+            layout = self.datasets_service.layout(size.get("layout"))
+            splits = self.datasets_service.split_ratios(size.get("splits"))
+            docdtid = self.datasets_service.dao.insert_one({
+                "model": ObjectId(model_id),
+                "version": mversion,
+                "size": size,
+                "fingerprint": fingerprint,
+                "layout": layout,
+                "splits": splits,
+                "samples": 0,
+                "created_at": utils.get_current_time(),
+                "status": "generating",
+                "created_by": ObjectId(user_id) if user_id else None
+            })["_id"]
+            n_existing = n_batches = 0
+
+        checkpoint = {
+            "target": max(n_size, n_existing),
+            "samples": n_existing,
+            "batches": n_batches,
+            "top_up": bool(docdt),
+            "rng": _rng_state(random.Random()),
+        }
+        stats = DatasetStats.from_document(docdt.get("stats") if docdt else None)
+
+        if current_app.config.get("BUILD_EXECUTOR", "inline") == "queue":
+            return self._enqueue_build(docdtid, checkpoint, stats)
+
+        self.datasets_service.save_checkpoint(docdtid, checkpoint, stats)
+        return self._run_build(model, configuration, docdtid, layout, checkpoint, stats, splits)
+
+    def resume_build(self, dataset_id: str) -> dict:
+        """Continue a cancelled, failed or crashed build from its last checkpoint.
+
+        The generator RNG is restored from the checkpoint, so the resumed
+        dataset holds the same samples an uninterrupted build would have.
+        """
+        dataset = self.datasets_service.claim_resume(dataset_id)
+        if not dataset:
+            raise ValueError("Dataset has no resumable build")
+
+        try:
+            model = self.get_document(id=dataset["model"])
+            configuration = self._build_configuration(model)
+            if self.build_model_fingerprint(model, configuration) != dataset.get("fingerprint"):
+                raise ValueError("Model inputs changed since the build started")
+        except ValueError:
+            self.datasets_service.update_status(dataset_id, "failed")
+            raise
+
+        checkpoint = dataset["checkpoint"]
+        if checkpoint.get("mode") == "queue":
+            # shards keep their own checkpoints: put the unfinished ones back in the queue
+            self.datasets_service.requeue_shards(dataset_id, checkpoint["build"])
+            return self._queued(dataset_id, checkpoint)
+
+        self.datasets_service.discard_uncommitted(dataset)
+        stats = DatasetStats.from_document(dataset.get("stats"))
+        layout = dataset.get("layout", "documents")
+
+        return self._run_build(model, configuration, dataset["_id"], layout, dataset["checkpoint"], stats, dataset.get("splits"))
+
+    PREVIEW_SIZES = ("complete", "advanced", "recommended", "small", "tiny")
+
+    def preview_model(self, model_id: str, parameters: dict) -> dict:
+        """Run the real generation path under a sample/time budget, without writing.
+
+        Returns example samples with their entity spans, the measured rate
+        and stored size per sample, and what each named size would cost.
+        """
+        config = current_app.config
+        budget = min(int(parameters.get("samples", 200)), config.get("PREVIEW_MAX_SAMPLES", 2000))
+        seconds = min(float(parameters.get("seconds", 2)), config.get("PREVIEW_MAX_SECONDS", 10))
+        n_examples = min(int(parameters.get("examples", 5)), budget)
+        if budget < 1 or seconds <= 0:
+            raise ValueError("Preview budget must be positive")
+
+        model = self.get_document(id=model_id)
+        configuration = self._build_configuration(model)
+        rng = random.Random(parameters.get("seed"))
+        stats = DatasetStats()
+
+        samples = []
+        started = time.perf_counter()
+        for data in self.generate_model_samples(model, configuration, budget, stats=stats, rng=rng):
+            samples.append(data)
+            if time.perf_counter() - started >= seconds:
+                break
+        elapsed = max(time.perf_counter() - started, 1e-9)
+
+        rate = len(samples) / elapsed
+        sample_bytes = self.datasets_service.sample_bytes(samples)
+        layout = self.datasets_service.layout(parameters.get("layout"))
 
-        docdt = {
-            "model": ObjectId(model_id),
-            "version": mversion,
-            "size": size,
-            "created_at": utils.get_current_time(),
-            "status": "generating",
-            "created_by": ObjectId(user_id) if user_id else None
+        n_max = configuration.get("possibilities", 1e5)
+        n_formats = len(configuration.get("formats", []))
+        projections = {}
+        for name in self.PREVIEW_SIZES:
+            n = int(self.model_build_calculate_size(name, n_max, n_formats))
+            projections[name] = {
+                "samples": n,
+                "seconds": round(n / rate, 1) if rate else None,
+                "bytes": int(n * sample_bytes[layout]),
+            }
+
+        return {
+            "examples": [
+                {
+                    "text": data["text"],
+                    "entities": [
+                        {"key": key, "value": data["text"][start:end], "start": start, "end": end}
+                        for start, end, key in data["entities"]
+                    ],
+                }
+                for data in samples[:n_examples]
+            ],
+            "samples": len(samples),
+            "elapsed_seconds": round(elapsed, 3),
+            "samples_per_second": round(rate, 1),
+            "layout": layout,
+            "sample_bytes": sample_bytes,
+            "possibilities": n_max,
+            "projections": projections,
+            "duplicate_rate_estimate": stats.summary()["duplicate_rate_estimate"],
+        }
+
+    def _build_configuration(self, model: dict) -> dict:
+        mcid = model.get("configuration", None)
+        if not mcid:
+            raise ValueError("Model configuration is missing")
+        return self.configurations_service.get_document(id=mcid)
+
+    def _enqueue_build(self, dataset_id: str, checkpoint: dict, stats: DatasetStats) -> dict:
+        """Producer side of queued builds: split the missing samples in shards for the workers."""
+        checkpoint = {
+            **checkpoint,
+            "mode": "queue",
+            "build": uuid.uuid4().hex,
+            "queued_at": utils.get_current_time(),
+            "base_stats": stats.to_document(),
         }
+        del checkpoint["rng"]  # each shard seeds its own generator from the build seed
+        checkpoint["seed"] = uuid.uuid4().hex
 
-        docdtid = self.datasets_service.dao.insert_one(docdt)["_id"]
+        self.datasets_service.save_checkpoint(dataset_id, checkpoint, stats)
+        checkpoint["shards"] = self.datasets_service.enqueue_shards(
+            dataset_id, checkpoint["build"], checkpoint["samples"], checkpoint["target"], seed=checkpoint["seed"]
+        )
+        self.datasets_service.dao.update_one({"_id": ObjectId(dataset_id)}, {"checkpoint.shards": checkpoint["shards"]})
+        self.datasets_service.update_queued_generation(dataset_id)
+
+        if not checkpoint["shards"]:  # nothing missing (top-up of a complete dataset)
+            self.finalize_build(dataset_id)
+        return self._queued(dataset_id, checkpoint)
+
+    def _queued(self, dataset_id: str, checkpoint: dict) -> dict:
+        return {
+            "dataset": str(dataset_id),
+            "status": "queued",
+            "shards": checkpoint.get("shards"),
+            "target": checkpoint["target"],
+        }
 
-        for _ in range(n_size):
-            mvb = self.build_model_configuration(copy.deepcopy(configuration))
+    def run_shard(self, shard: dict, *, stop: threading.Event) -> str:
+        """Worker side of queued builds: generate one leased shard.
+
+        Like `_run_build`, samples are stored batch by batch, each batch
+        followed by the shard checkpoint (RNG state, stats); every write is
+        fenced by the lease, so a worker that lost it stops at its next
+        heartbeat or commit. Returns the shard outcome: "done", "cancelled",
+        "failed", "released" (on `stop`) or "lost".
+        """
+        dataset = self.datasets_service.get_document(id=shard["dataset"])
+        if dataset.get("status") != "generating" or dataset.get("cancel_requested"):
+            self.datasets_service.finish_shard(shard, "cancelled")
+            self.finalize_build(dataset["_id"])
+            return "cancelled"
+
+        try:
+            model = self.get_document(id=dataset["model"])
+            configuration = self._build_configuration(model)
+            if self.build_model_fingerprint(model, configuration) != dataset.get("fingerprint"):
+                raise ValueError("Model inputs changed since the build started")
+        except ValueError as e:
+            self.datasets_service.finish_shard(shard, "failed", error=str(e))
+            self.finalize_build(dataset["_id"])
+            return "failed"
+
+        # rows past the checkpoint were written by an attempt that never committed them
+        self.datasets_service.discard_shard(shard, dataset)
+
+        checkpoint = shard["checkpoint"]
+        rng = _rng_restore(checkpoint["rng"]) if checkpoint.get("rng") else random.Random(shard["seed"])
+        stats = DatasetStats.from_document(shard.get("stats"))
+        layout = dataset.get("layout", "documents")
+        claimed_batches = n_batches = checkpoint["batches"]
+        cancelled, lost = threading.Event(), threading.Event()
+
+        def persist(progress: dict) -> None:
+            if not self.datasets_service.renew_shard(shard, {"progress": progress}):
+                lost.set()
+            if self.datasets_service.update_queued_generation(dataset["_id"]):
+                cancelled.set()
+
+        tracker = ProgressTracker(
+            f"{dataset['_id']}:{shard['shard']}",
+            shard["size"],
+            done=checkpoint["samples"],
+            persist=persist,
+            publish_interval=current_app.config.get("PROGRESS_PUBLISH_SECONDS", 0.5),
+            persist_interval=current_app.config.get("PROGRESS_PERSIST_SECONDS", 2.0),
+        )
 
-            try:
-                mrd = random.choice(model.get("randomizers", []))
-                rdm = self.build_model_configuration_randomizers(mrd)
-                mvb["format"] = rdm(mvb["format"])
-            except: pass
-            
-            dataset.append(
-                self.build_model_entity(
-                    mvb,
-                    mkeys,
-                    {v:k for k,v in ments.items()}
+        def commit(batch: list[dict]) -> None:
+            nonlocal n_batches
+            # check the lease before writing: a worker that stalled past it must not add rows
+            if lost.is_set() or not self.datasets_service.renew_shard(shard):
+                lost.set()
+                return
+            self.datasets_service.add_data_many(
+                dataset["_id"], batch, layout=layout, batch=n_batches, splits=dataset.get("splits"),
+                shard=shard["_id"], attempt=shard["attempts"]
+            )
+            n_batches += 1
+            committed = self.datasets_service.commit_shard(shard, {
+                "checkpoint": {"samples": tracker.done, "batches": n_batches, "rng": _rng_state(rng)},
+                "stats": stats.to_document(),
+            })
+            if not committed:
+                lost.set()
+
+        batch = []
+        n_missing = max(0, shard["size"] - checkpoint["samples"])
+        try:
+            for data in self.generate_model_samples(model, configuration, n_missing, stats=stats, rng=rng):
+                batch.append(data)
+                tracker.advance()
+                if len(batch) >= self.BUILD_BATCH_SIZE:
+                    commit(batch)
+                    batch = []
+                interrupted = cancelled.is_set() or lost.is_set() or stop.is_set()
+                if interrupted and len(batch) % self.AUGMENT_BATCH_SIZE == 0:
+                    break
+
+            if batch:
+                commit(batch)
+        except Exception as e:
+            self.datasets_service.finish_shard(shard, "failed", error=str(e))
+            self.finalize_build(dataset["_id"])
+            raise
+        finally:
+            broker.discard(tracker.key)
+
+        if lost.is_set():
+            return "lost"
+        if cancelled.is_set():
+            outcome = "cancelled"
+        elif tracker.done < shard["size"]:
+            self.datasets_service.release_shard(shard)
+            return "released"
+        else:
+            outcome = "done"
+
+        shard = {**shard, "checkpoint": {**checkpoint, "batches": n_batches}}
+        self.datasets_service.discard_shard(shard, dataset, since=claimed_batches)
+        if self.datasets_service.finish_shard(shard, outcome):
+            self.finalize_build(dataset["_id"])
+        return outcome
+
+    def finalize_build(self, dataset_id: str) -> str | None:
+        """Close a queued build whose shards all ended; bumps the model version like `_run_build`."""
+        status = self.datasets_service.finalize_queued_build(dataset_id)
+        if status == "generated":
+            dataset = self.datasets_service.get_document(id=dataset_id, projection={"model": 1, "checkpoint.top_up": 1})
+            if not dataset.get("checkpoint", {}).get("top_up"):
+                model = self.get_document(id=dataset["model"], projection={"version": 1})
+                self.dao.update_one(
+                    {"_id": ObjectId(model["_id"])},
+                    {"version": utils.bump_version(model.get("version", "1.0"), "minor"), "updated_at": utils.get_current_time()}
                 )
+        return status
+
+    def _run_build(
+        self,
+        model: dict,
+        configuration: dict,
+        dataset_id: str,
+        layout: str,
+        checkpoint: dict,
+        stats: DatasetStats,
+        splits: dict = None
+    ) -> dict:
+        """Generate the samples missing from `checkpoint` and store them batch by batch.
+
+        Every stored batch is followed by a checkpoint (samples, batch
+        number, RNG state, stats); rows tagged with a later batch number
+        are what `DatasetsService.discard_uncommitted` removes on resume.
+        """
+        rng = _rng_restore(checkpoint["rng"])
+        n_batches = checkpoint["batches"]
+        cancelled = threading.Event()
+
+        def persist(progress: dict) -> None:
+            if self.datasets_service.update_generation(dataset_id, progress):
+                cancelled.set()
+
+        tracker = ProgressTracker(
+            str(dataset_id),
+            checkpoint["target"],
+            done=checkpoint["samples"],
+            persist=persist,
+            publish_interval=current_app.config.get("PROGRESS_PUBLISH_SECONDS", 0.5),
+            persist_interval=current_app.config.get("PROGRESS_PERSIST_SECONDS", 2.0),
+        )
+
+        def commit(batch: list[dict]) -> None:
+            nonlocal n_batches
+            self.datasets_service.add_data_many(dataset_id, batch, layout=layout, batch=n_batches, splits=splits)
+            n_batches += 1
+            self.datasets_service.save_checkpoint(dataset_id, {
+                **checkpoint,
+                "samples": tracker.done,
+                "batches": n_batches,
+                "rng": _rng_state(rng),
+            }, stats)
+
+        examples = []
+        batch = []
+        n_missing = max(0, checkpoint["target"] - checkpoint["samples"])
+        try:
+            for data in self.generate_model_samples(model, configuration, n_missing, stats=stats, rng=rng):
+                if len(examples) < 3:
+                    examples.append(data)
+                batch.append(data)
+                tracker.advance()
+                if len(batch) >= self.BUILD_BATCH_SIZE:
+                    commit(batch)
+                    batch = []
+                if cancelled.is_set() and len(batch) % self.AUGMENT_BATCH_SIZE == 0:
+                    break
+
+            if batch:
+                commit(batch)
+        except Exception:
+            tracker.finish("failed")
+            broker.discard(str(dataset_id))
+            self.datasets_service.update_status(dataset_id, "failed")
+            raise
+
+        status = "cancelled" if cancelled.is_set() else "generated"
+        tracker.finish(status)
+        broker.discard(str(dataset_id))
+        self.datasets_service.dao.update_one(
+            {"_id": ObjectId(dataset_id)},
+            {"$set": {"status": status}, "$unset": {"cancel_requested": ""}},
+            set_operator=False
+        )
+
+        if cancelled.is_set():
+            raise ValueError("Build cancelled")
+
+        if not checkpoint.get("top_up"):
+            self.dao.update_one(
+                {"_id": ObjectId(model["_id"])},
+                { "version": utils.bump_version(model.get("version", "1.0"), "minor"), "updated_at": utils.get_current_time()}
             )
 
-            time.sleep(1e-9)
+        return self.model_build_example(examples, model.get("entities", {}), examples_size=3)
 
-        for data in dataset:
-            self.datasets_service.add_data(docdtid, data)
+    def generate_model_samples(
+        self,
+        model: dict,
+        configuration: dict,
+        n_size: int,
+        *,
+        stats: DatasetStats = None,
+        rng: random.Random = random
+    ) -> Iterator[dict]:
+        ments = model.get("entities", {})
+        mkeys = list(ments.values())
+        mmap = {v:k for k,v in ments.items()}
+
+        augmenter = Augmenter(model.get("randomizers", []))
+        sampler = self.data_service.sampler()
+
+        for first in range(0, n_size, self.AUGMENT_BATCH_SIZE):
+            configurations, batch = [], []
+            for _ in range(min(self.AUGMENT_BATCH_SIZE, n_size - first)):
+                mvb = self.build_model_configuration(copy.deepcopy(configuration), rng=rng, sampler=sampler)
+                configurations.append(mvb)
+                batch.append(self.build_model_entity(mvb, mkeys, mmap))
+
+            augmenter.apply(batch, rng)
+
+            for mvb, data in zip(configurations, batch):
+                if stats is not None:
+                    stats.observe(mvb, data)
+                yield data
+
+    def build_model_fingerprint(self, model: dict, configuration: dict) -> str:
+        """Hash of every input that shapes generated samples.
+
+        Covers the configuration content (nested configurations included),
+        the version of each referenced models_data document, the model
+        randomizers and its entity map.
+        """
+        inputs = {
+            "configuration": self._fingerprint_configuration(configuration, set()),
+            "randomizers": model.get("randomizers", []),
+            "entities": model.get("entities", {}),
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
-        self.datasets_service.update_status(docdtid, "generated")
+    def _fingerprint_configuration(self, configuration: dict, seen: set) -> dict:
+        attributes = configuration.get("attributes") or configuration.get("configuration", {}).get("attributes", [])
+        formats = configuration.get("formats") or configuration.get("configuration", {}).get("formats", [])
+        references = {}
 
-        self.dao.update_one(
-            {"_id": ObjectId(model_id)},
-            { "version": utils.bump_version(mversion, "minor"), "updated_at": utils.get_current_time()}
-        )
+        for attr in attributes:
+            vattr = attr.get("value")
+            if not isinstance(vattr, dict):
+                continue
+            object_id = vattr.get("parameters", {}).get("object_id")
+            if not object_id or object_id in seen:
+                continue
+            seen.add(object_id)
 
-        return self.model_build_example(dataset, ments, examples_size=3)
+            match vattr.get("rule"):
+                case "data":
+                    data = self.data_service.dao.find_one(
+                        {"_id": ObjectId(object_id)},
+                        projection={"created_at": 1, "updated_at": 1, "version": 1}
+                    ) or {}
+                    references[object_id] = [data.get("version"), data.get("updated_at") or data.get("created_at")]
+                case "configuration":
+                    nested = self.configurations_service.dao.find_one({"_id": ObjectId(object_id)}) or {}
+                    references[object_id] = self._fingerprint_configuration(nested, seen)
+
+        return {"attributes": attributes, "formats": formats, "references": references}
 
     def model_build_calculate_size(
             self,
@@ -151,11 +567,18 @@ class ModelsService(BaseService):
             case _:
                 return int(1e3)
 
-    def build_model_configuration(self, configuration: dict) -> dict:
+    def build_model_configuration(
+        self,
+        configuration: dict,
+        *,
+        rng: random.Random = random,
+        sampler: VocabularySampler = None
+    ) -> dict:
         catt = configuration.get("attributes")
         cfmt = configuration.get("formats")
 
-        sfmt = random.choice(cfmt)
+        ifmt = rng.randrange(len(cfmt))
+        sfmt = cfmt[ifmt]
         satt = []
 
         for attr in catt:
@@ -163,13 +586,13 @@ class ModelsService(BaseService):
             fattr = attr.get("frequency", 1)
             rattr = attr.get("requirements", [])
 
-            vattr = attr.get("value") if fattr > random.random() else False
+            vattr = attr.get("value") if fattr > rng.random() else False
 
             if isinstance(vattr, dict):
                 tvattr = vattr.get("type")
                 rvattr = vattr.get("rule")
                 pvattr = vattr.get("parameters", {})
-                bvattr, bcattrs = self.build_model_configuration_value(tvattr, rvattr, pvattr)
+                bvattr, bcattrs = self.build_model_configuration_value(tvattr, rvattr, pvattr, rng=rng, sampler=sampler)
 
                 if bcattrs:
                     for bcattr in bcattrs:
@@ -184,6 +607,7 @@ class ModelsService(BaseService):
         bfmt = self.build_model_configuration_format(sfmt, satt)
         configuration['attributes'] = satt
         configuration['format'] = re.sub(r'\s+', ' ', bfmt.strip())
+        configuration['format_id'] = ifmt
 
         return configuration
 
@@ -191,7 +615,10 @@ class ModelsService(BaseService):
         self,
         vtype: Literal["number", "string"],
         rule: str,
-        parameters: dict
+        parameters: dict,
+        *,
+        rng: random.Random = random,
+        sampler: VocabularySampler = None
     ) -> Optional[int | str]:
         value = None
 
@@ -200,19 +627,18 @@ class ModelsService(BaseService):
                 vmin = int(parameters.get("min", 0))
                 vmax = int(parameters.get("max", 100))
                 if vmin > vmax: vmin, vmax = vmax, vmin
-                value = random.randint(vmin, vmax)
+                value = rng.randint(vmin, vmax)
 
             case "data":
                 data_id = parameters.get("object_id")
                 if data_id:
-                    data = self.data_service.get_document(id=data_id)
-                    value = random.choice(data.get("data", []))
+                    value = (sampler or self.data_service.sampler()).choice(data_id, rng)
 
             case "configuration":
                 config_id = parameters.get("object_id")
                 if config_id:
                     config = self.configurations_service.get_document(id=config_id)
-                    value = self.build_model_configuration(config.get("configuration", {}))
+                    value = self.build_model_configuration(config.get("configuration", {}), rng=rng, sampler=sampler)
         
         if value is None: return None, None
             
@@ -293,25 +719,6 @@ class ModelsService(BaseService):
             format = format.replace(f"{{{kattr}}}", str(vattr))
         return format
     
-    def build_model_configuration_randomizers(
-        self,
-        randomizer:  str
-    ) -> lambda x: x:
-        rrand = randomizer.get("rule")
-        frand = randomizer.get("frequency", 1)
-
-        f = None
-
-        match rrand:
-            case "upper":
-                f = lambda x: x.upper()
-            case "lower":
-                f = lambda x: x.lower()
-            case _:
-                f = lambda x: x
-
-        return f if frand >= random.random() else lambda x: x
-
     def build_model_entity(
         self,
         configuration: dict,
@@ -369,4 +776,13 @@ class ModelsService(BaseService):
                 "entities": rents
             })
 
-        return res
\ No newline at end of file
+        return res
+
+def _rng_state(rng: random.Random) -> dict:
+    version, internal, gauss = rng.getstate()
+    return {"version": version, "internal": list(internal), "gauss": gauss}
+
+def _rng_restore(state: dict) -> random.Random:
+    rng = random.Random()
+    rng.setstate((state["version"], tuple(state["internal"]), state["gauss"]))
+    return rng
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from flask import Flask
+from pymongo.database import Database
+import os, socket, threading, uuid
+
+from .service import ModelsService
+
+class BuildWorker:
+    """Claims shards of queued builds (BUILD_EXECUTOR = "queue") and generates them.
+
+    Any number of workers, on any host, can share the queue: a shard is
+    leased for BUILD_LEASE_SECONDS and the lease renewed by every progress
+    heartbeat, so shards of a dead worker are reclaimed once it expires.
+    """
+
+    def __init__(self, app: Flask, db: Database, *, name: str | None = None) -> None:
+        self.app = app
+        self.service = ModelsService(db)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.stop = threading.Event()
+
+    def run(self) -> None:
+        with self.app.app_context():
+            poll = self.app.config.get("BUILD_WORKER_POLL_SECONDS", 2.0)
+            self.app.logger.info("Build worker %s started", self.name)
+            while not self.stop.is_set():
+                if not self.run_once():
+                    self.stop.wait(poll)
+            self.app.logger.info("Build worker %s stopped", self.name)
+
+    def run_once(self) -> bool:
+        """Process at most one shard; False when the queue was empty."""
+        datasets = self.service.datasets_service
+        try:
+            for dataset_id in datasets.expire_shards():
+                self.service.finalize_build(dataset_id)
+
+            shard = datasets.claim_shard(self.name)
+            if not shard:
+                return False
+            outcome = self.service.run_shard(shard, stop=self.stop)
+            self.app.logger.info("Shard %s of dataset %s: %s", shard["shard"], shard["dataset"], outcome)
+        except Exception:
+            # the shard is failed (or its lease left to expire): keep serving the queue
+            self.app.logger.exception("Build worker %s: shard failed", self.name)
+        return True
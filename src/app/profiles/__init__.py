@@ -0,0 +1 @@
+from .controller import create_profiles_router
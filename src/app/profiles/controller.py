@@ -0,0 +1,29 @@
+from flask import Blueprint, jsonify, send_file
+
+from src.extensions import profiler
+from src.helpers.utils import admin_required, json_error
+
+def create_profiles_router() -> Blueprint:
+    bp = Blueprint("profiles", __name__)
+
+    @bp.get("/")
+    @admin_required
+    def find_profiles():
+        return jsonify(profiler.list()), 200
+
+    @bp.get("/<id>")
+    @admin_required
+    def get_profile(id: str):
+        report = profiler.get(id)
+        if not report:
+            return json_error("Not found", 404)
+        return jsonify(report), 200
+
+    @bp.get("/<id>/pstats")
+    @admin_required
+    def download_profile(id: str):
+        if not profiler.get(id):
+            return json_error("Not found", 404)
+        return send_file(profiler.path(id, "prof"), mimetype="application/octet-stream", as_attachment=True, download_name=f"{id}.prof")
+
+    return bp
@@ -1,7 +1,10 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify, request, send_file
 from pymongo.database import Database
 from flask_jwt_extended import get_jwt_identity, jwt_required
+import os
 
+from src.helpers.avatar import AVATAR_FORMATS, avatar_etag, avatar_size
+from src.helpers.streaming import json_list
 from src.helpers.utils import json_error
 from .service import UsersService
 
@@ -12,12 +15,18 @@ def create_users_router(db: Database) -> Blueprint:
     @bp.get("/")
     @jwt_required()
     def find_users():
-        return jsonify(service.find_users()), 200
+        try:
+            return json_list(service.find_users(request.args.get("fields"))) or jsonify([]), 200
+        except ValueError as e:
+            return json_error(str(e))
 
     @bp.get("/me")
     @jwt_required()
     def find_me():
-        user = service.find_user_by_id(get_jwt_identity())
+        try:
+            user = service.find_user_by_id(get_jwt_identity(), request.args.get("fields"))
+        except ValueError as e:
+            return json_error(str(e))
         if not user:
             return json_error("Not found", 404)
         return jsonify(user), 200
@@ -28,4 +37,36 @@ def create_users_router(db: Database) -> Blueprint:
         service.update_avatar(get_jwt_identity())
         return jsonify({"message": "Avatar mis à jour"}), 200
 
+    @bp.get("/<id>/avatar")
+    def find_avatar(id: str):
+        size = avatar_size(request.args.get("size", 800, type=int))
+        fmt = request.args.get("format")
+        negotiated = not fmt
+        if negotiated:
+            fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "png"
+        if fmt not in AVATAR_FORMATS:
+            return json_error("Unsupported format")
+
+        try:
+            seed, variant = service.avatar_seed(id)
+        except ValueError:
+            return json_error("Not found", 404)
+
+        etag = avatar_etag(seed, variant, size, fmt)
+        max_age = current_app.config.get("AVATAR_MAX_AGE", 300)
+
+        if request.if_none_match.contains(etag):
+            rv = current_app.response_class(status=304)
+            rv.set_etag(etag)
+            rv.cache_control.public = True
+            rv.cache_control.max_age = max_age
+        else:
+            path = service.avatar_path(seed, variant, size, fmt)
+            rv = send_file(os.path.abspath(path), mimetype=AVATAR_FORMATS[fmt][1], etag=etag, max_age=max_age)
+            rv.cache_control.public = True
+
+        if negotiated:
+            rv.vary.add("Accept")
+        return rv
+
     return bp
@@ -3,4 +3,7 @@ from bson import ObjectId
 from src.helpers.base_dao import BaseDao
 
 class UsersDao(BaseDao):
-    collection_name = "users"
\ No newline at end of file
+    collection_name = "users"
+    fields = ("_id", "email", "firstname", "lastname", "role", "avatar")
+    # the creator embedded in other resources never exposes its role
+    reference_fields = ("_id", "email", "firstname", "lastname", "avatar")
\ No newline at end of file
@@ -1,7 +1,9 @@
 from pymongo.database import Database
+from bson import ObjectId
+from flask import current_app
 import os, random
 
-from src.helpers.avatar import generate_avatar, save_avatar
+from src.helpers.avatar import cached_avatar, evict_cached_avatar, legacy_avatar_path
 
 from src.helpers.base_service import BaseService
 
@@ -13,16 +15,34 @@ class UsersService(BaseService):
         super().__init__(db)
         self.dao = UsersDao(self.db)
 
-    def find_user_by_id(self, user_id: str):
-        return self.get_document(id=user_id, projection={ "password": 0 })
+    def find_user_by_id(self, user_id: str, fields: str = None):
+        return self.get_document(id=user_id, projection=self.dao.projection(self.dao.select(fields), { "password": 0 }))
     
-    def find_users(self):
-        return self.dao.find(projection={"password": 0})
+    def find_users(self, fields: str = None):
+        return self.dao.iter_find(projection=self.dao.projection(self.dao.select(fields), {"password": 0}))
+
+    def avatar_seed(self, user_id: str) -> tuple[str, int]:
+        if not ObjectId.is_valid(user_id):
+            raise ValueError("Document not found")
+        user = self.get_document(id=user_id, projection={"email": 1, "avatar": 1})
+        avatar = user.get("avatar") or {}
+        return avatar.get("seed", user.get("email", "")), int(avatar.get("variant", 0))
+
+    def avatar_path(self, seed: str, variant: int, size: int, fmt: str) -> str:
+        return cached_avatar(self._avatar_folder(), seed, variant, size, fmt)
 
     def update_avatar(self, user_id: str) -> None:
-        email = self.get_document(id=user_id).get("email")
-        save_avatar(
-            generate_avatar(email, 800, variant=random.randint(1, 10e16)),
-            os.path.join("src", "public", "avatars"),
-            f"{user_id}.png"
-        )
\ No newline at end of file
+        seed, variant = self.avatar_seed(user_id)
+        self.dao.update_one(
+            {"_id": ObjectId(user_id)},
+            {"avatar": {"seed": seed, "variant": random.randint(1, 10**17)}}
+        )
+        evict_cached_avatar(self._avatar_folder(), seed, variant)
+        # rendered at registration before the cache: /public/avatars/<id>.png falls back to the API once gone
+        try:
+            os.remove(legacy_avatar_path(current_app.static_folder, user_id))
+        except FileNotFoundError:
+            pass
+
+    def _avatar_folder(self) -> str:
+        return current_app.config.get("AVATAR_CACHE_FOLDER", os.path.join("src", "public", "avatars", "cache"))
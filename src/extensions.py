@@ -2,8 +2,19 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_swagger_ui import get_swaggerui_blueprint
 
+from .helpers.compression import Compress
+from .helpers.metrics import Metrics
+from .helpers.profiling import Profiler
+from .helpers.ratelimit import RateLimiter
+from .helpers.revocation import TokenBlocklist
+
 cors = CORS()
 jwt = JWTManager()
+compress = Compress()
+metrics = Metrics()
+profiler = Profiler()
+limiter = RateLimiter()
+blocklist = TokenBlocklist()
 
 swaggerui_bp = get_swaggerui_blueprint(
     '/swagger',
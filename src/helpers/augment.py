@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import math, random
+
+from src.helpers.text import ACCENTS
+
+PUNCTUATION = ",.;:!?-"
+
+KEYBOARDS = {
+    "azerty": ("azertyuiop", "qsdfghjklm", "wxcvbn"),
+    "qwerty": ("qwertyuiop", "asdfghjkl", "zxcvbnm"),
+}
+
+def _neighbours(rows: Tuple[str, ...]) -> Dict[str, str]:
+    keys = {ch: (r, c) for r, row in enumerate(rows) for c, ch in enumerate(row)}
+    return {
+        ch: "".join(o for o, (r2, c2) in keys.items() if o != ch and abs(r2 - r) <= 1 and abs(c2 - c) <= 1)
+        for ch, (r, c) in keys.items()
+    }
+
+NEIGHBOURS = {name: _neighbours(rows) for name, rows in KEYBOARDS.items()}
+
+def _positions(n: int, rate: float, rng: random.Random) -> Iterator[int]:
+    """Indices in [0, n) each picked with probability `rate` (geometric skips, not n draws)."""
+    if n <= 0 or rate <= 0:
+        return
+    if rate >= 1:
+        yield from range(n)
+        return
+    log = math.log(1.0 - rate)
+    i = -1
+    while True:
+        i += 1 + int(math.log(1.0 - rng.random()) / log)
+        if i >= n:
+            return
+        yield i
+
+# -- Steps ------------------------------------------------------------------
+class Step(ABC):
+    """One text transformation, applied to each region of a sample in `scope`."""
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        self.scope = spec.get("scope", "all")
+        self.rate = float(spec.get("rate", 0.05))
+        if self.scope not in ("all", "entities", "context"):
+            raise ValueError(f"Unknown randomizer scope: {self.scope}")
+
+    def applies(self, inside: bool) -> bool:
+        return self.scope == "all" or (self.scope == "entities") == inside
+
+    @abstractmethod
+    def __call__(self, text: str, rng: random.Random) -> str: ...
+
+class Case(Step):
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        super().__init__(spec)
+        self.mode = spec.get("rule")
+
+    def __call__(self, text: str, rng: random.Random) -> str:
+        match self.mode:
+            case "upper":
+                return text.upper()
+            case "lower":
+                return text.lower()
+            case "title":
+                return text.title()
+        chars = None
+        for i in _positions(len(text), self.rate, rng):
+            if chars is None:
+                chars = list(text)
+            chars[i] = text[i].swapcase()
+        return "".join(chars) if chars is not None else text
+
+class StripAccents(Step):
+    def __call__(self, text: str, rng: random.Random) -> str:
+        return text.translate(ACCENTS)
+
+class Typo(Step):
+    """Neighbouring-key substitution, dropped or doubled letters."""
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        super().__init__(spec)
+        keyboard = spec.get("keyboard", "azerty")
+        if keyboard not in NEIGHBOURS:
+            raise ValueError(f"Unknown keyboard: {keyboard}")
+        self.neighbours = NEIGHBOURS[keyboard]
+
+    def __call__(self, text: str, rng: random.Random) -> str:
+        chars = None
+        for i in _positions(len(text), self.rate, rng):
+            near = self.neighbours.get(text[i].lower())
+            if not near:
+                continue
+            if chars is None:
+                chars = list(text)
+            kind = rng.random()
+            if kind < 0.5:
+                key = rng.choice(near)
+                chars[i] = key.upper() if text[i].isupper() else key
+            elif kind < 0.75:
+                chars[i] = ""
+            else:
+                chars[i] = text[i] * 2
+        return "".join(chars) if chars is not None else text
+
+class Swap(Step):
+    def __call__(self, text: str, rng: random.Random) -> str:
+        chars, last = None, -2
+        for i in _positions(len(text) - 1, self.rate, rng):
+            if i <= last + 1 or text[i].isspace() or text[i + 1].isspace():
+                continue
+            if chars is None:
+                chars = list(text)
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+            last = i
+        return "".join(chars) if chars is not None else text
+
+class Whitespace(Step):
+    def __call__(self, text: str, rng: random.Random) -> str:
+        chars = None
+        for i in _positions(len(text), self.rate, rng):
+            if not text[i].isspace():
+                continue
+            if chars is None:
+                chars = list(text)
+            chars[i] = "" if rng.random() < 0.5 else text[i] * 2
+        return "".join(chars) if chars is not None else text
+
+class Punctuation(Step):
+    """Drops existing punctuation, inserts some before whitespace."""
+
+    def __call__(self, text: str, rng: random.Random) -> str:
+        chars = None
+        for i in _positions(len(text), self.rate, rng):
+            c = text[i]
+            if c in PUNCTUATION:
+                replacement = ""
+            elif c.isspace():
+                replacement = rng.choice(PUNCTUATION) + c
+            else:
+                continue
+            if chars is None:
+                chars = list(text)
+            chars[i] = replacement
+        return "".join(chars) if chars is not None else text
+
+STEPS = {
+    "upper": Case,
+    "lower": Case,
+    "title": Case,
+    "random_case": Case,
+    "strip_accents": StripAccents,
+    "typo": Typo,
+    "swap": Swap,
+    "whitespace": Whitespace,
+    "punctuation": Punctuation,
+}
+
+def compile_step(spec: Dict[str, Any]) -> Optional[Step]:
+    step = STEPS.get(spec.get("rule"))
+    return step(spec) if step else None  # unknown rules stay a no-op, as before
+
+# -- Pipeline ---------------------------------------------------------------
+class Augmenter:
+    """Model randomizers compiled once per build.
+
+    As before, one randomizer is picked per sample and applied with its
+    `frequency`; a randomizer may now chain several `steps`. Steps run on
+    the regions between entity boundaries, so spans are rebuilt from the
+    new region lengths and stay exact whatever the length changes.
+    """
+
+    def __init__(self, randomizers: List[Dict[str, Any]] | None) -> None:
+        self.randomizers = [
+            (float(r.get("frequency", 1)), [s for s in map(compile_step, r.get("steps") or [r]) if s])
+            for r in randomizers or []
+        ]
+
+    def __bool__(self) -> bool:
+        return bool(self.randomizers)
+
+    def apply(self, samples: List[Dict[str, Any]], rng: random.Random) -> List[Dict[str, Any]]:
+        for i, sample in enumerate(samples):
+            frequency, steps = rng.choice(self.randomizers) if self.randomizers else (0, None)
+            if steps and frequency >= rng.random():
+                samples[i] = augment(sample, steps, rng)
+        return samples
+
+def augment(sample: Dict[str, Any], steps: List[Step], rng: random.Random) -> Dict[str, Any]:
+    text, entities = sample["text"], sample["entities"]
+
+    cuts = sorted({0, len(text), *(b for start, end, _ in entities for b in (start, end))})
+    bounds = list(zip(cuts, cuts[1:]))
+    regions = [text[a:b] for a, b in bounds]
+    inside = [any(start <= a and b <= end for start, end, _ in entities) for a, b in bounds]
+
+    for step in steps:
+        for k, region in enumerate(regions):
+            if region and step.applies(inside[k]):
+                regions[k] = step(region, rng)
+
+    offsets, acc = {cuts[0]: 0}, 0
+    for (_, b), region in zip(bounds, regions):
+        acc += len(region)
+        offsets[b] = acc
+
+    return {
+        **sample,
+        "text": "".join(regions),
+        "entities": [
+            [offsets[start], offsets[end], label]
+            for start, end, label in entities
+            if offsets[end] > offsets[start]
+        ],
+    }
@@ -1,7 +1,8 @@
-# pip install pillow
+# pip install pillow numpy
 import os
+import numpy as np
 from PIL import Image, ImageChops, ImageFilter, ImageEnhance
-import colorsys, hashlib, math, random
+import colorsys, hashlib, random
 from typing import Tuple, List
 
 RGB = Tuple[int, int, int]
@@ -45,35 +46,24 @@ def palette_from_string(s: str, variant: int = 0) -> List[RGB]:
 # ---------- dégradé diagonal (fond clair et agréable) ----------
 def diagonal_gradient(size: int, c0: RGB, c1: RGB) -> Image.Image:
     w = h = size
-    grad = Image.new("RGB", (w, h))
-    px = grad.load()
-    for y in range(h):
-        for x in range(w):
-            t = (x + y) / (w + h - 2)  # 0 en haut-gauche → 1 en bas-droit
-            px[x, y] = _mix_rgb(c0, c1, t)
-    return grad
+    idx = np.arange(size, dtype=np.float64)
+    t = (idx[None, :] + idx[:, None]) / (w + h - 2)  # 0 en haut-gauche → 1 en bas-droit
+    t = t[..., None]
+    grad = np.asarray(c0, dtype=np.float64) * (1 - t) + np.asarray(c1, dtype=np.float64) * t
+    return Image.fromarray(grad.astype(np.uint8), "RGB")
 
 # --- masque radial doux (centre discret, pas noir) ---
 def radial_mask(size, center, radius, *, edge=2.1, center_power=0.9, strength=0.85):
-    m = Image.new("L", (size, size), 0)
-    px = m.load()
     cx, cy = center
     r = float(radius)
-    inv = 1.0 / r
-    for y in range(size):
-        dy = y - cy
-        for x in range(size):
-            dx = x - cx
-            d = math.hypot(dx, dy)
-            if d >= r:
-                continue
-            t = d * inv                    # 0 au centre → 1 au bord
-            w = (1 - t) ** edge            # fade-out bord
-            w *= max(t, 0.0001) ** center_power  # léger creux au centre
-            a = int(255 * strength * w)
-            if a > px[x, y]:
-                px[x, y] = a
-    return m
+    idx = np.arange(size, dtype=np.float64)
+    d = np.hypot(idx[None, :] - cx, idx[:, None] - cy)
+    t = np.minimum(d / r, 1.0)                 # 0 au centre → 1 au bord
+    w = (1 - t) ** edge                        # fade-out bord
+    w *= np.maximum(t, 0.0001) ** center_power # léger creux au centre
+    a = (255 * strength * w).astype(np.int32)
+    a[d >= r] = 0
+    return Image.fromarray(np.clip(a, 0, 255).astype(np.uint8), "L")
 
 # ---------- centres près des coins ----------
 def corner_centers(size: int, s: str, variant: int) -> List[Tuple[int,int]]:
@@ -119,3 +109,52 @@ def save_avatar(img: Image.Image, folder: str, filename: str) -> None:
     os.makedirs(folder, exist_ok=True)
     img.save(os.path.join(folder, filename), "PNG")
     img.close()
+
+# ---------- cache disque multi-tailles ----------
+AVATAR_SIZES = (32, 64, 128, 256, 512, 800)
+AVATAR_FORMATS = {"png": ("PNG", "image/png"), "webp": ("WEBP", "image/webp")}
+AVATAR_RENDER_VERSION = "v1"  # à incrémenter si le rendu change
+
+def avatar_size(size: int) -> int:
+    """Snap a requested size to the next cached size (caps at the largest)."""
+    for s in AVATAR_SIZES:
+        if size <= s:
+            return s
+    return AVATAR_SIZES[-1]
+
+def avatar_key(seed: str, variant: int) -> str:
+    return hashlib.sha256(f"{seed}|{variant}|{AVATAR_RENDER_VERSION}".encode()).hexdigest()[:24]
+
+def avatar_etag(seed: str, variant: int, size: int, fmt: str) -> str:
+    return f"{avatar_key(seed, variant)}-{size}-{fmt}"
+
+def cached_avatar(folder: str, seed: str, variant: int, size: int, fmt: str = "png") -> str:
+    """Return the path of the rendered avatar, rendering it on first request."""
+    pil_format, _ = AVATAR_FORMATS[fmt]
+    path = os.path.join(folder, f"{avatar_key(seed, variant)}-{size}.{fmt}")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(folder, exist_ok=True)
+    img = generate_avatar(seed, size, variant=variant)
+    # écriture atomique: plusieurs workers peuvent rendre le même avatar
+    tmp = f"{path}.{os.getpid()}.tmp"
+    img.save(tmp, pil_format, **({"quality": 90, "method": 4} if fmt == "webp" else {"optimize": True}))
+    img.close()
+    os.replace(tmp, path)
+    return path
+
+def legacy_avatar_path(static_folder: str, user_id: str) -> str:
+    """PNG rendered at registration before the cache, served as /public/avatars/<id>.png."""
+    return os.path.join(static_folder, "avatars", f"{user_id}.png")
+
+def evict_cached_avatar(folder: str, seed: str, variant: int) -> None:
+    prefix = f"{avatar_key(seed, variant)}-"
+    if not os.path.isdir(folder):
+        return
+    for name in os.listdir(folder):
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                pass
@@ -2,13 +2,17 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, ClassVar, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, ClassVar, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
 
 from bson.objectid import ObjectId
 from pymongo.collection import Collection
 from pymongo.database import Database
 
+from .query_cache import query_cache
+
 Sort = Iterable[Tuple[str, int]]
+# ?fields= selection: field -> selected sub-fields of a populated reference (None: all of it)
+Fields = Dict[str, Optional[List[str]]]
 
 @dataclass(slots=True)
 class BaseDao:
@@ -18,6 +22,23 @@ class BaseDao:
     _hide_mongo_id: bool = False
 
     collection_name: ClassVar[str] = ""  # must be defined in subclasses
+    # read-mostly collections: find/find_one/count results are served from
+    # the process-wide query cache, invalidated by writes through any DAO
+    cached: ClassVar[bool] = False
+    # fields too large to cache: reads whose projection may return them skip the cache
+    uncached_fields: ClassVar[Tuple[str, ...]] = ()
+    # sparse fieldsets: fields a client may select with ?fields=, the fields
+    # holding ids that are populated with another DAO's documents, and the
+    # fields of this DAO's documents that may be selected through a reference
+    fields: ClassVar[Tuple[str, ...]] = ()
+    references: ClassVar[Dict[str, type]] = {}
+    reference_fields: ClassVar[Tuple[str, ...]] = ()
+    SECRET_FIELDS: ClassVar[FrozenSet[str]] = frozenset({"password", "apikey"})
+
+    def __init_subclass__(cls) -> None:
+        # no super(): slots=True rebuilds the class, the zero-arg form breaks here
+        if cls.cached and cls.collection_name:
+            query_cache.register(cls.collection_name)
 
     # -- Collection ---------------------------------------------------------
     @property
@@ -43,14 +64,45 @@ class BaseDao:
     ) -> List[Dict[str, Any]]:
         q = query or {}
         proj = projection or self.default_projection
-        cursor = self.col.find(q, proj)
+        sort = list(sort) if sort else None
+
+        def load() -> List[Dict[str, Any]]:
+            cursor = self.col.find(q, proj)
+            if sort:
+                cursor = cursor.sort(sort)
+            if skip:
+                cursor = cursor.skip(skip)
+            if limit is not None:
+                cursor = cursor.limit(int(limit))
+            return self.serialize(list(cursor))
+
+        if not self._cacheable(proj):
+            return load()
+        return self.cached_read(("find", q, proj, sort, limit, skip), load)
+
+    def iter_find(
+        self,
+        query: Dict[str, Any] | None = None,
+        *,
+        projection: Dict[str, int] | None = None,
+        sort: Sort | None = None,
+        limit: Optional[int] = None,
+        skip: int = 0,
+        batch_size: int = 500,
+    ) -> Iterator[Dict[str, Any]]:
+        """`find`, one serialized document at a time, `batch_size` per round trip; never cached."""
+        cursor = self.col.find(query or {}, projection or self.default_projection).batch_size(batch_size)
         if sort:
             cursor = cursor.sort(list(sort))
         if skip:
             cursor = cursor.skip(skip)
         if limit is not None:
             cursor = cursor.limit(int(limit))
-        return self.serialize(list(cursor))
+        try:
+            for doc in cursor:
+                yield self.serialize(doc)
+        finally:
+            cursor.close()  # client gone mid-stream: free the server-side cursor now
 
     def find_one(
         self,
@@ -58,10 +110,32 @@ class BaseDao:
         *,
         projection: Dict[str, int] | None = None,
     ) -> Dict[str, Any] | None:
-        return self.serialize(self.col.find_one(query, projection or self.default_projection))
+        proj = projection or self.default_projection
+        load = lambda: self.serialize(self.col.find_one(query, proj))
+        if not self._cacheable(proj):
+            return load()
+        return self.cached_read(("find_one", query, proj), load)
 
     def count(self, query: Dict[str, Any] | None = None) -> int:
-        return self.col.count_documents(query or {})
+        q = query or {}
+        return self.cached_read(("count", q), lambda: self.col.count_documents(q))
+
+    def cached_read(self, key: Tuple[Any, ...], load: Callable[[], Any]) -> Any:
+        """`load()`, through the query cache when this DAO is `cached`."""
+        if not self.cached:
+            return load()
+        # repr is exact for the BSON-ish values queries are made of (ObjectId, datetime, ...)
+        return query_cache.get_or_load(self.collection_name, repr(key), load)
+
+    def _cacheable(self, projection: Dict[str, int] | None) -> bool:
+        """False when `projection` may return one of the `uncached_fields`."""
+        if not self.uncached_fields:
+            return True
+        projection = projection or {}
+        inclusion = any(value for name, value in projection.items() if name != "_id") or projection == {"_id": 1}
+        if inclusion:
+            return not any(projection.get(name) for name in self.uncached_fields)
+        return all(name in projection for name in self.uncached_fields)
 
     def paginate(
         self,
@@ -82,13 +156,57 @@ class BaseDao:
         )
         return {"items": items, "page": page, "per_page": per_page, "total": total}
 
+    # -- Sparse fieldsets ---------------------------------------------------
+    def select(self, fields: str | None, *, extra: Iterable[str] = ()) -> Fields | None:
+        """Parsed `?fields=a,b,ref.c`, checked against the allow-list.
+
+        `extra` allows fields computed by the caller rather than stored.
+        None without a selection; ValueError on an unknown or secret field.
+        """
+        if not fields:
+            return None
+        allowed = set(self.fields).union(extra) - self.SECRET_FIELDS
+
+        selection: Fields = {}
+        for name in filter(None, (part.strip() for part in fields.split(","))):
+            head, _, sub = name.partition(".")
+            if head not in allowed:
+                raise ValueError(f"Unknown field: {name}")
+            if not sub:
+                selection[head] = None
+                continue
+            reference = self.references.get(head)
+            if reference is None or sub not in set(reference.reference_fields) - self.SECRET_FIELDS:
+                raise ValueError(f"Unknown field: {name}")
+            if selection.setdefault(head, []) is not None:
+                selection[head].append(sub)
+        return selection
+
+    @staticmethod
+    def projection(fields: Iterable[str] | None, default: Dict[str, int] | None = None) -> Dict[str, int] | None:
+        """Inclusion projection of the selected fields, `default` without a selection."""
+        if fields is None:
+            return default
+        # an empty inclusion projection would return every field
+        return {name: 1 for name in fields} or {"_id": 1}
+
+    @staticmethod
+    def pick(doc: Dict[str, Any], fields: Fields | None) -> Dict[str, Any]:
+        """`doc` cut down to the selected fields and its _id, for fields set after the read."""
+        if fields is None:
+            return doc
+        return {key: value for key, value in doc.items() if key == "_id" or key in fields}
+
     # -- Write --------------------------------------------------------------
     def insert_one(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         self.col.insert_one(payload)
+        self.invalidate()
         return self.serialize(payload)
 
     def insert_many(self, payloads: List[Dict[str, Any]]) -> int:
-        return len(self.col.insert_many(payloads).inserted_ids)
+        inserted = len(self.col.insert_many(payloads).inserted_ids)
+        self.invalidate()
+        return inserted
 
     def update_one(
         self,
@@ -100,10 +218,17 @@ class BaseDao:
     ) -> int:
         ops = {"$set": update} if set_operator else update
         res = self.col.update_one(query, ops, upsert=upsert)
+        self.invalidate()
         return res.modified_count + (1 if res.upserted_id else 0)
 
     def delete_one(self, query: Dict[str, Any]) -> int:
-        return self.col.delete_one(query).deleted_count
+        deleted = self.col.delete_one(query).deleted_count
+        self.invalidate()
+        return deleted
+
+    def invalidate(self) -> None:
+        """Drop cached reads of this collection; call it after writing through `col`."""
+        query_cache.invalidate(self.collection_name)
 
     # -- Utils --------------------------------------------------------------
     def serialize(self, response: Any) -> Any:
@@ -1,8 +1,9 @@
 from dataclasses import dataclass
+from typing import Any, Dict, Iterable
 from bson import ObjectId
 from pymongo.database import Database
 
-from .base_dao import BaseDao
+from .base_dao import BaseDao, Fields
 
 @dataclass(slots=True)
 class BaseService:
@@ -22,5 +23,20 @@ class BaseService:
         
         return document
 
+    def lookup(self, collection: str, ids: Iterable[Any], *, projection: dict = None) -> Dict[str, dict]:
+        """Documents of `collection` by string id: one query for a whole batch of references."""
+        keys = list({ObjectId(i) for i in ids if i})
+        if not keys:
+            return {}
+        return {str(doc["_id"]): self.dao.serialize(doc) for doc in self.db[collection].find({"_id": {"$in": keys}}, projection)}
+
+    def reference_projection(self, fields: Fields | None, name: str, default: dict) -> dict | None:
+        """Projection of the documents populating reference `name`; None when it is not selected."""
+        if fields is None:
+            return default
+        if name not in fields:
+            return None
+        return BaseDao.projection(fields[name], default)
+
     def document_exists(self, *, query: dict = {}, id: str = None) -> bool:
         return self.dao.find_one(self.query_or_id(query=query, id=id)) is not None
\ No newline at end of file
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable
+import hashlib, math, threading
+
+class BloomFilter:
+    """Fixed-size Bloom filter: no false negatives, tunable false positives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+
+        # m = -n ln(p) / ln(2)^2, k = m/n ln(2)
+        self.n_bits = max(8, int(math.ceil(-self.capacity * math.log(self.error_rate) / (math.log(2) ** 2))))
+        self.n_hashes = max(1, int(round(self.n_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+        self._lock = threading.Lock()
+
+    def _positions(self, value: str) -> Iterable[int]:
+        # double hashing (Kirsch-Mitzenmacher) from a single 128-bit digest
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.n_bits for i in range(self.n_hashes))
+
+    def add(self, value: str) -> None:
+        with self._lock:
+            for pos in self._positions(value):
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate for the number of values added so far."""
+        if not self.count:
+            return 0.0
+        return (1 - math.exp(-self.n_hashes * self.count / self.n_bits)) ** self.n_hashes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "capacity": self.capacity,
+            "bits": self.n_bits,
+            "hashes": self.n_hashes,
+            "memory_bytes": self.memory_bytes,
+            "target_error_rate": self.error_rate,
+            "false_positive_rate": self.false_positive_rate,
+        }
+
+class ScalableBloomFilter:
+    """Bloom filter that grows with what is added (Almeida et al., "Scalable Bloom Filters").
+
+    Once the last layer holds its capacity, a new one is added with GROWTH
+    times the capacity and TIGHTENING times the error rate. The error rates
+    sum to at most `error_rate` however many values are added.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.error_rate = float(error_rate)
+        self.layers = [BloomFilter(capacity, self.error_rate * (1 - self.TIGHTENING))]
+        self._lock = threading.Lock()
+
+    def add(self, value: str) -> None:
+        with self._lock:
+            layer = self.layers[-1]
+            if layer.count >= layer.capacity:
+                layer = BloomFilter(layer.capacity * self.GROWTH, layer.error_rate * self.TIGHTENING)
+                self.layers.append(layer)
+        layer.add(value)
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value: str) -> bool:
+        return any(value in layer for layer in reversed(self.layers))
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+    @property
+    def capacity(self) -> int:
+        return sum(layer.capacity for layer in self.layers)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(layer.memory_bytes for layer in self.layers)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate for the number of values added so far."""
+        miss = 1.0
+        for layer in self.layers:
+            miss *= 1 - layer.false_positive_rate
+        return 1 - miss
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": len(self),
+            "capacity": self.capacity,
+            "layers": len(self.layers),
+            "memory_bytes": self.memory_bytes,
+            "target_error_rate": self.error_rate,
+            "false_positive_rate": self.false_positive_rate,
+        }
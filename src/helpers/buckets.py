@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterator, List, Tuple
+import sys
+
+from bson.binary import Binary
+
+def pack_samples(samples: List[Dict[str, Any]]) -> Tuple[List[str], List[Any], Binary]:
+    """Pack samples into parallel texts, entity labels and a binary int32 array.
+
+    The array holds, per sample, its entity count followed by one
+    (start, end, label index) triple per entity.
+    """
+    texts, labels, index = [], [], {}
+    ints = array("i")
+
+    for sample in samples:
+        texts.append(sample.get("text", ""))
+        entities = sample.get("entities", [])
+        ints.append(len(entities))
+        for start, end, label in entities:
+            k = index.get(label)
+            if k is None:
+                k = index[label] = len(labels)
+                labels.append(label)
+            ints.extend((start, end, k))
+
+    if sys.byteorder == "big":
+        ints.byteswap()
+    return texts, labels, Binary(ints.tobytes())
+
+def unpack_samples(texts: List[str], labels: List[Any], blob: bytes) -> Iterator[Dict[str, Any]]:
+    ints = array("i")
+    ints.frombytes(bytes(blob))
+    if sys.byteorder == "big":
+        ints.byteswap()
+
+    pos = 0
+    for text in texts:
+        count = ints[pos]
+        pos += 1
+        entities = []
+        for _ in range(count):
+            entities.append([ints[pos], ints[pos + 1], labels[ints[pos + 2]]])
+            pos += 3
+        yield {"text": text, "entities": entities}
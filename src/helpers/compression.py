@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional
+import hashlib, zlib
+
+from flask import Config, Flask, Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/plain",
+}
+
+class Compress:
+    """gzip/brotli response compression plus body ETags for GET requests.
+
+    Buffered responses get a strong ETag from their uncompressed body
+    (suffixed with the content coding) and are answered with 304 when the
+    client already has them. Bodies above COMPRESS_STREAM_THRESHOLD and
+    streamed responses are compressed chunk by chunk instead of being
+    copied into a second compressed buffer.
+    """
+
+    def __init__(self, app: Flask | None = None) -> None:
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("COMPRESS_MIN_SIZE", 512)
+        app.config.setdefault("COMPRESS_STREAM_THRESHOLD", 1024 * 1024)
+        app.config.setdefault("COMPRESS_CHUNK_SIZE", 64 * 1024)
+        app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+        app.config.setdefault("COMPRESS_BROTLI_QUALITY", 4)
+        app.config.setdefault("ETAG_MAX_SIZE", 16 * 1024 * 1024)
+        app.after_request(self.after_request)
+
+    # -- Hook ---------------------------------------------------------------
+    def after_request(self, response: Response) -> Response:
+        if request.method not in ("GET", "HEAD") or response.status_code != 200:
+            return response
+        if response.direct_passthrough or "Content-Encoding" in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        # the app serving this request: several apps can share the extension
+        config = current_app.config
+        encoding = self._negotiate()
+        response.vary.add("Accept-Encoding")
+
+        if response.is_streamed:
+            if encoding:
+                self._stream(response, response.response, encoding, config)
+            return response
+
+        body = response.get_data()
+
+        if len(body) <= config["ETAG_MAX_SIZE"] and "ETag" not in response.headers:
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+            response.set_etag(f"{etag}-{encoding}" if encoding and len(body) >= config["COMPRESS_MIN_SIZE"] else etag)
+            if not response.cache_control.public:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if not encoding or len(body) < config["COMPRESS_MIN_SIZE"]:
+            return response
+
+        if len(body) >= config["COMPRESS_STREAM_THRESHOLD"]:
+            chunk = config["COMPRESS_CHUNK_SIZE"]
+            self._stream(response, (body[i:i + chunk] for i in range(0, len(body), chunk)), encoding, config)
+            return response
+
+        response.set_data(self._compress(body, encoding, config))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    # -- Utils --------------------------------------------------------------
+    def _negotiate(self) -> Optional[str]:
+        accept = request.accept_encodings
+        if brotli is not None and accept["br"]:
+            return "br"
+        if accept["gzip"]:
+            return "gzip"
+        return None
+
+    def _compress(self, body: bytes, encoding: str, config: Config) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=config["COMPRESS_BROTLI_QUALITY"])
+        compressor = zlib.compressobj(config["COMPRESS_GZIP_LEVEL"], zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+
+    def _stream(self, response: Response, chunks: Iterable[bytes | str], encoding: str, config: Config) -> None:
+        # config is passed along: chunks are compressed after the request context is gone
+        response.response = self._compress_chunks(chunks, encoding, config, getattr(chunks, "close", None))
+        response.headers["Content-Encoding"] = encoding
+        response.headers.pop("Content-Length", None)
+
+    def _compress_chunks(self, chunks: Iterable[bytes | str], encoding: str, config: Config, close=None) -> Iterator[bytes]:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=config["COMPRESS_BROTLI_QUALITY"])
+            compress, flush = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(config["COMPRESS_GZIP_LEVEL"], zlib.DEFLATED, 31)
+            compress, flush = compressor.compress, compressor.flush
+
+        try:
+            for chunk in chunks:
+                out = compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+                if out:
+                    yield out
+            yield flush()
+        finally:
+            if close is not None:
+                close()
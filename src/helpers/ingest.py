@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import IO, Any, Iterator, Optional
+import codecs, csv, json, re, unicodedata
+
+from src.helpers.text import ACCENTS
+
+class LineReader:
+    """Decoded lines from a byte stream, read `chunk_size` bytes at a time.
+
+    `bytes_read` tracks how far into the stream parsing is, for progress.
+    A `limit` larger than the stream raises ValueError once crossed.
+    """
+
+    def __init__(self, stream: IO[bytes], *, chunk_size: int = 64 * 1024, limit: Optional[int] = None) -> None:
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.limit = limit
+        self.bytes_read = 0
+
+    def __iter__(self) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        pending = ""
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                break
+            self.bytes_read += len(chunk)
+            if self.limit is not None and self.bytes_read > self.limit:
+                raise ValueError("Upload is too large")
+
+            lines = (pending + decoder.decode(chunk)).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n"
+
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+def iter_csv(lines: Iterator[str], *, column: str | int = 0, header: bool = True) -> Iterator[Any]:
+    rows = csv.reader(lines)
+    index = column if isinstance(column, int) else None
+    if header:
+        names = next(rows, [])
+        if index is None:
+            if column not in names:
+                raise ValueError(f"Unknown CSV column: {column}")
+            index = names.index(column)
+    elif index is None:
+        raise ValueError("A named CSV column needs a header row")
+
+    for row in rows:
+        if len(row) > index:
+            yield row[index]
+
+def iter_jsonl(lines: Iterator[str], *, field: str = "value") -> Iterator[Any]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON on line {number}")
+        yield item.get(field) if isinstance(item, dict) else item
+
+_spaces = re.compile(r"\s+")
+
+def normalize(value: Any, *, case: Optional[str] = None, strip_accents: bool = False) -> Optional[str]:
+    """NFC, trimmed, single-spaced string; None for values that are empty once cleaned."""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    value = _spaces.sub(" ", unicodedata.normalize("NFC", str(value))).strip()
+    if strip_accents:
+        value = value.translate(ACCENTS)
+    if case == "lower":
+        value = value.lower()
+    elif case == "upper":
+        value = value.upper()
+    return value or None
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+import atexit, json, os, threading, time
+
+from flask import Flask, Response, g, request
+from pymongo import monitoring
+
+# counters of exited workers, folded in by mark_process_dead
+ARCHIVE = "archive.json"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]) -> None:
+        self.name, self.help, self.labels = name, help, labels
+        self.series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        with self._lock:
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    def snapshot(self) -> Dict[Labels, Any]:
+        with self._lock:
+            return dict(self.series)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # per series: one count per bucket, one for +Inf, then the sum
+        self.series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[Labels, Any]:
+        with self._lock:
+            return {k: list(v) for k, v in self.series.items()}
+
+class Registry:
+    """Process-local metrics, optionally merged across workers via METRICS_DIR."""
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Counter | Histogram] = {}
+        self.directory: str | None = None
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    # -- Multi-process ------------------------------------------------------
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {json.dumps(k): v for k, v in metric.snapshot().items()} for name, metric in self.metrics.items()}
+
+    def flush(self) -> None:
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        if not self.directory:
+            return self.snapshot()
+
+        # exited workers live on in ARCHIVE (mark_process_dead): counters never go backwards
+        merged: Dict[str, Dict[str, Any]] = {}
+        own = f"{os.getpid()}.json"
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json") or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    self._merge(merged, json.load(f))
+            except (OSError, ValueError):
+                continue
+        self._merge(merged, self.snapshot())
+        return merged
+
+    @staticmethod
+    def _merge(into: Dict[str, Dict[str, Any]], snapshot: Dict[str, Dict[str, Any]]) -> None:
+        for name, series in snapshot.items():
+            target = into.setdefault(name, {})
+            for key, value in series.items():
+                if key not in target:
+                    target[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target[key] = [a + b for a, b in zip(target[key], value)]
+                else:
+                    target[key] += value
+
+    # -- Exposition ---------------------------------------------------------
+    def render(self) -> str:
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(collected.get(name, {}).items()):
+                labels = list(zip(metric.labels, json.loads(key)))
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {value:g}")
+                    continue
+                cumulative = 0
+                for le, count in zip((*metric.buckets, "+Inf"), value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', le if isinstance(le, str) else f'{le:g}')])} {cumulative:g}")
+                lines.append(f"{name}_sum{_labels(labels)} {value[-1]:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative:g}")
+        return "\n".join(lines) + "\n"
+
+def mark_process_dead(pid: int, directory: str | None = None) -> None:
+    """Fold an exited worker's metrics into ARCHIVE and drop its file.
+
+    Call it from the process manager once the worker is gone (gunicorn's
+    child_exit): METRICS_DIR then holds one file per live worker, and a
+    reused pid starts from zero without taking the old totals with it.
+    """
+    directory = directory or os.getenv("METRICS_DIR")
+    if not directory:
+        return
+    path = os.path.join(directory, f"{pid}.json")
+    try:
+        with open(path) as f:
+            dead = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    archive_path = os.path.join(directory, ARCHIVE)
+    archive: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(archive_path) as f:
+            archive = json.load(f)
+    except (OSError, ValueError):
+        pass
+    Registry._merge(archive, dead)
+
+    with open(f"{archive_path}.tmp", "w") as f:
+        json.dump(archive, f)
+    os.replace(f"{archive_path}.tmp", archive_path)
+    os.remove(path)
+
+def _labels(pairs: List[Tuple[str, Any]]) -> str:
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+# -- Mongo ------------------------------------------------------------------
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self, registry: Registry) -> None:
+        self.latency = registry.histogram(
+            "sardine_mongo_command_duration_seconds", "Mongo command latency", ("collection", "command")
+        )
+        self.failures = registry.counter(
+            "sardine_mongo_command_failures_total", "Failed Mongo commands", ("collection", "command")
+        )
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.latency.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.latency.observe(event.duration_micros / 1e6, collection, event.command_name)
+        self.failures.inc(collection, event.command_name)
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self, registry: Registry) -> None:
+        self.wait = registry.histogram(
+            "sardine_mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("address",)
+        )
+        self.failures = registry.counter(
+            "sardine_mongo_pool_checkout_failures_total", "Failed connection checkouts", ("address", "reason")
+        )
+        # checkout happens on the calling thread
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self.wait.observe(time.perf_counter() - started, "%s:%s" % event.address)
+            self._local.started = None
+
+    def connection_check_out_failed(self, event) -> None:
+        self._local.started = None
+        self.failures.inc("%s:%s" % event.address, str(event.reason))
+
+    def pool_created(self, event) -> None: pass
+    def pool_ready(self, event) -> None: pass
+    def pool_cleared(self, event) -> None: pass
+    def pool_closed(self, event) -> None: pass
+    def connection_created(self, event) -> None: pass
+    def connection_ready(self, event) -> None: pass
+    def connection_closed(self, event) -> None: pass
+    def connection_checked_in(self, event) -> None: pass
+
+# -- Flask ------------------------------------------------------------------
+class Metrics:
+    """Per-blueprint/per-route request metrics and pymongo monitoring."""
+
+    def __init__(self) -> None:
+        self.registry = Registry()
+        self.request_latency = self.registry.histogram(
+            "sardine_http_request_duration_seconds", "HTTP request latency", ("blueprint", "route", "method")
+        )
+        self.requests = self.registry.counter(
+            "sardine_http_requests_total", "HTTP requests", ("blueprint", "route", "method", "status")
+        )
+        self._listeners = [CommandMetrics(self.registry), PoolMetrics(self.registry)]
+        self._flusher: threading.Thread | None = None
+        self._flusher_lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("METRICS_DIR", None)
+        app.config.setdefault("METRICS_FLUSH_SECONDS", 5)
+        app.config.setdefault("METRICS_TOKEN", None)
+
+        self.registry.directory = app.config["METRICS_DIR"]
+        if self.registry.directory:
+            os.makedirs(self.registry.directory, exist_ok=True)
+        self.flush_seconds = app.config["METRICS_FLUSH_SECONDS"]
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def mongo_listeners(self) -> list:
+        return list(self._listeners)
+
+    def response(self) -> Response:
+        return Response(self.registry.render(), mimetype="text/plain", headers={"Cache-Control": "no-store"})
+
+    # -- Hooks --------------------------------------------------------------
+    def _before_request(self) -> None:
+        g._metrics_started = time.perf_counter()
+        if self.registry.directory and self._flusher is None:
+            with self._flusher_lock:
+                if self._flusher is None:
+                    self._start_flusher()
+
+    def _after_request(self, response: Response) -> Response:
+        started = g.pop("_metrics_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+        blueprint = request.blueprint or ""
+        self.request_latency.observe(elapsed, blueprint, rule, request.method)
+        self.requests.inc(blueprint, rule, request.method, str(response.status_code))
+        return response
+
+    def _start_flusher(self) -> None:
+        # started lazily so it runs in the worker, never in a pre-fork master
+        def loop():
+            while True:
+                time.sleep(self.flush_seconds)
+                try:
+                    self.registry.flush()
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.registry.flush)
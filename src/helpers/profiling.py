@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+import cProfile, json, os, pstats, random, threading, time, tracemalloc, uuid
+
+from flask import Flask, Response, current_app, g, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+
+class Profiler:
+    """Opt-in per-request cProfile + tracemalloc capture.
+
+    A request is profiled when PROFILE_SAMPLE_RATE draws it, or when it
+    carries the PROFILE_HEADER header with an admin token. Hooks are only
+    installed when PROFILING_ENABLED is set, so normal requests pay nothing
+    otherwise. One request is profiled at a time per process since
+    tracemalloc is process-wide.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("PROFILING_ENABLED", False)
+        app.config.setdefault("PROFILE_SAMPLE_RATE", 0.0)
+        app.config.setdefault("PROFILE_HEADER", "X-Profile")
+        app.config.setdefault("PROFILE_DIR", None)
+        app.config.setdefault("PROFILE_MAX_FILES", 200)
+        app.config.setdefault("PROFILE_TOP", 30)
+
+        if not app.config["PROFILING_ENABLED"]:
+            return
+        os.makedirs(self._directory(app), exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    # -- Storage ------------------------------------------------------------
+    @property
+    def directory(self) -> str:
+        return self._directory(current_app)
+
+    @staticmethod
+    def _directory(app: Flask) -> str:
+        # never under static_folder: reports are only served by the admin routes
+        return app.config["PROFILE_DIR"] or os.path.join(app.instance_path, "profiles")
+
+    def list(self) -> List[Dict[str, Any]]:
+        profiles = []
+        if not os.path.isdir(self.directory):
+            return profiles
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(".json"):
+                report = self.get(name[:-5])
+                if report:
+                    report.pop("functions", None)
+                    report.pop("allocations", None)
+                    profiles.append(report)
+        return profiles
+
+    def get(self, profile_id: str) -> Dict[str, Any] | None:
+        path = self.path(profile_id, "json")
+        if not path or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def path(self, profile_id: str, ext: str) -> str | None:
+        if not profile_id.replace("-", "").isalnum():
+            return None
+        return os.path.abspath(os.path.join(self.directory, f"{profile_id}.{ext}"))
+
+    # -- Hooks --------------------------------------------------------------
+    def _before_request(self) -> None:
+        # settings of the app serving this request: several apps can share the extension
+        config = current_app.config
+        sample_rate = float(config["PROFILE_SAMPLE_RATE"])
+        sampled = sample_rate > 0 and random.random() < sample_rate
+        admin = bool(request.headers.get(config["PROFILE_HEADER"])) and self._is_admin()
+        if not sampled and not admin:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+
+        owns_tracemalloc = not tracemalloc.is_tracing()
+        if owns_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+
+        profile = cProfile.Profile()
+        g._profile = {
+            "profile": profile,
+            "owns_tracemalloc": owns_tracemalloc,
+            "memory_before": before,
+            "started": time.perf_counter(),
+            "sampled": sampled,
+            "admin": admin,
+        }
+        profile.enable()
+
+    def _after_request(self, response: Response) -> Response:
+        state = g.pop("_profile", None)
+        if state is None:
+            return response
+        try:
+            profile_id = self._finish(state, response.status_code)
+            # sampled requests of other users are profiled too: only admins learn the id
+            if state["admin"] or self._is_admin():
+                response.headers["X-Profile-Id"] = profile_id
+        finally:
+            self._lock.release()
+        return response
+
+    def _teardown_request(self, exc: BaseException | None) -> None:
+        # unhandled exception: after_request never ran
+        state = g.pop("_profile", None)
+        if state is None:
+            return
+        try:
+            self._finish(state, 500)
+        finally:
+            self._lock.release()
+
+    def _finish(self, state: Dict[str, Any], status: int) -> str:
+        profile: cProfile.Profile = state["profile"]
+        profile.disable()
+        elapsed = time.perf_counter() - state["started"]
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        ))
+        if state["owns_tracemalloc"]:
+            tracemalloc.stop()
+
+        profile_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profile.dump_stats(self.path(profile_id, "prof"))
+
+        report = {
+            "id": profile_id,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": status,
+            "sampled": state["sampled"],
+            "duration_ms": round(elapsed * 1e3, 3),
+            "memory": {
+                "peak_bytes": peak - state["memory_before"],
+                "retained_bytes": current - state["memory_before"],
+            },
+            "functions": self._top_functions(profile),
+            "allocations": [
+                {"file": stat.traceback[0].filename, "line": stat.traceback[0].lineno, "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:int(current_app.config["PROFILE_TOP"])]
+            ],
+            "created_at": time.time(),
+        }
+        with open(self.path(profile_id, "json"), "w") as f:
+            json.dump(report, f)
+
+        self._prune()
+        return profile_id
+
+    # -- Utils --------------------------------------------------------------
+    def _is_admin(self) -> bool:
+        try:
+            verify_jwt_in_request()
+        except Exception:
+            return False
+        return get_jwt().get("role") == "admin"
+
+    def _top_functions(self, profile: cProfile.Profile) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(profile).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:int(current_app.config["PROFILE_TOP"])]
+        return [
+            {
+                "function": f"{file}:{line}({name})",
+                "calls": nc,
+                "primitive_calls": cc,
+                "tottime": round(tt, 6),
+                "cumtime": round(ct, 6),
+            }
+            for (file, line, name), (cc, nc, tt, ct, _) in rows
+        ]
+
+    def _prune(self) -> None:
+        max_files = int(current_app.config["PROFILE_MAX_FILES"])
+        reports = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        for name in reports[:max(0, len(reports) - max_files)]:
+            for ext in ("json", "prof"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{name[:-5]}.{ext}"))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import threading, time
+
+class ProgressBroker:
+    """In-process latest-value pub/sub: one slot per build, many waiters."""
+
+    def __init__(self) -> None:
+        self._events: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._cond = threading.Condition()
+
+    def publish(self, key: str, event: Dict[str, Any]) -> None:
+        with self._cond:
+            seq = self._events.get(key, (0, None))[0] + 1
+            self._events[key] = (seq, event)
+            self._cond.notify_all()
+
+    def latest(self, key: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        with self._cond:
+            return self._events.get(key, (0, None))
+
+    def wait(self, key: str, after: int, timeout: float) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Block until an event newer than `after` is published, or timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events.get(key, (0, None))[0] > after, timeout)
+            return self._events.get(key, (0, None))
+
+    def discard(self, key: str) -> None:
+        with self._cond:
+            self._events.pop(key, None)
+
+broker = ProgressBroker()
+
+class ProgressTracker:
+    """Counts work done (generated samples, uploaded bytes) and publishes throttled progress.
+
+    Subscribers in this process are notified at most every
+    `publish_interval` seconds; `persist` (the Mongo write) runs at most
+    every `persist_interval` seconds, whatever the generation rate.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        total: int | None,
+        *,
+        done: int = 0,
+        status: str = "generating",
+        persist: Callable[[Dict[str, Any]], Any] | None = None,
+        publish_interval: float = 0.5,
+        persist_interval: float = 2.0,
+    ) -> None:
+        self.key = key
+        self.total = int(total) if total is not None else None
+        self.done = int(done)
+        self.status = status
+        self.persist = persist
+        self.publish_interval = publish_interval
+        self.persist_interval = persist_interval
+
+        self._initial = self.done
+        self._started = time.monotonic()
+        self._published = 0.0
+        self._persisted = 0.0
+
+    def advance(self, n: int = 1) -> None:
+        self.done += n
+        # clock reads are the only per-sample cost, and only every 64 single steps
+        if n == 1 and self.done & 63 and self.done != self.total:
+            return
+        now = time.monotonic()
+        if now - self._published >= self.publish_interval:
+            self._publish(now, self.status)
+
+    def finish(self, status: str) -> Dict[str, Any]:
+        return self._publish(time.monotonic(), status, force=True)
+
+    def snapshot(self, status: str | None = None) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        rate = (self.done - self._initial) / elapsed
+        # total is None when the size is unknown (e.g. a chunked upload): no percent nor ETA
+        remaining = max(0, self.total - self.done) if self.total is not None else None
+        return {
+            "status": status or self.status,
+            "done": self.done,
+            "total": self.total,
+            "percent": None if self.total is None else round(100 * self.done / self.total, 2) if self.total else 100.0,
+            "rate": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if remaining is not None and rate > 0 else None,
+            "elapsed_seconds": round(elapsed, 1),
+        }
+
+    def _publish(self, now: float, status: str, *, force: bool = False) -> Dict[str, Any]:
+        event = self.snapshot(status)
+        self._published = now
+        broker.publish(self.key, event)
+        if self.persist and (force or now - self._persisted >= self.persist_interval):
+            self._persisted = now
+            self.persist(event)
+        return event
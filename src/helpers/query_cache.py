@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import os, threading, time
+
+from flask import Flask
+from pymongo.database import Database
+from pymongo.errors import OperationFailure, PyMongoError
+
+def _clone(value: Any) -> Any:
+    """Copy of a serialized result: callers mutate what they get back."""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if any(isinstance(v, (dict, list)) for v in value):
+            return [_clone(v) for v in value]
+        return list(value)  # e.g. vocabulary values: a flat copy is much cheaper
+    return value
+
+class QueryCache:
+    """Per-process LRU of DAO read results, for DAOs with `cached = True`.
+
+    Entries are tagged with their collection's generation, bumped by every
+    write made through a DAO: a stale entry is never served by the process
+    that wrote. Writes made by other processes are seen after at most
+    QUERY_CACHE_TTL_SECONDS, or as they happen with QUERY_CACHE_CHANGE_STREAM
+    (needs a replica set, a single node one is enough).
+    """
+
+    def __init__(self) -> None:
+        self.max_entries = 0  # disabled until init_app
+        self.ttl = 0.0
+        self._entries: OrderedDict[Hashable, Tuple[int, float, Any]] = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._db: Database | None = None
+        self._collections: set[str] = set()
+        self._change_stream = False
+        self._watch_pid: int | None = None
+        self._watching = False
+        self._requests = None
+
+    def init_app(self, app: Flask, db: Database, *, registry=None) -> None:
+        app.config.setdefault("QUERY_CACHE_SIZE", 10_000)
+        app.config.setdefault("QUERY_CACHE_TTL_SECONDS", 5)
+        app.config.setdefault("QUERY_CACHE_CHANGE_STREAM", False)
+
+        self.max_entries = int(app.config["QUERY_CACHE_SIZE"])
+        self.ttl = float(app.config["QUERY_CACHE_TTL_SECONDS"])
+        self._change_stream = bool(app.config["QUERY_CACHE_CHANGE_STREAM"])
+        self._db = db
+        self._logger = app.logger
+        self._watch_pid = None
+        self.clear()
+
+        if registry is not None:
+            self._requests = registry.counter(
+                "sardine_query_cache_requests_total", "DAO read cache lookups", ("collection", "result")
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def register(self, collection: str) -> None:
+        """Declare a cached collection, watched when the change stream is on."""
+        self._collections.add(collection)
+
+    # -- Lookups ------------------------------------------------------------
+    def get_or_load(self, collection: str, key: Hashable, load: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return load()
+        self._ensure_watcher()
+
+        now = time.monotonic()
+        key = (self._db.name if self._db is not None else "", collection, key)
+        with self._lock:
+            # read before the query: a write landing meanwhile makes this entry stale
+            generation = self._generations.get(collection, 0)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._count(collection, "hit")
+                return _clone(entry[2])
+
+        result = load()
+        with self._lock:
+            self._entries[key] = (generation, now + self.ttl, _clone(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._count(collection, "miss")
+        return result
+
+    def invalidate(self, collection: str) -> None:
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "generations": dict(self._generations),
+            "change_stream": self._watching and self._watch_pid == os.getpid(),
+        }
+
+    def _count(self, collection: str, result: str) -> None:
+        if self._requests is not None:
+            self._requests.inc(collection, result)
+
+    # -- Change stream ------------------------------------------------------
+    def _ensure_watcher(self) -> None:
+        # threads do not survive a fork: each worker starts its own
+        if not self._change_stream or self._db is None or self._watch_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watch_pid == os.getpid():
+                return
+            self._watch_pid = os.getpid()
+            self._watching = True
+        threading.Thread(target=self._run_watcher, name="query-cache-watch", daemon=True).start()
+
+    def _run_watcher(self) -> None:
+        try:
+            self._watch_changes()
+        finally:
+            self._watching = False
+
+    def _watch_changes(self) -> None:
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": {"$in": sorted(self._collections)}},
+            {"operationType": {"$in": ["dropDatabase", "invalidate"]}},
+        ]}}]
+        token: Optional[Dict[str, Any]] = None
+        delay = 1.0
+        while True:
+            try:
+                with self._db.watch(pipeline, resume_after=token) as stream:
+                    delay = 1.0
+                    for change in stream:
+                        token = stream.resume_token
+                        if change["operationType"] == "invalidate":
+                            token = None  # the stream ended, it cannot be resumed
+                            break
+                        collection = change.get("ns", {}).get("coll")
+                        if collection:
+                            self.invalidate(collection)
+                        else:
+                            self._invalidate_watched()
+            except OperationFailure as e:
+                if e.code in (40573, 40324, 136):  # not a replica set / unsupported
+                    self._logger.warning("Query cache change stream unavailable, relying on TTL: %s", e)
+                    return
+                token = None
+                self._logger.warning("Query cache change stream failed, retrying: %s", e)
+            except PyMongoError as e:
+                self._logger.warning("Query cache change stream interrupted, retrying: %s", e)
+            except Exception:
+                self._logger.exception("Query cache change stream stopped, relying on TTL")
+                return
+
+            # changes may have been missed while disconnected
+            self._invalidate_watched()
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _invalidate_watched(self) -> None:
+        for collection in self._collections:
+            self.invalidate(collection)
+
+query_cache = QueryCache()
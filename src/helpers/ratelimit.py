@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import hashlib, math, mmap, os, struct, tempfile, threading, time
+
+from flask import Flask, Response, current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locks, limits stay per process
+    fcntl = None
+
+DEFAULT_COSTS = {
+    "api.auth.login": 10,
+    "api.auth.register": 20,
+    "api.models.build_model": 30,
+    "api.models.resume_build": 30,
+    "api.models.preview_model": 10,
+    "api.models/data.upload_data": 20,
+    "api.models/data.upload_new_data": 20,
+    "api.datasets.export_dataset": 10,
+}
+
+# concurrent requests per worker process; over it the request is refused with 503
+DEFAULT_CONCURRENCY = {
+    "api.models.build_model": 2,
+    "api.models.resume_build": 2,
+}
+
+def take(tokens: float, updated: float, now: float, cost: float, burst: float, rate: float) -> Tuple[bool, float, float]:
+    """Token bucket step: (allowed, tokens left, seconds until `cost` is available)."""
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+class LocalStore:
+    """Buckets in this process only, least recently used keys dropped first."""
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, burst: float, rate: float, now: float) -> Tuple[bool, float, float]:
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            allowed, tokens, wait = take(tokens, updated, now, cost, burst, rate)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens, wait
+
+class SharedMemoryStore:
+    """Buckets in an mmap'ed file shared by every worker on the host.
+
+    The file is a fixed table of (key hash, tokens, updated) slots split in
+    stripes of STRIPE slots; a key lives in one stripe, guarded by an fcntl
+    byte-range lock, and evicts the stalest slot when the stripe is full.
+    """
+
+    SLOT = struct.Struct("<Qdd")
+    STRIPE = 16
+
+    def __init__(self, path: str, slots: int = 65_536) -> None:
+        self.path = path
+        self.stripes = max(1, slots // self.STRIPE)
+        self.size = self.stripes * self.STRIPE * self.SLOT.size
+        self._pid = None
+        self._lock = threading.Lock()  # fcntl locks are per process, not per thread
+
+    def _open(self) -> None:
+        if self._pid == os.getpid():
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._fd, self._mm, self._pid = fd, mmap.mmap(fd, self.size), os.getpid()
+
+    def take(self, key: str, cost: float, burst: float, rate: float, now: float) -> Tuple[bool, float, float]:
+        h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") | 1
+        first = h % self.stripes * self.STRIPE
+        start, length = first * self.SLOT.size, self.STRIPE * self.SLOT.size
+
+        with self._lock:
+            self._open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                slot, stalest, stalest_at = None, first, math.inf
+                for i in range(first, first + self.STRIPE):
+                    kh, tokens, updated = self.SLOT.unpack_from(self._mm, i * self.SLOT.size)
+                    if kh == h:
+                        slot = i
+                        break
+                    if updated < stalest_at:
+                        stalest, stalest_at = i, updated
+                if slot is None:
+                    slot, tokens, updated = stalest, burst, now
+
+                allowed, tokens, wait = take(tokens, updated, now, cost, burst, rate)
+                self.SLOT.pack_into(self._mm, slot * self.SLOT.size, h, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        return allowed, tokens, wait
+
+class RateLimiter:
+    """Cost-aware token buckets keyed by user id (valid JWT) or client IP.
+
+    Every /api request takes RATELIMIT_COSTS[endpoint] tokens (default
+    RATELIMIT_DEFAULT_COST) from a bucket of RATELIMIT_BURST tokens refilled
+    at RATELIMIT_RATE per second, and endpoints in RATELIMIT_CONCURRENCY are
+    additionally capped in flight per worker. Buckets are shared by the
+    workers of a host ("shm") or kept per process ("local").
+    """
+
+    def __init__(self, app: Flask | None = None) -> None:
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("RATELIMIT_ENABLED", True)
+        app.config.setdefault("RATELIMIT_STORAGE", "shm")
+        app.config.setdefault("RATELIMIT_SHM_PATH", None)
+        app.config.setdefault("RATELIMIT_BURST", 60)
+        app.config.setdefault("RATELIMIT_RATE", 1.0)
+        app.config.setdefault("RATELIMIT_DEFAULT_COST", 1)
+        app.config.setdefault("RATELIMIT_COSTS", DEFAULT_COSTS)
+        app.config.setdefault("RATELIMIT_CONCURRENCY", DEFAULT_CONCURRENCY)
+        app.config.setdefault("RATELIMIT_BUSY_RETRY_AFTER", 10)
+        app.config.setdefault("RATELIMIT_IP_HEADER", None)
+        app.config.setdefault("RATELIMIT_TRUSTED_PROXIES", 1)
+
+        if not app.config["RATELIMIT_ENABLED"]:
+            return
+
+        if app.config["RATELIMIT_STORAGE"] == "shm" and fcntl is not None:
+            path = app.config["RATELIMIT_SHM_PATH"] or os.path.join(
+                "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "sardine-ratelimit"
+            )
+            store = SharedMemoryStore(path)
+        else:
+            store = LocalStore()
+
+        # per app: several apps can share the extension (tests, worker processes, the bench app)
+        semaphores: Dict[str, threading.BoundedSemaphore] = {
+            endpoint: threading.BoundedSemaphore(limit)
+            for endpoint, limit in app.config["RATELIMIT_CONCURRENCY"].items()
+        }
+        app.extensions["ratelimit"] = (store, semaphores)
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    # -- Hooks --------------------------------------------------------------
+    def before_request(self) -> Optional[Response]:
+        endpoint = request.endpoint
+        if request.method == "OPTIONS" or not endpoint or not endpoint.startswith("api."):
+            return None
+
+        config = current_app.config
+        store, semaphores = current_app.extensions["ratelimit"]
+        burst, rate = float(config["RATELIMIT_BURST"]), float(config["RATELIMIT_RATE"])
+        cost = min(burst, float(config["RATELIMIT_COSTS"].get(endpoint, config["RATELIMIT_DEFAULT_COST"])))
+
+        if cost > 0:
+            allowed, tokens, wait = store.take(self._key(), cost, burst, rate, time.time())
+            g.ratelimit = (burst, tokens, rate)
+            if not allowed:
+                response = jsonify({"error": "Too many requests"})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(math.ceil(wait))
+                return response
+
+        semaphore = semaphores.get(endpoint)
+        if semaphore is not None:
+            if not semaphore.acquire(blocking=False):
+                response = jsonify({"error": "Server busy, retry later"})
+                response.status_code = 503
+                response.headers["Retry-After"] = str(config["RATELIMIT_BUSY_RETRY_AFTER"])
+                return response
+            g.ratelimit_semaphore = semaphore
+        return None
+
+    def after_request(self, response: Response) -> Response:
+        limit = g.get("ratelimit")
+        if limit is not None:
+            burst, tokens, rate = limit
+            response.headers["RateLimit-Limit"] = str(int(burst))
+            response.headers["RateLimit-Remaining"] = str(int(tokens))
+            response.headers["RateLimit-Reset"] = str(math.ceil((burst - tokens) / rate))
+        return response
+
+    def teardown_request(self, exc=None) -> None:
+        semaphore = g.pop("ratelimit_semaphore", None)
+        if semaphore is not None:
+            semaphore.release()
+
+    # -- Utils --------------------------------------------------------------
+    def _key(self) -> str:
+        # the same checks as @jwt_required, blocklist included: a forged, expired
+        # or revoked token is counted against the IP, never against its `sub`
+        try:
+            verify_jwt_in_request(optional=True)
+        except Exception:
+            return f"ip:{self._client_ip()}"
+        identity = get_jwt_identity()
+        return f"u:{identity}" if identity else f"ip:{self._client_ip()}"
+
+    def _client_ip(self) -> str:
+        header = current_app.config["RATELIMIT_IP_HEADER"]
+        if header and request.headers.get(header):
+            # clients can send any entries: only those appended by our own proxies
+            # (the rightmost ones, one per hop) are trustworthy
+            hops = max(1, int(current_app.config["RATELIMIT_TRUSTED_PROXIES"]))
+            entries = [entry.strip() for entry in request.headers[header].split(",")]
+            if len(entries) >= hops:
+                return entries[-hops]
+        return request.remote_addr or "-"
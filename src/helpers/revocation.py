@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+import threading, time
+
+from flask import Flask, current_app
+from pymongo import ASCENDING
+from pymongo.database import Database
+
+class TokenBlocklist:
+    """JTI revocation list stored in Mongo, mirrored in a per-process dict.
+
+    `jti in blocklist` never touches Mongo: the mirror is topped up with
+    revocations made by other workers every JWT_BLOCKLIST_REFRESH_SECONDS,
+    which bounds how long a revoked token can still be accepted elsewhere.
+    Entries leave Mongo through a TTL index and the mirror once expired.
+    Each app keeps its own mirror of its own database.
+    """
+
+    def __init__(self, app: Flask | None = None, db: Database | None = None) -> None:
+        if app is not None and db is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app: Flask, db: Database) -> None:
+        app.config.setdefault("JWT_BLOCKLIST_REFRESH_SECONDS", 5)
+        app.extensions["blocklist"] = _Mirror(app, db)
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._mirror()
+
+    def revoke(self, jti: str, expires: int | float, *, user_id: Any = None, token_type: str = "access") -> None:
+        """Revoke `jti` until `expires` (the token's exp, as a unix timestamp)."""
+        self._mirror().revoke(jti, expires, user_id=user_id, token_type=token_type)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._mirror().stats()
+
+    @staticmethod
+    def _mirror() -> _Mirror:
+        return current_app.extensions["blocklist"]
+
+class _Mirror:
+    """Revocations of one app's database, and its local copy."""
+
+    collection_name = "tokens_blocklist"
+
+    def __init__(self, app: Flask, db: Database) -> None:
+        self._lock = threading.Lock()
+        self.app = app
+        self.db = db
+
+        self._revoked: Dict[str, float] = {}
+        self._since: datetime | None = None
+        self._synced_at = 0.0
+        self._pruned_at = 0.0
+        self._indexes_ready = False
+
+    @property
+    def col(self):
+        return self.db[self.collection_name]
+
+    # -- Hot path -----------------------------------------------------------
+    def __contains__(self, jti: str) -> bool:
+        refresh = self.app.config["JWT_BLOCKLIST_REFRESH_SECONDS"]
+        if time.monotonic() - self._synced_at >= refresh:
+            # one request refreshes, the others keep reading the current mirror;
+            # only the very first load (after fork) makes them wait
+            if self._lock.acquire(blocking=self._since is None):
+                try:
+                    if time.monotonic() - self._synced_at >= refresh:
+                        self._sync()
+                finally:
+                    self._lock.release()
+        return jti in self._revoked
+
+    # -- Writes -------------------------------------------------------------
+    def revoke(self, jti: str, expires: int | float, *, user_id: Any = None, token_type: str = "access") -> None:
+        self._ensure_indexes()
+        self.col.update_one(
+            {"jti": jti},
+            {"$set": {
+                "jti": jti,
+                "user": user_id,
+                "type": token_type,
+                "revoked_at": datetime.now(timezone.utc),
+                "expires_at": datetime.fromtimestamp(expires, timezone.utc),
+            }},
+            upsert=True,
+        )
+        self._revoked[jti] = float(expires)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "revoked": len(self._revoked),
+            "synced_seconds_ago": round(time.monotonic() - self._synced_at, 1) if self._since else None,
+            "refresh_seconds": self.app.config["JWT_BLOCKLIST_REFRESH_SECONDS"],
+        }
+
+    # -- Sync ---------------------------------------------------------------
+    def _sync(self) -> None:
+        now = datetime.now(timezone.utc)
+        if self._since is None:
+            query = {"expires_at": {"$gt": now}}
+        else:
+            # go back a little to absorb clock skew between hosts
+            query = {"revoked_at": {"$gte": self._since - timedelta(seconds=60)}}
+
+        for doc in self.col.find(query, {"_id": 0, "jti": 1, "expires_at": 1}):
+            expires = doc["expires_at"]
+            if expires.tzinfo is None:  # pymongo hands back naive UTC datetimes
+                expires = expires.replace(tzinfo=timezone.utc)
+            self._revoked[doc["jti"]] = expires.timestamp()
+
+        if time.monotonic() - self._pruned_at >= 60:
+            cutoff = now.timestamp()
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > cutoff}
+            self._pruned_at = time.monotonic()
+
+        self._since = now
+        self._synced_at = time.monotonic()
+
+    def _ensure_indexes(self) -> None:
+        if self._indexes_ready:
+            return
+        self.col.create_index([("jti", ASCENDING)], unique=True)
+        self.col.create_index([("revoked_at", ASCENDING)])
+        self.col.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        self._indexes_ready = True
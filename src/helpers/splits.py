@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+import hashlib
+
+DEFAULT_SPLITS = {"train": 0.8, "validation": 0.1, "test": 0.1}
+
+def normalize_ratios(ratios: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Validated split ratios summing to 1, in the given order."""
+    ratios = ratios or DEFAULT_SPLITS
+    if not isinstance(ratios, dict):
+        raise ValueError("Splits must map split names to ratios")
+
+    cleaned = {}
+    for name, ratio in ratios.items():
+        if not isinstance(name, str) or not name or "." in name or name.startswith("$"):
+            raise ValueError(f"Invalid split name: {name}")
+        if not isinstance(ratio, (int, float)) or ratio < 0:
+            raise ValueError(f"Invalid ratio for split {name}")
+        cleaned[name] = float(ratio)
+
+    total = sum(cleaned.values())
+    if total <= 0:
+        raise ValueError("Split ratios must not all be zero")
+    return {name: ratio / total for name, ratio in cleaned.items()}
+
+def assign_split(text: str, ratios: Dict[str, float]) -> str:
+    """Split of a sample, from a stable hash of its text.
+
+    The same text always lands in the same split, whatever the build,
+    worker or order it was generated in: duplicates never leak from
+    train into test.
+    """
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    point = int.from_bytes(digest, "big") / 2 ** 64
+
+    acc, name = 0.0, None
+    for name, ratio in ratios.items():
+        acc += ratio
+        if point < acc:
+            return name
+    return name  # rounding: the last split takes the rest
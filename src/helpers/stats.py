@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, Dict, List
+import hashlib, math
+
+from bson.binary import Binary
+
+class HyperLogLog:
+    """Distinct-count sketch: 2^p one-byte registers, ~1.04/sqrt(2^p) error."""
+
+    def __init__(self, p: int = 14, registers: bytes | None = None) -> None:
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+        self._alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, value: str) -> None:
+        x = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        idx = x >> (64 - self.p)
+        w = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - w.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.p != self.p:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        estimate = self._alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+TEXT_LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048)
+ENTITY_COUNT_MAX = 10
+
+class DatasetStats:
+    """Aggregates updated sample by sample while a dataset is generated.
+
+    Stored on the dataset document (to_document) and merged back on top-up
+    builds (from_document), so quality checks never scan datasets_data.
+    """
+
+    def __init__(self) -> None:
+        self.samples = 0
+        self.text_length_total = 0
+        self.entities: Dict[str, int] = {}
+        self.formats: Dict[str, int] = {}
+        self.requirement_failures: Dict[str, int] = {}
+        self.samples_with_failures = 0
+        self.text_length = [0] * (len(TEXT_LENGTH_BUCKETS) + 1)
+        self.entity_count = [0] * (ENTITY_COUNT_MAX + 2)
+        self.texts = HyperLogLog()
+
+    def observe(self, configuration: dict, sample: dict) -> None:
+        text = sample.get("text", "")
+        entities = sample.get("entities", [])
+
+        self.samples += 1
+        self.text_length_total += len(text)
+        self.text_length[bisect_left(TEXT_LENGTH_BUCKETS, len(text))] += 1
+        self.entity_count[min(len(entities), ENTITY_COUNT_MAX + 1)] += 1
+        self.texts.add(text)
+
+        for _, _, label in entities:
+            label = str(label)
+            self.entities[label] = self.entities.get(label, 0) + 1
+
+        if "format_id" in configuration:
+            fmt = str(configuration["format_id"])
+            self.formats[fmt] = self.formats.get(fmt, 0) + 1
+
+        failed = False
+        for attr in configuration.get("attributes", []):
+            if attr.get("requirements", True) is False:
+                key = str(attr.get("key"))
+                self.requirement_failures[key] = self.requirement_failures.get(key, 0) + 1
+                failed = True
+        self.samples_with_failures += failed
+
+    # -- Persistence --------------------------------------------------------
+    def to_document(self) -> Dict[str, Any]:
+        # user-defined keys may contain "." or "$": store them as pairs, not field names
+        return {
+            "samples": self.samples,
+            "text_length_total": self.text_length_total,
+            "entities": _pairs(self.entities),
+            "formats": _pairs(self.formats),
+            "requirement_failures": _pairs(self.requirement_failures),
+            "samples_with_failures": self.samples_with_failures,
+            "text_length": self.text_length,
+            "entity_count": self.entity_count,
+            "hll": Binary(bytes(self.texts.registers)),
+            "hll_p": self.texts.p,
+        }
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any] | None) -> "DatasetStats":
+        stats = cls()
+        if not doc:
+            return stats
+        stats.samples = doc.get("samples", 0)
+        stats.text_length_total = doc.get("text_length_total", 0)
+        stats.entities = _dict(doc.get("entities"))
+        stats.formats = _dict(doc.get("formats"))
+        stats.requirement_failures = _dict(doc.get("requirement_failures"))
+        stats.samples_with_failures = doc.get("samples_with_failures", 0)
+        stats.text_length = list(doc.get("text_length") or stats.text_length)
+        stats.entity_count = list(doc.get("entity_count") or stats.entity_count)
+        if doc.get("hll"):
+            stats.texts = HyperLogLog(doc.get("hll_p", 14), bytes(doc["hll"]))
+        return stats
+
+    def merge(self, other: "DatasetStats") -> None:
+        self.samples += other.samples
+        self.text_length_total += other.text_length_total
+        for mine, theirs in ((self.entities, other.entities), (self.formats, other.formats),
+                             (self.requirement_failures, other.requirement_failures)):
+            for k, v in theirs.items():
+                mine[k] = mine.get(k, 0) + v
+        self.samples_with_failures += other.samples_with_failures
+        self.text_length = [a + b for a, b in zip(self.text_length, other.text_length)]
+        self.entity_count = [a + b for a, b in zip(self.entity_count, other.entity_count)]
+        self.texts.merge(other.texts)
+
+    def summary(self) -> Dict[str, Any]:
+        distinct = min(self.texts.count(), self.samples)
+        bounds = [f"<={b}" for b in TEXT_LENGTH_BUCKETS] + [f">{TEXT_LENGTH_BUCKETS[-1]}"]
+        return {
+            "samples": self.samples,
+            "distinct_texts_estimate": distinct,
+            "duplicate_rate_estimate": round(1 - distinct / self.samples, 4) if self.samples else 0.0,
+            "text_length_mean": round(self.text_length_total / self.samples, 2) if self.samples else 0.0,
+            "text_length": dict(zip(bounds, self.text_length)),
+            "entity_count": {**{str(i): n for i, n in enumerate(self.entity_count[:-1])}, f">{ENTITY_COUNT_MAX}": self.entity_count[-1]},
+            "entities": self.entities,
+            "formats": self.formats,
+            "requirement_failures": self.requirement_failures,
+            "samples_with_failed_requirements": self.samples_with_failures,
+        }
+
+def _pairs(counts: Dict[str, int]) -> List[List[Any]]:
+    return [[k, v] for k, v in counts.items()]
+
+def _dict(pairs: List[List[Any]] | None) -> Dict[str, int]:
+    return {k: v for k, v in (pairs or [])}
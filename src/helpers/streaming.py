@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from itertools import chain
+from typing import Any, Iterable, Iterator, Optional
+
+from flask import Response, current_app, json, stream_with_context
+
+def json_list(items: Iterable[Any]) -> Optional[Response]:
+    """JSON array response, encoded as `items` are produced.
+
+    Arrays up to STREAM_BUFFER_SIZE are answered buffered, as jsonify did,
+    so they keep Content-Length and ETags. Past it the response streams
+    chunks of about STREAM_CHUNK_SIZE: neither time to first byte nor
+    memory grows with the result. None when there is no item, for the
+    callers' 404.
+    """
+    config = current_app.config
+    limit = config.get("STREAM_BUFFER_SIZE", 256 * 1024)
+    chunks = _chunks(items, config.get("STREAM_CHUNK_SIZE", 64 * 1024))
+
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            return Response(stream_with_context(chain(head, chunks)), mimetype="application/json")
+    if not head:
+        return None
+    return Response("".join(head), mimetype="application/json")
+
+def _chunks(items: Iterable[Any], chunk_size: int) -> Iterator[str]:
+    parts, size, separator = [], 0, "["
+    for item in items:
+        part = separator + json.dumps(item, separators=(",", ":"))
+        separator = ","
+        parts.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(parts)
+            parts, size = [], 0
+    if separator == "[":
+        return
+    parts.append("]\n")
+    yield "".join(parts)
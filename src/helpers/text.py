@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from typing import Dict
+import unicodedata
+
+def _accents() -> Dict[int, str]:
+    table = {}
+    for code in range(0xC0, 0x250):
+        base = "".join(c for c in unicodedata.normalize("NFD", chr(code)) if not unicodedata.combining(c))
+        if base != chr(code):
+            table[code] = base
+    table.update({ord("œ"): "oe", ord("Œ"): "OE", ord("æ"): "ae", ord("Æ"): "AE"})
+    return table
+
+# str.translate table: Latin letters with diacritics (and œ, æ) to plain ASCII
+ACCENTS = _accents()
@@ -1,14 +1,31 @@
 from __future__ import annotations
 
-from typing import Any, Tuple
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
 from flask import jsonify
+from flask_jwt_extended import get_jwt, jwt_required
+from functools import wraps
 import hashlib, base64, uuid, hmac
 from datetime import datetime, timezone
+from itertools import islice
 
 def json_error(message: str, status: int = 400) -> Tuple[Any, int]:
     return jsonify({"error": message}), status
 
 
+def admin_required(fn: Callable) -> Callable:
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if get_jwt().get("role") != "admin":
+            return json_error("Forbidden", 403)
+        return fn(*args, **kwargs)
+    return wrapper
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 def bump_version(version: str, bump: str) -> str:
     major, minor = map(int, version.split("."))
     if bump == "major":
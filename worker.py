@@ -0,0 +1,49 @@
+# Dataset build worker (BUILD_EXECUTOR=queue): python worker.py [--processes N]
+import argparse, logging, multiprocessing, signal
+
+from config import Config
+
+def serve() -> None:
+    from src import create_app
+    from src.app.models.worker import BuildWorker
+
+    app = create_app(Config)
+    worker = BuildWorker(app, app.mongo_db)
+
+    # finish the current batch, commit it and hand the shard back
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop.set())
+
+    try:
+        worker.run()
+    finally:
+        app.mongo_client.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate queued dataset builds")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes on this host (generation is CPU bound)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    if args.processes <= 1:
+        serve()
+        return
+
+    # spawn: every process builds its own app and MongoClient
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=serve) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # children receive it from the terminal too
+
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()
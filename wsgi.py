@@ -0,0 +1,5 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+from src import create_app
+from config import Config
+
+app = create_app(Config)